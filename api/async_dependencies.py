@@ -0,0 +1,66 @@
+# 异步模式（settings.DB_ASYNC=True）下的依赖项，和 api/dependencies.py 一一对应
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from infrastructure.async_repositories import (
+    AsyncSqlAlchemyBookRepository,
+    AsyncSqlAlchemyBorrowRepository,
+    AsyncSqlAlchemyOutboxRepository,
+    AsyncSqlAlchemyUserRepository,
+)
+from infrastructure.book_cache import book_cache
+from core.async_services import AsyncLibraryService, AsyncBorrowService
+from core.interfaces import AsyncOutboxRepository
+from core.models import User
+from core.security import decode_access_token_payload
+from core.token_cache import token_cache
+from core.exceptions import UnauthorizedException
+from api.dependencies import oauth2_scheme
+from settings import settings
+
+
+# 和同步模式一样，事务由 DBSessionMiddleware 统一管理（会话工厂换成 AsyncSessionLocal），这里只是把会话取出来
+# 注意依赖项都写成 async def：普通 def 的依赖会被 FastAPI 丢到线程池里执行，异步模式下没必要
+async def get_async_db(request: Request) -> AsyncSession:
+    return request.state.db_session.get()
+
+
+def build_async_book_repository(session: AsyncSession) -> AsyncSqlAlchemyBookRepository:
+    """同 api/dependencies.build_book_repository：开启 BOOK_CACHE_ENABLED 时带读穿透缓存"""
+    return AsyncSqlAlchemyBookRepository(session, cache=book_cache if settings.BOOK_CACHE_ENABLED else None)
+
+
+async def get_async_library_service(session: AsyncSession = Depends(get_async_db)):
+    return AsyncLibraryService(
+        user_repo=AsyncSqlAlchemyUserRepository(session),
+        book_repo=build_async_book_repository(session),
+    )
+
+
+async def get_async_borrow_service(session: AsyncSession = Depends(get_async_db)):
+    return AsyncBorrowService(
+        book_repo=build_async_book_repository(session),
+        borrow_repo=AsyncSqlAlchemyBorrowRepository(session),
+    )
+
+
+async def get_async_outbox(session: AsyncSession = Depends(get_async_db)) -> AsyncOutboxRepository:
+    return AsyncSqlAlchemyOutboxRepository(session)
+
+
+async def get_async_current_user(
+        request: Request,
+        token: str = Depends(oauth2_scheme),
+) -> User:
+    """根据 token 获取当前用户（规则同 api/dependencies.get_current_user，共用同一个 token 缓存）"""
+    if settings.TOKEN_CACHE_ENABLED:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+    payload = decode_access_token_payload(token)
+    user = await AsyncSqlAlchemyUserRepository(await get_async_db(request)).get_by_username(payload["sub"])
+    if user is None or not user.is_active:
+        raise UnauthorizedException("无法验证凭据")
+    if settings.TOKEN_CACHE_ENABLED:
+        token_cache.put(token, user, token_expires_at=payload["exp"])
+    return user
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from core.models import User
+from api.async_dependencies import get_async_current_user
+
+router = APIRouter()
+# 创建受保护的路由（异步版本，同 api/routes/auth.py）
+@router.get("/users/me", summary="获取当前token的用户信息")
+async def read_users_me(current_user: User = Depends(get_async_current_user)):
+    return {
+        "user_id": current_user.user_id,
+        "username": current_user.username,
+        "name": current_user.name,
+        "is_active": current_user.is_active
+        # 注意不要返回 hashed_password
+    }
@@ -0,0 +1,145 @@
+# 图书路由的异步版本（settings.DB_ASYNC=True 时挂载），接口和 api/routes/books.py 完全一致
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Literal
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from core.dtos import BookFilter
+from core.models import Book
+from core.async_services import AsyncLibraryService
+from api.schemas import (
+    BookCreate, to_book_response, BookResponse, BookPageResponse, BookImportReportResponse, SuccessResponse,
+)
+from api.async_dependencies import get_async_db, get_async_library_service
+from core.book_import import detect_format, read_book_rows
+from core.serialization import serializer
+from api.responses import page_response
+from settings import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.routes.books import DELETE_BOOK_RESPONSES, EXPORT_CHUNK_LINES, book_filter
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def to_ndjson_chunks(books: AsyncIterable[Book]) -> AsyncIterator[bytes]:
+    """同 api/routes/books.to_ndjson_chunks，输入是异步迭代器"""
+    lines = []
+    async for book in books:
+        lines.append(serializer.dumps(book))
+        if len(lines) >= EXPORT_CHUNK_LINES:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+@router.post("/", response_model=SuccessResponse, summary="添加图书")
+async def add_book(
+    book: BookCreate,
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    await service.add_book(Book(isbn=book.isbn, title=book.title, author=book.author))
+    return SuccessResponse(message="图书添加成功")
+
+
+@router.post("/bulk", response_model=BookImportReportResponse, summary="批量导入图书（JSON Lines / CSV）")
+async def import_books(
+    file: UploadFile = File(..., description="一行一本书：JSON Lines（isbn/title/author 字段）或带表头的 CSV"),
+    file_format: Literal["jsonl", "csv"] | None = Query(None, alias="format", description="不填按文件扩展名判断"),
+    on_conflict: Literal["skip", "update"] = Query(
+        "skip", description="isbn 已存在时：skip 跳过，update 更新书名和作者（借阅状态不变）"
+    ),
+    chunk_size: int = Query(settings.BOOK_IMPORT_CHUNK_SIZE, ge=1, le=10000, description="每批写入并提交的行数"),
+    db: AsyncSession = Depends(get_async_db),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    # 读的是 FastAPI 存好的临时文件，每批写入时都会 await，不会长时间卡住事件循环
+    rows = read_book_rows(file.file, file_format or detect_format(file.filename))
+    report = await service.import_books(
+        rows,
+        update_existing=on_conflict == "update",
+        chunk_size=chunk_size,
+        commit=db.commit,
+        rollback=db.rollback,
+    )
+    return BookImportReportResponse.model_validate(report, from_attributes=True)
+
+
+@router.get("/export", summary="导出图书目录（NDJSON 流）", response_class=StreamingResponse)
+async def export_books(
+    filters: BookFilter = Depends(book_filter),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    return StreamingResponse(to_ndjson_chunks(service.export_books(filters)), media_type="application/x-ndjson")
+
+
+@router.get("/search", response_model=BookPageResponse, summary="全文搜索图书（书名、作者）")
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=100, description="关键词，多个词用空格分开（都要命中）；英文按前缀匹配"),
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    page = await service.search_books(q, size=size, cursor=cursor)
+    return page_response(page.items, page.size, page.next_cursor)
+
+
+@router.get("/{isbn}", response_model=BookResponse, summary="根据 ISBN 获取图书")
+async def get_book(isbn: str, service: AsyncLibraryService = Depends(get_async_library_service)):
+    book = await service.get_book_by_isbn(isbn)
+    if not book:
+        raise HTTPException(status_code=404, detail="图书不存在")
+    return to_book_response(book)
+
+
+@router.get("/", response_model=BookPageResponse, summary="分页获取图书")
+async def list_books(
+    filters: BookFilter = Depends(book_filter),
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    page = await service.list_books(filters, size=size, cursor=cursor)
+    return page_response(page.items, page.size, page.next_cursor)
+
+
+@router.put("/{isbn}", response_model=BookResponse, summary="更新图书")
+async def update_book(
+    book_update: BookCreate,
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    updated_book = Book(
+        isbn=book_update.isbn, title=book_update.title, author=book_update.author
+    )
+    await service.update_book(updated_book)
+    return to_book_response(updated_book)
+
+
+@router.delete(
+    "/{isbn}",
+    summary="删除图书",
+    description="""
+    根据图书的 ISBN 删除数据库中的记录。
+    
+    - 如果图书不存在，返回 404 状态码
+    - 成功删除后，返回成功消息
+    - 该操作不可逆，请谨慎调用
+    """,
+    response_model=SuccessResponse,
+    responses=DELETE_BOOK_RESPONSES,
+)
+async def delete_book(
+    isbn: str = Path(
+        ...,
+        description="图书编号，例如： 999-0134685994",
+        example="999-0134685994",
+    ),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    deleted = await service.delete_book(isbn)
+    if not deleted:
+        logger.info("图书不存在")
+        return SuccessResponse(code="NOT_FOUND", message="图书不存在")
+    return SuccessResponse(message="图书删除成功",data={"isbn": isbn})
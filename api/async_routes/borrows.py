@@ -0,0 +1,95 @@
+# 借阅路由的异步版本（settings.DB_ASYNC=True 时挂载），接口和 api/routes/borrows.py 完全一致
+from fastapi import APIRouter, Depends, Query
+from core.async_services import AsyncBorrowService
+from api.schemas import (
+    SuccessResponse, MyBorrowsResponse, BookBorrowResponse,
+    BulkBorrowRequest, BulkReturnRequest, CirculationResultResponse,
+)
+from api.routes.borrows import circulation_events_for, to_circulation_response
+from api.async_dependencies import get_async_current_user, get_async_borrow_service, get_async_outbox
+from core.outbox import BORROW_CREATED, BORROW_RETURNED
+from core.interfaces import AsyncOutboxRepository
+from core.models import User
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/books/{isbn}/borrow", response_model=BookBorrowResponse, summary="借书")
+async def borrow_book(
+    isbn: str,
+    current_user: User = Depends(get_async_current_user),
+    service: AsyncBorrowService = Depends(get_async_borrow_service),
+    outbox: AsyncOutboxRepository = Depends(get_async_outbox),
+):
+    result = await service.borrow_book(isbn, current_user.user_id)
+
+    # 副作用（借阅日志、audit_logs、通知邮件）写进发件箱，和借阅记录一起提交，由 relay 投递；请求路径上不连 Redis
+    events, task_id = circulation_events_for(current_user, BORROW_CREATED, [(result.book_isbn, result.borrow_id)])
+    await outbox.add_many(events)
+    return BookBorrowResponse(
+        borrow_id=result.borrow_id,
+        book_isbn=result.book_isbn,
+        borrower_id=result.borrower_id,
+        borrowed_at=result.borrowed_at,
+        due_date=result.due_date,
+        task_id=task_id
+    )
+
+
+@router.patch("/{borrow_id}/return", response_model=SuccessResponse, summary="还书")
+async def return_book(
+    borrow_id: int,
+    current_user: User = Depends(get_async_current_user),
+    service: AsyncBorrowService = Depends(get_async_borrow_service),
+    outbox: AsyncOutboxRepository = Depends(get_async_outbox),
+):
+    result = await service.return_book(borrow_id, current_user.user_id)
+    events, _ = circulation_events_for(current_user, BORROW_RETURNED, [(result.book_isbn, result.borrow_id)])
+    await outbox.add_many(events)
+    return SuccessResponse(message="还书成功", data=result)
+
+
+@router.post("/bulk/borrow", response_model=CirculationResultResponse, summary="批量借书")
+async def borrow_books(
+    body: BulkBorrowRequest,
+    current_user: User = Depends(get_async_current_user),
+    service: AsyncBorrowService = Depends(get_async_borrow_service),
+    outbox: AsyncOutboxRepository = Depends(get_async_outbox),
+):
+    result = await service.borrow_books(body.isbns, current_user.user_id)
+    borrowed = [(item.book_isbn, item.borrow_id) for item in result.items if item.ok]
+    events, task_id = circulation_events_for(current_user, BORROW_CREATED, borrowed)
+    await outbox.add_many(events)
+    return to_circulation_response(result, task_id)
+
+
+@router.post("/bulk/return", response_model=CirculationResultResponse, summary="批量还书")
+async def return_books(
+    body: BulkReturnRequest,
+    current_user: User = Depends(get_async_current_user),
+    service: AsyncBorrowService = Depends(get_async_borrow_service),
+    outbox: AsyncOutboxRepository = Depends(get_async_outbox),
+):
+    result = await service.return_books(body.borrow_ids, current_user.user_id)
+    returned = [(item.book_isbn, item.borrow_id) for item in result.items if item.ok]
+    events, _ = circulation_events_for(current_user, BORROW_RETURNED, returned)
+    await outbox.add_many(events)
+    return to_circulation_response(result)
+
+
+@router.get("/me", response_model=MyBorrowsResponse, summary="查询我的借阅记录")
+async def get_my_borrows(
+    page: int = Query(1, ge=1, description="页码（偏移分页）"),
+    size: int = Query(10, ge=1, le=100, description="每页记录数"),
+    cursor: str | None = Query(None, description="游标（上一页返回的 next_cursor），传入后使用游标分页"),
+    include_total: bool | None = Query(
+        None, description="是否返回总数；默认偏移分页返回、游标分页不返回"
+    ),
+    current_user: User = Depends(get_async_current_user),
+    service: AsyncBorrowService = Depends(get_async_borrow_service),
+):
+    return await service.get_my_borrows(
+        current_user.user_id, page, size, cursor=cursor, include_total=include_total
+    )
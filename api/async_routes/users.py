@@ -0,0 +1,76 @@
+# 用户路由的异步版本（settings.DB_ASYNC=True 时挂载），接口和 api/routes/users.py 完全一致
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from core.async_services import AsyncLibraryService
+from api.schemas import UserRegisterSchema, UserResponse, UserBatchRequest, UserBatchResponse, UserPageResponse, to_user_response
+from api.responses import page_response, user_row
+from core.dtos import UserCreateDto
+from api.async_dependencies import get_async_db, get_async_library_service
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.password_hashing import password_hasher
+import uuid
+from fastapi.security import OAuth2PasswordRequestForm
+from datetime import timedelta
+from core.security import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("/register", response_model=UserResponse, summary="注册用户")
+async def create_user(user_in: UserRegisterSchema,
+                      service: AsyncLibraryService = Depends(get_async_library_service)):
+    # argon2 哈希是 CPU 密集型计算，放到专用的哈希线程池里，不能卡住事件循环
+    hashed_pw = await password_hasher.hash_async(user_in.password)
+    dto = UserCreateDto(
+        user_id=str(uuid.uuid4()),
+        username=user_in.username,
+        name=user_in.name,
+        email=user_in.email,
+        hashed_password=hashed_pw,
+        is_active=True
+    )
+    added_user = await service.add_user(dto)
+    return to_user_response(added_user)
+
+
+@router.post("/token", summary="登录 - 获取 Token")
+async def login_for_access_token(
+    from_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    service: AsyncLibraryService = Depends(get_async_library_service)
+):
+    # 登录只读数据库：查完用户就 close 会话，校验密码期间不占数据库连接
+    user = await service.authenticate_user(from_data.username, from_data.password, release_db=db.close)
+    if not user:
+        logger.warning(f"用户 {from_data.username} 登录失败，用户名或密码错误")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无法验证凭据", headers={"WWW-Authenticate": "Bearer"})
+    if not user.is_active:
+        logger.warning(f"用户 {from_data.username} 登录失败，用户未激活")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户未激活", headers={"WWW-Authenticate": "Bearer"})
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/batch", response_model=UserBatchResponse, summary="批量获取用户")
+async def get_users_batch(body: UserBatchRequest, service: AsyncLibraryService = Depends(get_async_library_service)):
+    # 前端展示借阅列表时一次把借阅人都查出来，不要逐个调 GET /users/{username}
+    result = await service.get_users_batch(body.user_ids, body.usernames)
+    return UserBatchResponse(
+        items=[to_user_response(user) for user in result.items], not_found=result.not_found
+    )
+
+@router.get("/{username}", response_model=UserResponse, summary="根据用户名获取用户")
+async def get_user(username: str, service: AsyncLibraryService = Depends(get_async_library_service)):
+    user = await service.get_user_by_username(username)
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return to_user_response(user)
+
+@router.get("/", response_model=UserPageResponse, summary="分页获取用户")
+async def list_users(
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: AsyncLibraryService = Depends(get_async_library_service),
+):
+    page = await service.list_users(size=size, cursor=cursor)
+    return page_response([user_row(user) for user in page.items], page.size, page.next_cursor)
@@ -2,28 +2,41 @@
 from infrastructure.user_repository import SqlAlchemyUserRepository
 from infrastructure.book_repository import SqlAlchemyBookRepository
 from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
+from infrastructure.outbox_repository import SqlAlchemyOutboxRepository
+from infrastructure.book_cache import CachedBookRepository, book_cache
+from core.interfaces import BookRepository, OutboxRepository
+from settings import settings
 from core.services import LibraryService, BorrowService
 from fastapi.security import OAuth2PasswordBearer  # 导入 OAuth2PasswordBearer
 from core.models import User 
-from core.security import decode_access_token
+from core.security import decode_access_token_payload
+from core.token_cache import token_cache
 from fastapi import Depends, Request
 from core.exceptions import UnauthorizedException
-from jose import JWTError
 # 告诉 Python：Session 是什么类型
 from sqlalchemy.orm import Session
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
 
 #使用全局异常处理器，需要定义一个依赖项，统一管理事务
+# 会话由 DBSessionMiddleware 按需创建：只有用到这个依赖的请求才会真正打开会话
 def get_db(request: Request):
-    return request.state.db
+    return request.state.db_session.get()
 
 
 
+def build_book_repository(session: Session) -> BookRepository:
+    """图书仓库：开启 BOOK_CACHE_ENABLED 时外面包一层读穿透缓存"""
+    repo = SqlAlchemyBookRepository(session)
+    if settings.BOOK_CACHE_ENABLED:
+        return CachedBookRepository(repo, book_cache, session=session)
+    return repo
+
+
 def get_library_service(session: Session = Depends(get_db)):
     return LibraryService(
         user_repo=SqlAlchemyUserRepository(session),
-        book_repo=SqlAlchemyBookRepository(session)
+        book_repo=build_book_repository(session)
     )
 
 # ✅ 代码复用 + 单一职责 + 易于扩展（比如以后加 `get_audit_service`）
@@ -48,26 +61,35 @@ def get_library_service(session: Session = Depends(get_db)):
 
 
 def get_current_user(
+        request: Request,
         token: str = Depends(oauth2_scheme), # 从请求/users/token 中获取返回的token
-        db: Session = Depends(get_db)
 ) -> User:
     """根据 token 获取当前用户"""
-    try:
-        username = decode_access_token(token)
-    except JWTError:
-        raise UnauthorizedException("无法验证凭据")
-    #1. 解码token获取 username
+    # 0. 同一个 token 验证过了，直接用缓存的结果：不用再验签名，也不用查数据库（连会话都不用开）
+    if settings.TOKEN_CACHE_ENABLED:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+    #1. 解码token获取 username（签名不对或已过期会抛 UnauthorizedException）
+    payload = decode_access_token_payload(token)
     # 2.用 repository查询用户
-    user_repo = SqlAlchemyUserRepository(db)
-    user = user_repo.get_by_username(username) 
+    user_repo = SqlAlchemyUserRepository(get_db(request))
+    user = user_repo.get_by_username(payload["sub"])
     if user is None or not user.is_active:  # ⚠️ 不要说“用户不存在”，统一说“凭据无效”
         #  **安全最佳实践**：永远不要区分“用户名不存在”和“密码错误”，避免被暴力枚举用户名。
         raise UnauthorizedException("无法验证凭据")
+    if settings.TOKEN_CACHE_ENABLED:
+        token_cache.put(token, user, token_expires_at=payload["exp"])
     return user
 
 
 def get_borrow_service(session: Session = Depends(get_db)):
     return BorrowService(
-        book_repo=SqlAlchemyBookRepository(session),
+        book_repo=build_book_repository(session),
         borrow_repo=SqlAlchemyBorrowRepository(session)
-    )
\ No newline at end of file
+    )
+
+
+# 事务性发件箱：和借阅服务共用同一个请求会话，事件和借阅记录一起提交
+def get_outbox(session: Session = Depends(get_db)) -> OutboxRepository:
+    return SqlAlchemyOutboxRepository(session)
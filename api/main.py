@@ -1,23 +1,29 @@
-import logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[logging.StreamHandler()],
-    force=True,
-)
+# 第三方库的日志也走 core/logger 的异步管道，级别见 settings.LOG_LEVEL
+from core.logger import setup_logging
+setup_logging()
 from fastapi import FastAPI
-from api.routes import books, users, borrows, auth, tasks
+from api.routes import tasks, metrics
 
 from infrastructure.connection import engine
 from infrastructure.models import Base
+from infrastructure.migrations import run_migrations
+from infrastructure.outbox_relay import start_relay
 import os
 import uvicorn
 from api.exception_handlers import register_exception_handlers
+from api.responses import FastJSONResponse
 from middleware.dbsession_middleware import DBSessionMiddleware
-from middleware.logging_middleware import logging_middleware
+from middleware.logging_middleware import LoggingMiddleware
 from settings import settings
 
+# settings.DB_ASYNC=True 时使用异步引擎 + async 路由，接口完全一样
+if settings.DB_ASYNC:
+    from api.async_routes import books, users, borrows, auth
+    from infrastructure.async_connection import AsyncSessionLocal as session_factory
+else:
+    from api.routes import books, users, borrows, auth
+    from infrastructure.connection import SessionLocal as session_factory
+
 
 # ✅ 第一次运行时，`data/library.db` 会自动创建，表也会生成！
 #  Base 不仅是个基类，它还偷偷记住了所有继承它的子类（也就是你的表）！
@@ -29,11 +35,17 @@ from settings import settings
 # SQLite 文件会自动创建吗！是的，只要调用 `Base.metadata.create_all(bind=engine)`，且 `data/` 目录存在。
 os.makedirs("data", exist_ok=True)  # 确保 data/ 目录存在
 Base.metadata.create_all(bind=engine)
+# create_all 不会改已有的表：新加的索引/字段由带版本号的迁移补上（见 infrastructure/migrations.py）
+run_migrations(engine)
+# 发件箱 relay：投递借还接口写进 outbox 表的副作用（也可以单独起进程：python -m infrastructure.outbox_relay）
+if settings.OUTBOX_RELAY_ENABLED:
+    start_relay()
 
 
 app = FastAPI(
     title="图书馆管理系统",
     debug=settings.APP_ENV == "development",
+    default_response_class=FastJSONResponse,  # 序列化走 core/serialization.py（orjson）
     description="""
     一个简单的图书借阅系统，支持：
     - 添加图书
@@ -54,12 +66,11 @@ app = FastAPI(
 
 # 注册异常处理函数
 register_exception_handlers(app)
-# 注册中间件, 统一管理数据库事务
-app.add_middleware(DBSessionMiddleware)
-# 添加结构化日志中间件
-# `app.middleware("http")`：告诉 FastAPI，“我要注册一个 HTTP 中间件”
-# 效果：**从此以后，每一个 HTTP 请求都会先经过 `logging_middleware`**
-app.middleware("http")(logging_middleware)
+# 注册中间件, 统一管理数据库事务（按需创建会话，只读请求不 commit）
+app.add_middleware(DBSessionMiddleware, session_factory=session_factory)
+# 添加结构化日志中间件（纯 ASGI，最后添加的在最外层）
+# 效果：**从此以后，每一个 HTTP 请求都会先经过 `LoggingMiddleware`**
+app.add_middleware(LoggingMiddleware)
 
 
 app.include_router(books.router, prefix="/books", tags=["图书管理"])
@@ -71,6 +82,8 @@ app.include_router(borrows.router, prefix="/borrows", tags=["借阅管理"])
 app.include_router(auth.router, prefix="/auth", tags=["获取当前token的用户信息"])
 
 app.include_router(tasks.router, prefix="/tasks", tags=["异步任务管理"])
+
+app.include_router(metrics.router, prefix="/internal/metrics", tags=["内部监控"])
 # 启动项目
 # uvicorn main:app --reload
 # 修改端口
@@ -8,10 +8,11 @@ logging.basicConfig(
     force=True,
 )
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from core.services_json import LibraryService
 from core.models import Book
 from infrastructure.json_repos import JsonUserRepo, JsonBookRepo
+from api.responses import FastJSONResponse
 from api.schemas import (
     BookCreate,
     BookResponse,
@@ -39,6 +40,7 @@ Base.metadata.create_all(bind= engine)
 
 app = FastAPI(
     title="图书馆管理系统",
+    default_response_class=FastJSONResponse,
     description="""
     一个简单的图书借阅系统，支持：
     - 添加图书
@@ -93,7 +95,30 @@ def get_all_books(
             book for book in filtered_books if title.lower() in book.title.lower()
         ]  # 根据书名模糊匹配
     # 💡 `model_validate()` 是 Pydantic v2 的方法，能安全地从任意对象创建模型实例。
-    return [BookSummary.model_validate(book) for book in filtered_books]
+    # 列表可能很长：直接拼成 dict 交给序列化器，不再逐本 model_validate（见 api/responses.py）
+    return FastJSONResponse([_book_summary_row(book) for book in filtered_books])
+
+
+@app.get(
+    "/books/search",
+    response_model=list[BookSummary],
+    summary="全文搜索图书",
+    description="按书名和作者搜索，按相关度排序：\n- `q`：关键词，多个词用空格分开（都要命中），英文按前缀匹配，中文按连续文字匹配",
+    tags=["图书管理"],
+)
+def search_books(
+    q: str = Query(..., min_length=1, max_length=100),
+    size: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+) -> list[BookSummary]:
+    # 走倒排索引（core/book_search.py），不再逐本比较书名
+    books = library_service.search_books(q, size=size, offset=offset)
+    return FastJSONResponse([_book_summary_row(book) for book in books])
+
+
+def _book_summary_row(book: Book) -> dict:
+    """BookSummary 的字段（不返回借阅人）"""
+    return {"isbn": book.isbn, "title": book.title, "author": book.author, "is_borrowed": book.is_borrowed}
 
 
 # @app.post("/books/add",  response_model=Book, deprecated=True)  # ← Swagger 会显示“已废弃”
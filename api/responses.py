@@ -0,0 +1,24 @@
+# 响应序列化：所有接口默认用 FastJSONResponse（core/serialization.py 的序列化器，装了 orjson 就是 orjson）
+# 列表接口更进一步：直接返回 FastJSONResponse，把 dataclass 行交给序列化器，
+# 不再“每行构造一个 Pydantic 对象 → jsonable_encoder 转 dict → json.dumps”。
+# 这样返回的 Response 不再经过 response_model 校验，所以行的字段必须和响应模型一致（见 tests/test_serialization.py）；
+# 路由上的 response_model 仍然保留，生成 OpenAPI 文档用
+from starlette.responses import JSONResponse
+
+from core.models import User
+from core.serialization import serializer
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return serializer.dumps(content)
+
+
+def page_response(items: list, size: int, next_cursor: str | None) -> FastJSONResponse:
+    """分页列表（BookPageResponse / UserPageResponse 的格式）"""
+    return FastJSONResponse({"items": items, "size": size, "next_cursor": next_cursor})
+
+
+def user_row(user: User) -> dict:
+    """UserResponse 的字段（User 里有密码哈希和邮箱，不能整个序列化）"""
+    return {"user_id": user.user_id, "username": user.username, "name": user.name, "is_active": user.is_active}
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from collections.abc import Iterable, Iterator
+from typing import Literal
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from core.dtos import BookFilter
 from core.models import Book
 from core.services import LibraryService
-from api.schemas import BookCreate, to_book_response, BookResponse, SuccessResponse
+from api.schemas import (
+    BookCreate, to_book_response, BookResponse, BookPageResponse, BookImportReportResponse, SuccessResponse,
+)
+from core.book_import import detect_format, read_book_rows
+from core.serialization import serializer
+from api.responses import page_response
+from settings import settings
 from api.dependencies import get_library_service, get_db
 from sqlalchemy.orm import Session
 import logging
@@ -12,6 +22,30 @@ logger = logging.getLogger(__name__)
 # 最终在 `main.py` 里会挂到 `/books` 路径下（比如 `app.include_router(books.router, prefix="/books")`）
 router = APIRouter()
 
+# NDJSON 导出时每次发给客户端的行数（一行一本书），太小了发送次数多，太大了首字节慢、占内存
+EXPORT_CHUNK_LINES = 500
+
+
+# 图书目录的筛选参数（同步/异步路由共用）
+def book_filter(
+    author: str | None = Query(None, description="作者包含（不区分大小写）"),
+    title: str | None = Query(None, description="书名包含（不区分大小写）"),
+    available: bool | None = Query(None, description="true 只看可借的，false 只看已借出的"),
+) -> BookFilter:
+    return BookFilter(author=author, title=title, available=available)
+
+
+def to_ndjson_chunks(books: Iterable[Book]) -> Iterator[bytes]:
+    """把图书转成 NDJSON（每行一个 JSON），攒够 EXPORT_CHUNK_LINES 行发一次"""
+    lines = []
+    for book in books:
+        lines.append(serializer.dumps(book))  # Book 的字段就是 BookResponse 的字段，直接序列化
+        if len(lines) >= EXPORT_CHUNK_LINES:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
 
 @router.post("/", response_model=SuccessResponse, summary="添加图书")
 # `Depends`：FastAPI 的“依赖注入”工具（用来自动获取数据库连接）
@@ -27,6 +61,52 @@ def add_book(
     return SuccessResponse(message="图书添加成功")
 
 
+@router.post("/bulk", response_model=BookImportReportResponse, summary="批量导入图书（JSON Lines / CSV）")
+def import_books(
+    file: UploadFile = File(..., description="一行一本书：JSON Lines（isbn/title/author 字段）或带表头的 CSV"),
+    file_format: Literal["jsonl", "csv"] | None = Query(None, alias="format", description="不填按文件扩展名判断"),
+    on_conflict: Literal["skip", "update"] = Query(
+        "skip", description="isbn 已存在时：skip 跳过，update 更新书名和作者（借阅状态不变）"
+    ),
+    chunk_size: int = Query(settings.BOOK_IMPORT_CHUNK_SIZE, ge=1, le=10000, description="每批写入并提交的行数"),
+    db: Session = Depends(get_db),
+    service: LibraryService = Depends(get_library_service),
+):
+    # 上传的文件已经被 FastAPI 存到临时文件里（大了会落盘），这里逐行读，内存占用和文件大小无关
+    rows = read_book_rows(file.file, file_format or detect_format(file.filename))
+    # 每批单独提交（db.commit），出错只回滚那一批；行级错误都在返回的报告里
+    report = service.import_books(
+        rows,
+        update_existing=on_conflict == "update",
+        chunk_size=chunk_size,
+        commit=db.commit,
+        rollback=db.rollback,
+    )
+    return BookImportReportResponse.model_validate(report, from_attributes=True)
+
+
+# ⚠️ 要写在 /{isbn} 前面，否则 "export" 会被当成 isbn
+@router.get("/export", summary="导出图书目录（NDJSON 流）", response_class=StreamingResponse)
+def export_books(
+    filters: BookFilter = Depends(book_filter),
+    service: LibraryService = Depends(get_library_service),
+):
+    """一行一本书，边查边发：数据库按批读取（服务端游标），导出整个目录内存占用也是固定的"""
+    return StreamingResponse(to_ndjson_chunks(service.export_books(filters)), media_type="application/x-ndjson")
+
+
+# ⚠️ 同样要写在 /{isbn} 前面
+@router.get("/search", response_model=BookPageResponse, summary="全文搜索图书（书名、作者）")
+def search_books(
+    q: str = Query(..., min_length=1, max_length=100, description="关键词，多个词用空格分开（都要命中）；英文按前缀匹配"),
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: LibraryService = Depends(get_library_service),
+):
+    page = service.search_books(q, size=size, cursor=cursor)
+    return page_response(page.items, page.size, page.next_cursor)
+
+
 @router.get("/{isbn}", response_model=BookResponse, summary="根据 ISBN 获取图书")
 def get_book(isbn: str, service: LibraryService = Depends(get_library_service)):
     book = service.get_book_by_isbn(isbn)
@@ -35,9 +115,16 @@ def get_book(isbn: str, service: LibraryService = Depends(get_library_service)):
     return to_book_response(book)
 
 
-@router.get("/", response_model=list[BookResponse], summary="获取所有图书")
-def list_books(service: LibraryService = Depends(get_library_service)):
-    return [to_book_response(book) for book in service.get_all_books()]
+@router.get("/", response_model=BookPageResponse, summary="分页获取图书")
+def list_books(
+    filters: BookFilter = Depends(book_filter),
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: LibraryService = Depends(get_library_service),
+):
+    page = service.list_books(filters, size=size, cursor=cursor)
+    # Book（dataclass）直接序列化，不再逐行构造 BookResponse（见 api/responses.py）
+    return page_response(page.items, page.size, page.next_cursor)
 
 
 @router.put(
@@ -56,6 +143,48 @@ def update_book(
     return to_book_response(updated_book)
 
 
+# 删除接口的响应示例（同步/异步路由共用）
+DELETE_BOOK_RESPONSES = {
+    200: {
+        "description": "删除成功",
+        "content": {
+            "application/json": {
+                "example": {
+                    "code": 200,
+                    "message": "图书删除成功",
+                    "data": {"isbn": "999-0134685994"}
+                }
+            }
+        }
+    },
+    404: {
+        "description": "图书未找到",
+        "content": {
+            "application/json": {
+                "example": {
+                    "code": 404,
+                    "message": "图书不存在",
+                    "data": None
+                }
+            }
+        }
+    },
+    500: {
+        "description": "服务器错误",
+        "content": {
+            "application/json": {
+                "example": {
+                    "code": 500,
+                    "message": "服务器错误",
+                    "data": None
+                }
+            }
+        }
+        
+    }
+}
+
+
 @router.delete(
     "/{isbn}",
     summary="删除图书",
@@ -67,45 +196,7 @@ def update_book(
     - 该操作不可逆，请谨慎调用
     """,
     response_model=SuccessResponse,
-    responses={
-        200: {
-            "description": "删除成功",
-            "content": {
-                "application/json": {
-                    "example": {
-                        "code": 200,
-                        "message": "图书删除成功",
-                        "data": {"isbn": "999-0134685994"}
-                    }
-                }
-            }
-        },
-        404: {
-            "description": "图书未找到",
-            "content": {
-                "application/json": {
-                    "example": {
-                        "code": 404,
-                        "message": "图书不存在",
-                        "data": None
-                    }
-                }
-            }
-        },
-        500: {
-            "description": "服务器错误",
-            "content": {
-                "application/json": {
-                    "example": {
-                        "code": 500,
-                        "message": "服务器错误",
-                        "data": None
-                    }
-                }
-            }
-            
-        }
-    }
+    responses=DELETE_BOOK_RESPONSES,
 )
 def delete_book(
     isbn: str = Path(
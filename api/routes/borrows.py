@@ -1,64 +1,58 @@
-from fastapi import APIRouter, Depends, Query, BackgroundTasks
+import time
+from fastapi import APIRouter, Depends, Query
 from core.services import BorrowService
-from api.schemas import SuccessResponse, MyBorrowsResponse, BookBorrowResponse
-from api.dependencies import get_current_user, get_borrow_service, get_db
+from api.schemas import (
+    SuccessResponse, MyBorrowsResponse, BookBorrowResponse,
+    BulkBorrowRequest, BulkReturnRequest, CirculationItemResponse, CirculationResultResponse,
+)
+from core.dtos import CirculationResultDto, OutboxEventDto
+from core.interfaces import OutboxRepository
+from core.outbox import BORROW_CREATED, BORROW_RETURNED, circulation_events, event_key
+from api.dependencies import get_current_user, get_borrow_service, get_db, get_outbox
 from core.models import User
 from sqlalchemy.orm import Session
 import logging
-from utils.log_borrow_utils import log_borrow_event, log_borrow_to_db
-from utils.email_utils import send_email_163
-from tasks.tasks import send_email_task
+from utils.notification_digest import digest_task_id
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+# 借还事件（同步/异步路由共用）：返回 (发件箱事件, 通知的任务 ID)
+# 任务 ID 由这次请求的第一条借阅记录算出来，跟着事件进汇总器：不管这几本书进了哪封汇总邮件，用它都能查到那封邮件的状态
+def circulation_events_for(
+    user: User, topic: str, borrows: list[tuple[str, int]]
+) -> tuple[list[OutboxEventDto], str | None]:
+    task_id = digest_task_id(user.email, event_key(topic, borrows[0][1])) if user.email and borrows else None
+    return circulation_events(topic, user, borrows, time.time(), task_id), task_id
+
+
+def to_circulation_response(result: CirculationResultDto, task_id: str | None = None) -> CirculationResultResponse:
+    return CirculationResultResponse(
+        items=[CirculationItemResponse.model_validate(item, from_attributes=True) for item in result.items],
+        succeeded=result.succeeded,
+        failed=result.failed,
+        task_id=task_id,
+    )
+
+
 @router.post("/books/{isbn}/borrow", response_model=BookBorrowResponse, summary="借书")
 def borrow_book(
     isbn: str,
-    background_tasks: BackgroundTasks,  # ← 注入 BackgroundTasks,FastAPI 自动注入，无需手动创建
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),  # ← 自动从 request.state.db 拿
+    db: Session = Depends(get_db),  # ← 自动从 request.state.db_session 拿（第一次用到时才创建会话）
     service: BorrowService = Depends(get_borrow_service),
+    outbox: OutboxRepository = Depends(get_outbox),
 ):
     # 调用业务逻辑借书
     result = service.borrow_book(isbn, current_user.user_id)
 
-     # 异步任务实现日志记录: 将日志存到日志文件中
-     # ✅ 触发后台任务：记录日志
-    background_tasks.add_task(
-        log_borrow_event,
-        user_id = result.borrower_id,
-        book_id = result.book_isbn,
-        borrow_id = result.borrow_id   
-        
-    )
-
-    # 异步任务实现日志记录: 将日志存到数据库audit_logs表中
-    # ✅ 触发后台任务：记录日志到数据库
-    background_tasks.add_task(
-        log_borrow_to_db,
-        user_id = result.borrower_id,
-        book_id = result.book_isbn,
-        borrow_id = result.borrow_id   
-        
-    )
-
-    # 异步任务实现发送163邮件
-    email =current_user.email
-    if email:
-        # 异步任务实现发送163邮件
-        # `.delay()` 是 Celery 提供的方法，用来“立即提交”任务到队列，不等待执行。
-        # `.delay()` 是 `apply_async()` 的快捷方式，用于**异步提交任务**
-        # 返回的是 `AsyncResult` 对象，包含 `task_id`，可用于后续查询状态。
-        # 当你调用 `task.delay()` 时，返回的是一个 `AsyncResult` 对象：
-        # 它是一个**异步任务的“代理”或“句柄”**，让你可以在任务执行期间或之后查询其状态和结果。
-        task = send_email_task.delay(
-            to_email=email,
-            subject="图书借阅通知",
-            body=f"你好 {current_user.name}，你已成功借阅 ISBN: {result.book_isbn} 的图书。"
-        ) 
-        print("邮件异步任务已经发送，Task ID:", task.id)
+    # 副作用（借阅日志文件、audit_logs 表、通知邮件）写进发件箱，和借阅记录在同一个事务里提交，
+    # 由 relay 投递（见 infrastructure/outbox_relay.py）；借书失败回滚时什么都不会发出去
+    # task_id 是通知邮件的任务 ID：同一个读者一个时间窗口内的借还合并成一封（见 utils/notification_digest.py），
+    # 窗口结束、邮件发出后才有结果，在那之前查询状态是 PENDING
+    events, task_id = circulation_events_for(current_user, BORROW_CREATED, [(result.book_isbn, result.borrow_id)])
+    outbox.add_many(events)
     # 返回成功结果
     return BookBorrowResponse(
         borrow_id=result.borrow_id,
@@ -66,7 +60,7 @@ def borrow_book(
         borrower_id=result.borrower_id,
         borrowed_at=result.borrowed_at,
         due_date=result.due_date,
-        task_id=task.id
+        task_id=task_id
     )
 
 
@@ -75,31 +69,61 @@ def borrow_book(
 @router.patch("/{borrow_id}/return", response_model=SuccessResponse, summary="还书")
 def return_book(
     borrow_id: int,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     service: BorrowService = Depends(get_borrow_service),
     db: Session = Depends(get_db),
+    outbox: OutboxRepository = Depends(get_outbox),
 ):
     result = service.return_book(borrow_id, current_user.user_id)
-    # 异步任务实现发送163邮件
-    email =current_user.email
-    if email:
-        background_tasks.add_task(
-            send_email_163,
-            to_email=current_user.email, 
-            subject="图书还书通知",
-            body=f"你好 {current_user.name}，你已成功归还 ISBN: {result.book_isbn} 的图书。"
+    # 还书通知：和借阅通知一样走发件箱，合并到同一封汇总邮件里
+    events, _ = circulation_events_for(current_user, BORROW_RETURNED, [(result.book_isbn, result.borrow_id)])
+    outbox.add_many(events)
+    return SuccessResponse(message="还书成功", data=result)
+
+# 批量借书（借还书台）：一个请求、一个事务，每本书的结果分别返回；部分失败不影响其他书
+@router.post("/bulk/borrow", response_model=CirculationResultResponse, summary="批量借书")
+def borrow_books(
+    body: BulkBorrowRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    service: BorrowService = Depends(get_borrow_service),
+    outbox: OutboxRepository = Depends(get_outbox),
+):
+    result = service.borrow_books(body.isbns, current_user.user_id)
+    borrowed = [(item.book_isbn, item.borrow_id) for item in result.items if item.ok]
+    events, task_id = circulation_events_for(current_user, BORROW_CREATED, borrowed)
+    outbox.add_many(events)
+    return to_circulation_response(result, task_id)
 
-        )
 
-    return SuccessResponse(message="还书成功", data=result)
+@router.post("/bulk/return", response_model=CirculationResultResponse, summary="批量还书")
+def return_books(
+    body: BulkReturnRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    service: BorrowService = Depends(get_borrow_service),
+    outbox: OutboxRepository = Depends(get_outbox),
+):
+    result = service.return_books(body.borrow_ids, current_user.user_id)
+    returned = [(item.book_isbn, item.borrow_id) for item in result.items if item.ok]
+    events, _ = circulation_events_for(current_user, BORROW_RETURNED, returned)
+    outbox.add_many(events)
+    return to_circulation_response(result)
+
 
 # ✅ 使用 `Query(...)` 做参数校验：`page >= 1`, `1 <= size <= 100`
+# 支持两种分页：不传 cursor 时按 page 偏移分页；传了 cursor（上一页返回的 next_cursor）时按游标分页，page 被忽略
 @router.get("/me", response_model=MyBorrowsResponse, summary="查询我的借阅记录")
 def get_my_borrows(
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（偏移分页）"),
     size: int = Query(10, ge=1, le=100, description="每页记录数"),
+    cursor: str | None = Query(None, description="游标（上一页返回的 next_cursor），传入后使用游标分页"),
+    include_total: bool | None = Query(
+        None, description="是否返回总数；默认偏移分页返回、游标分页不返回"
+    ),
     current_user: User = Depends(get_current_user),
     service: BorrowService = Depends(get_borrow_service),
 ):
-    return service.get_my_borrows(current_user.user_id, page, size)
+    return service.get_my_borrows(
+        current_user.user_id, page, size, cursor=cursor, include_total=include_total
+    )
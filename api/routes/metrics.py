@@ -0,0 +1,71 @@
+# 内部监控接口（不出现在 /docs 里），给运维/监控系统拉取运行指标
+# 连接池、缓存、token 缓存这些内部状态不能谁都能看：每个接口都要带共享密钥（METRICS_TOKEN），没配置时整组接口关闭
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from core.exceptions import UnauthorizedException
+from core.password_hashing import password_hasher
+from core.token_cache import token_cache
+from infrastructure.book_cache import book_cache
+from infrastructure.connection import SessionLocal, engine
+from infrastructure.outbox_relay import current_relay
+from infrastructure.outbox_repository import SqlAlchemyOutboxRepository
+from infrastructure.pool_metrics import pool_stats
+from settings import settings
+
+
+def require_metrics_token(x_metrics_token: str | None = Header(None)) -> None:
+    """请求头 X-Metrics-Token 必须等于 settings.METRICS_TOKEN；没配置 METRICS_TOKEN 时返回 404，就像接口不存在"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_metrics_token is None or not secrets.compare_digest(
+        x_metrics_token.encode("utf-8"), settings.METRICS_TOKEN.encode("utf-8")
+    ):
+        raise UnauthorizedException("监控接口需要正确的 X-Metrics-Token")
+
+
+router = APIRouter(include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("/db-pool", summary="数据库连接池状态")
+def get_db_pool_stats():
+    """
+    当前 worker 进程的连接池状态：
+    - checked_out / checked_in / overflow：实时的已借出、空闲、溢出连接数
+    - checkouts / timeouts / avg_wait_ms / max_wait_ms：进程启动以来取连接的次数、超时次数和等待时间
+    timeouts 持续增长或 avg_wait_ms 偏高，说明 DB_POOL_SIZE + DB_MAX_OVERFLOW 相对并发量太小
+    """
+    stats = {"sync": pool_stats(engine.pool)}
+    if settings.DB_ASYNC:
+        from infrastructure.async_connection import async_engine
+        stats["async"] = pool_stats(async_engine.sync_engine.pool)
+    return stats
+
+
+@router.get("/book-cache", summary="图书目录缓存命中情况")
+def get_book_cache_stats():
+    """当前 worker 进程的图书缓存：一级缓存的 hits / misses / hit_rate / size，配置了 Redis 时还有二级缓存的命中情况"""
+    return {"enabled": settings.BOOK_CACHE_ENABLED, **book_cache.stats()}
+
+
+@router.get("/password-hashing", summary="密码哈希线程池状态")
+def get_password_hashing_stats():
+    """pending 经常接近 workers + max_queue、rejected 持续增长，说明登录/注册的并发超过了哈希池的容量"""
+    return password_hasher.stats()
+
+
+@router.get("/token-cache", summary="已验证 token 缓存命中情况")
+def get_token_cache_stats():
+    """get_current_user 的 token 缓存：命中时既不验签也不查数据库"""
+    return {"enabled": settings.TOKEN_CACHE_ENABLED, **token_cache.stats()}
+
+
+@router.get("/outbox", summary="发件箱积压和 relay 投递情况")
+def get_outbox_stats():
+    """
+    - pending：还没投递的事件数（outbox 表，所有进程共用）；持续增长说明 relay 跟不上或者一直投递失败
+    - relay：当前进程里 relay 的计数（delivered / dropped / audit_rows / failed_batches），relay 不在这个进程里跑时为 null
+    """
+    with SessionLocal() as session:
+        pending = SqlAlchemyOutboxRepository(session).count()
+    relay = current_relay()
+    return {"pending": pending, "relay": relay.stats() if relay is not None else None}
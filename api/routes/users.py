@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from core.services import LibraryService
-from api.schemas import UserRegisterSchema,UserResponse, to_user_response
+from api.schemas import UserRegisterSchema,UserResponse, UserBatchRequest, UserBatchResponse, UserPageResponse, to_user_response
+from api.responses import page_response, user_row
 from core.dtos import UserCreateDto
 from api.dependencies import get_library_service, get_db
-from core.security import get_password_hash
+from core.password_hashing import password_hasher
 import uuid
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
@@ -18,7 +19,7 @@ router = APIRouter()
 def create_user(user_in: UserRegisterSchema, 
                 db: Session = Depends(get_db),  
                 service: LibraryService = Depends(get_library_service)):
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = password_hasher.hash(user_in.password)  # 专用哈希线程池，排满了返回 503
     dto = UserCreateDto(
         user_id=str(uuid.uuid4()),
         username=user_in.username,
@@ -35,9 +36,11 @@ def create_user(user_in: UserRegisterSchema,
 @router.post("/token", summary="登录 - 获取 Token")
 def login_for_access_token(
     from_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db),
     service: LibraryService = Depends(get_library_service)
 ):
-    user = service.authenticate_user(from_data.username, from_data.password)
+    # 登录只读数据库：查完用户就 close 会话，校验密码期间不占数据库连接
+    user = service.authenticate_user(from_data.username, from_data.password, release_db=db.close)
     if not user:
         logger.warning(f"用户 {from_data.username} 登录失败，用户名或密码错误")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无法验证凭据", headers={"WWW-Authenticate": "Bearer"})
@@ -48,6 +51,14 @@ def login_for_access_token(
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires) # 通常用 username 或 user_id 作为 subject
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/batch", response_model=UserBatchResponse, summary="批量获取用户")
+def get_users_batch(body: UserBatchRequest, service: LibraryService = Depends(get_library_service)):
+    # 前端展示借阅列表时一次把借阅人都查出来，不要逐个调 GET /users/{username}
+    result = service.get_users_batch(body.user_ids, body.usernames)
+    return UserBatchResponse(
+        items=[to_user_response(user) for user in result.items], not_found=result.not_found
+    )
+
 @router.get("/{username}", response_model=UserResponse, summary="根据用户名获取用户")
 def get_user(username: str, service: LibraryService = Depends(get_library_service)):
     user = service.get_user_by_username(username)
@@ -55,8 +66,11 @@ def get_user(username: str, service: LibraryService = Depends(get_library_servic
         raise HTTPException(status_code=404, detail="用户不存在")
     return to_user_response(user)
 
-@router.get("/", response_model=list[UserResponse], summary="获取所有用户")
-def list_users(service: LibraryService = Depends(get_library_service)):
-    return [to_user_response(user) for user in service.get_all_users()]
-
-
+@router.get("/", response_model=UserPageResponse, summary="分页获取用户")
+def list_users(
+    size: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，不传则从第一页开始"),
+    service: LibraryService = Depends(get_library_service),
+):
+    page = service.list_users(size=size, cursor=cursor)
+    return page_response([user_row(user) for user in page.items], page.size, page.next_cursor)
@@ -35,6 +35,32 @@ class BookResponse(BaseModel):
     )
 
 
+class BookPageResponse(BaseModel):
+    items: list[BookResponse]
+    size: int
+    next_cursor: str | None = Field(
+        None, description="下一页游标，原样传给 cursor 参数即可翻页；没有更多数据时为 null"
+    )
+
+
+class BookImportErrorResponse(BaseModel):
+    line: int = Field(..., description="文件里的行号（从 1 开始，CSV 的第 1 行是表头）")
+    isbn: str | None
+    error: str
+
+
+class BookImportReportResponse(BaseModel):
+    total: int = Field(..., description="读到的数据行数")
+    inserted: int
+    updated: int = Field(..., description="已存在、按 on_conflict=update 更新的行数")
+    skipped: int = Field(..., description="已存在、按 on_conflict=skip 跳过的行数")
+    failed: int
+    errors: list[BookImportErrorResponse] = Field(..., description="出错的行（最多列出 BOOK_IMPORT_MAX_ERRORS 条）")
+    fatal_error: BookImportErrorResponse | None = Field(
+        None, description="文件读到这一行就读不下去了（编码、CSV 格式错误），之前的行已经导入，之后的没有"
+    )
+
+
 def to_book_response(book: Book) -> BookResponse:
     return BookResponse(
         isbn=book.isbn,
@@ -91,6 +117,28 @@ class UserResponse(BaseModel):
     # ✅ 不要包含 hashed_password —— domain 层和 API 层都不该接触密码哈希！
 
 
+# 批量查询用户：两种键可以混着传，每种最多 USER_BATCH_MAX_KEYS 个
+USER_BATCH_MAX_KEYS = 100
+
+
+class UserBatchRequest(BaseModel):
+    user_ids: list[str] = Field(default_factory=list, max_length=USER_BATCH_MAX_KEYS, description="按用户 ID 查")
+    usernames: list[str] = Field(default_factory=list, max_length=USER_BATCH_MAX_KEYS, description="按用户名查")
+
+
+class UserBatchResponse(BaseModel):
+    items: list[UserResponse] = Field(..., description="找到的用户，按请求顺序排列")
+    not_found: list[str] = Field(..., description="没找到的 ID / 用户名")
+
+
+class UserPageResponse(BaseModel):
+    items: list[UserResponse]
+    size: int
+    next_cursor: str | None = Field(
+        None, description="下一页游标，原样传给 cursor 参数即可翻页；没有更多数据时为 null"
+    )
+
+
 def to_user_response(user: User) -> UserResponse:
     return UserResponse(
         user_id=user.user_id,
@@ -120,10 +168,13 @@ class BorrowItemResponse(BaseModel):
 
 class MyBorrowsResponse(BaseModel):
     items: list[BorrowItemResponse]
-    total: int
-    page: int
+    total: int | None = Field(None, description="总记录数（未要求 include_total 时为 null）")
+    page: int | None = Field(None, description="当前页码（游标分页时为 null）")
     size: int
-    pages: int
+    pages: int | None = Field(None, description="总页数（未要求 include_total 时为 null）")
+    next_cursor: str | None = Field(
+        None, description="下一页游标，原样传给 cursor 参数即可翻页；没有更多数据时为 null"
+    )
 
 
 # 统一成功的响应模型
@@ -149,7 +200,38 @@ class BookBorrowResponse(BaseModel):
     borrower_id: str
     borrowed_at: datetime
     due_date: datetime
-    task_id: str
+    task_id: str | None = None  # 汇总通知邮件的异步任务 ID（用户没有邮箱时为 null；汇总窗口结束前状态是 PENDING）
+
+
+# 批量借书 / 批量还书（借还书台）：一次最多处理的条数
+CIRCULATION_BATCH_MAX_ITEMS = 50
+
+
+class BulkBorrowRequest(BaseModel):
+    isbns: list[str] = Field(..., min_length=1, max_length=CIRCULATION_BATCH_MAX_ITEMS, description="要借的图书 ISBN")
+
+
+class BulkReturnRequest(BaseModel):
+    borrow_ids: list[int] = Field(
+        ..., min_length=1, max_length=CIRCULATION_BATCH_MAX_ITEMS, description="要归还的借阅记录 ID"
+    )
+
+
+class CirculationItemResponse(BaseModel):
+    ok: bool
+    book_isbn: str | None = None
+    borrow_id: int | None = None
+    due_date: datetime | None = Field(None, description="借书成功时：应还日期")
+    is_overdue: bool | None = Field(None, description="还书成功时：是否逾期")
+    error_code: str | None = Field(None, description="失败原因，和单本接口的错误码一致")
+    error: str | None = None
+
+
+class CirculationResultResponse(BaseModel):
+    items: list[CirculationItemResponse] = Field(..., description="每一项的结果，和请求的顺序一致")
+    succeeded: int
+    failed: int
+    task_id: str | None = None  # 汇总通知邮件的异步任务 ID（没有成功项或用户没有邮箱时为 null；能查到包含这几本书的那封汇总邮件）
 
 
 # 异步任务返回响应模型
@@ -0,0 +1,110 @@
+# 图书全文搜索延迟：SQLite FTS5、纯 Python 倒排索引，以及以前的写法（LIKE 全表扫描 / 列表推导式逐本比较）
+# 运行：python -m benchmarks.bench_book_search [--rows 1000000] [--queries 200]
+# 数据是随机拼出来的中英文书名，词频按 Zipf 分布（SQLite 文件放在临时目录，跑完删除）
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from core.book_search import BookSearchIndex
+from core.models import Book
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, BookDB
+
+AUTHORS = "刘慈欣 余华 钱锺书 曹雪芹 吴承恩 Guido Knuth Fowler Martin Kernighan Ritchie".split()
+
+
+def _vocabulary(rng: random.Random) -> tuple[list[str], list[float]]:
+    """4000 个两字中文词 + 4000 个英文“单词”，词频按 Zipf 分布（少数热门词出现在很多书名里）"""
+    chars = [chr(0x4E00 + i) for i in rng.sample(range(0x5000), 600)]
+    syllables = [a + b for a in "bcdfghklmnprstvz" for b in "aeiou"]
+    words = {"".join(rng.sample(chars, 2)) for _ in range(4000)}
+    words |= {"".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(4000)}
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+
+def _books(rows: int, rng: random.Random, words: list[str], weights: list[float]):
+    for i in range(rows):
+        parts = rng.choices(words, weights, k=rng.randint(2, 5))
+        title = " ".join(p for p in parts if p.isascii()).title() + "".join(p for p in parts if not p.isascii())
+        yield Book(isbn=f"978-{i:09d}", title=title, author=rng.choice(AUTHORS))
+
+
+def _queries(count: int, rng: random.Random, words: list[str], weights: list[float]) -> list[str]:
+    """查询词也按词频抽（热门词被搜得多）；英文词只输入前 4 个字母（前缀匹配）"""
+    queries = []
+    for _ in range(count):
+        picked = rng.choices(words, weights, k=rng.choice((1, 1, 2)))
+        queries.append(" ".join(w[:4] if w.isascii() else w for w in picked))
+    return queries
+
+
+def _percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples) * 1000:8.2f} ms   p99 {p99 * 1000:8.2f} ms"
+
+
+def _measure(search, queries: list[str]) -> str:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200, help="每种实现跑多少次查询")
+    parser.add_argument("--size", type=int, default=20, help="每页条数")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    words, weights = _vocabulary(rng)
+    queries = _queries(args.queries, rng, words, weights)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        books = list(_books(args.rows, rng, words, weights))
+        start = time.perf_counter()
+        with sessionmaker(bind=engine)() as session:
+            repo = SqlAlchemyBookRepository(session)
+            for i in range(0, len(books), 5000):
+                repo.bulk_upsert(books[i : i + 5000])
+                session.commit()
+        print(f"{args.rows} 本书写入 SQLite（含 FTS5 索引）：{time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        index = BookSearchIndex(books)
+        print(f"纯 Python 倒排索引构建：{time.perf_counter() - start:.1f}s")
+
+        with sessionmaker(bind=engine)() as session:
+            repo = SqlAlchemyBookRepository(session)
+            print(f"{'SQLite FTS5':<26}{_measure(lambda q: repo.search(q, args.size), queries)}")
+
+            def like_scan(query: str):
+                stmt = select(BookDB)
+                for word in query.split():
+                    stmt = stmt.where(BookDB.title.icontains(word) | BookDB.author.icontains(word))
+                return session.scalars(stmt.order_by(BookDB.isbn).limit(args.size)).all()
+
+            print(f"{'SQLite LIKE 全表扫描':<22}{_measure(like_scan, queries)}")
+
+        print(f"{'Python 倒排索引':<23}{_measure(lambda q: index.search(q, args.size), queries)}")
+
+        def list_comprehension(query: str):  # api/main_json.py 以前 title 过滤的写法
+            return [b for b in books if query.lower() in b.title.lower()][: args.size]
+
+        print(f"{'列表推导式逐本比较':<21}{_measure(list_comprehension, queries)}")
+
+
+if __name__ == "__main__":
+    main()
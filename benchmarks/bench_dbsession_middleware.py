@@ -0,0 +1,144 @@
+# 对比旧的中间件栈（两个 BaseHTTPMiddleware：每个请求都建会话并 commit 的 DBSessionMiddleware + logging_middleware）
+# 和现在 api.main.app 的中间件栈（纯 ASGI 的 LoggingMiddleware + 懒加载的 DBSessionMiddleware）的吞吐量（requests/s）
+# 运行：python -m benchmarks.bench_dbsession_middleware [--requests 3000] [--concurrency 50]
+# 说明：
+# - 测的是真实的 api.main.app：路由、依赖项、异常处理、FastJSONResponse 都是真的；用 httpx 的 ASGITransport 在进程内调用，不含网络
+# - “legacy” 一列只把同一个 app 的中间件换回旧的两个，其他完全一样；“log via BaseHTTP” 一列只有日志中间件还是旧的
+# - speedup 是 current 相对 legacy（/books/export 相对 log via BaseHTTP）
+# - /books/export 没有 legacy 的数字：旧的 DBSessionMiddleware 在响应头返回后就 commit/close 会话，流式响应体还在用这个会话，
+#   会重新借一个连接且不再归还，几十个请求后连接池就耗尽了
+# - 数据库是临时目录里的 SQLite 文件；请求日志关掉（只比中间件本身，日志的开销见 benchmarks/bench_logging.py）
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+# 导入 api.main 之前先把环境准备好：它在导入时建表、（默认）启动 relay 线程，并在当前目录下建 data/
+_BENCH_DIR = tempfile.mkdtemp()
+os.chdir(_BENCH_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_BENCH_DIR, 'bench.db')}"
+os.environ["DB_ASYNC"] = "false"
+os.environ["OUTBOX_RELAY_ENABLED"] = "false"
+
+import httpx
+from fastapi import Request
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.main import app
+from infrastructure.connection import SessionLocal
+from infrastructure.models import BookDB
+from middleware import logging_middleware
+from middleware.dbsession_middleware import DBSessionMiddleware
+
+
+# 旧实现（原样保留，仅用于对比）：每个请求都创建会话并 commit
+class LegacyDBSessionMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, session_factory):
+        super().__init__(app)
+        self.session_factory = session_factory
+
+    async def dispatch(self, request, call_next):
+        db = self.session_factory()
+        request.state.db_session = _EagerSession(db)  # 现在的 get_db 从 db_session 取会话
+        try:
+            response = await call_next(request)
+            db.commit()
+            return response
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class _EagerSession:
+    def __init__(self, session):
+        self.session = session
+
+    def get(self):
+        return self.session
+
+
+async def _legacy_logging_middleware(request: Request, call_next):
+    start_time = time.time()
+    response = await call_next(request)
+    process_time = time.time() - start_time
+    logging_middleware.logger.info(
+        "请求处理完成",
+        extra={
+            "event": "HTTP_REQUEST",
+            "method": request.method,
+            "url": str(request.url),
+            "status_code": response.status_code,
+            "process_time": round(process_time, 3)
+        }
+    )
+    return response
+
+
+LEGACY_MIDDLEWARE = [
+    Middleware(BaseHTTPMiddleware, dispatch=_legacy_logging_middleware),  # 旧代码里它最后添加，在最外层
+    Middleware(LegacyDBSessionMiddleware, session_factory=SessionLocal),
+]
+LEGACY_LOGGING_ONLY = [
+    Middleware(BaseHTTPMiddleware, dispatch=_legacy_logging_middleware),
+    Middleware(DBSessionMiddleware, session_factory=SessionLocal),
+]
+
+
+def _use_middleware(middleware: list[Middleware]) -> None:
+    app.user_middleware = middleware
+    app.middleware_stack = None  # 下一个请求时按新的列表重新构建
+
+
+def _seed() -> None:
+    with SessionLocal() as session:
+        session.add_all(BookDB(isbn=f"bench-{i}", title=f"压测 {i}", author="bench") for i in range(200))
+        session.commit()
+
+
+async def _run(path: str, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        assert (await client.get(path)).status_code == 200  # 预热
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path)
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    _seed()
+    logging_middleware.logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # httpx 每个请求也记一条 INFO
+    current = list(app.user_middleware)
+
+    print(f"{'path':<18}{'legacy rps':>12}{'log via BaseHTTP rps':>22}{'current rps':>13}{'speedup':>9}")
+    # /docs：不碰数据库；/books/bench-1：只读查询；/books/export：流式响应
+    for path in ["/docs", "/books/bench-1", "/books/export"]:
+        rps = {}
+        for name, middleware in [("legacy", LEGACY_MIDDLEWARE), ("logging", LEGACY_LOGGING_ONLY), ("current", current)]:
+            if name == "legacy" and path == "/books/export":
+                continue
+            _use_middleware(middleware)
+            rps[name] = asyncio.run(_run(path, args.requests, args.concurrency))
+        baseline = rps.get("legacy", rps["logging"])
+        legacy = f"{rps['legacy']:.0f}" if "legacy" in rps else "—"
+        print(f"{path:<18}{legacy:>12}{rps['logging']:>22.0f}{rps['current']:>13.0f}{rps['current'] / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
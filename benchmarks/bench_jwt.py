@@ -0,0 +1,68 @@
+# JWT 签发/校验吞吐量：每个后端 × 每个算法，以及以前的写法（python-jose，每次调用都传密钥字符串）
+# 运行：python -m benchmarks.bench_jwt [--seconds 1]
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from core.jwt_codec import BACKENDS, available_backends
+
+SECRET = "bench-secret-key-with-at-least-32-bytes"
+
+
+def _private_pem(algorithm: str) -> str:
+    if algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        key = ec.generate_private_key(ec.SECP256R1())
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def _ops_per_second(fn, seconds: float) -> int:
+    count, start = 0, time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            fn()
+        count += 50
+    return int(count / (time.perf_counter() - start))
+
+
+def _legacy_jose(seconds: float) -> tuple[int, int]:
+    """以前 core/security.py 的写法"""
+    from jose import jwt
+
+    claims = {"sub": "alice", "exp": datetime.now(timezone.utc) + timedelta(minutes=30)}
+    token = jwt.encode(claims, SECRET, algorithm="HS256")
+    encode = _ops_per_second(lambda: jwt.encode(claims, SECRET, algorithm="HS256"), seconds)
+    decode = _ops_per_second(lambda: jwt.decode(token=token, key=SECRET, algorithms=["HS256"]), seconds)
+    return encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0, help="每项测多久")
+    args = parser.parse_args()
+
+    print(f"{'backend':<14}{'algorithm':<10}{'encode/s':>12}{'decode/s':>12}")
+    encode, decode = _legacy_jose(args.seconds)
+    print(f"{'jose (旧写法)':<12}{'HS256':<10}{encode:>12}{decode:>12}")
+    for backend in available_backends():
+        for algorithm in ("HS256", "ES256", "EdDSA"):
+            if backend == "jose" and algorithm == "EdDSA":
+                continue
+            key = SECRET if algorithm == "HS256" else _private_pem(algorithm)
+            codec = BACKENDS[backend](algorithm, signing_key=key)
+            claims = {"sub": "alice", "exp": datetime.now(timezone.utc) + timedelta(minutes=30)}
+            token = codec.encode(claims)
+            encode = _ops_per_second(lambda: codec.encode(claims), args.seconds)
+            decode = _ops_per_second(lambda: codec.decode(token), args.seconds)
+            print(f"{backend:<14}{algorithm:<10}{encode:>12}{decode:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# 请求日志的开销：logging_middleware 每个请求记一条 HTTP_REQUEST 日志，请求路径上要多花多少微秒
+# 对比以前的写法（BaseHTTPMiddleware、请求线程里同步写 stdout、python-json-logger 缩进 2 格、每条 strftime）和现在的写法：
+# 纯 ASGI 中间件 + 同步一行 JSON、异步队列（LOG_ASYNC）、异步队列 + 采样（LOG_HTTP_SAMPLE_RATE）
+# 运行：python -m benchmarks.bench_logging [--requests 20000] [--sample-rate 0.1]
+# 说明：直接调用中间件（里面的应用立即返回一个空响应），只测中间件和日志本身；日志写到临时文件，模拟重定向到文件/管道的 stdout
+# legacy 一行包含 BaseHTTPMiddleware 本身的开销（no logging 一行是不经过任何中间件的空应用）
+# 队列的变体：测请求路径时先不启动后台线程，测完再启动、等它写完 ——“请求路径”一列只算调用方线程上的开销，
+# “写完”一列是总开销（异步只是把格式化和写文件移出了请求路径，总的活并没有少；真实服务里后台线程在请求等 I/O 时运行，
+# 但同样要抢 GIL，CPU 打满时收益会变小，这时靠采样减少日志量）
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import tempfile
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.logger import JsonLineFormatter, _EnqueueHandler
+from middleware import logging_middleware as middleware
+from settings import settings
+
+
+# 旧实现（原样保留，仅用于对比）
+def _legacy_formatter() -> logging.Formatter:
+    from pythonjsonlogger import jsonlogger
+
+    class CustomJsonFormatter(jsonlogger.JsonFormatter):
+        def add_fields(self, log_dict, record, message_dict):
+            super().add_fields(log_dict, record, message_dict)
+            if not log_dict.get('timestamp'):
+                log_dict['timestamp'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            if log_dict.get('level'):
+                log_dict['level'] = log_dict['level'].upper()
+            else:
+                log_dict['level'] = record.levelname
+            log_dict['env'] = settings.APP_ENV
+
+    return CustomJsonFormatter(
+        '%(timestamp)s %(level)s %(name)s %(message)s %(event)s', json_ensure_ascii=False, json_indent=2
+    )
+
+
+async def _legacy_middleware(request: Request, call_next):
+    start_time = time.time()
+    response = await call_next(request)
+    process_time = time.time() - start_time
+    middleware.logger.info(
+        "请求处理完成",
+        extra={
+            "event": "HTTP_REQUEST",
+            "method": request.method,
+            "url": str(request.url),
+            "status_code": response.status_code,
+            "process_time": round(process_time, 3)
+        }
+    )
+    return response
+
+
+def _scope() -> dict:
+    return {
+        "type": "http", "method": "GET", "path": "/books/978-7-111-1", "query_string": b"page=1&size=20",
+        "headers": [(b"host", b"bench")], "scheme": "http", "server": ("bench", 80),
+    }
+
+
+async def _app(scope, receive, send):
+    await Response(status_code=200)(scope, receive, send)
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _run(handle, requests: int) -> float:
+    """返回请求路径上每个请求的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        await handle(_scope(), _receive, _send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def _measure(name: str, handle, handler: logging.Handler | None, listener, requests: int, sample_rate: float, path: str):
+    logger = middleware.logger
+    logger.handlers[:] = [handler] if handler is not None else []
+    settings.LOG_HTTP_SAMPLE_RATE = sample_rate
+    start = time.perf_counter()
+    per_request = asyncio.run(_run(handle, requests))
+    if listener is not None:
+        listener.start()
+        listener.stop()  # 等队列写完
+    for output in (listener.handlers if listener is not None else [handler] if handler is not None else []):
+        output.flush()
+        output.close()
+    total = (time.perf_counter() - start) / requests * 1e6
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    print(f"{name:<28}{per_request:>14.1f}{total:>12.1f}{size / 1024 / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+
+    def output(name: str, formatter: logging.Formatter) -> tuple[logging.Handler, str]:
+        path = os.path.join(directory, f"{name}.log")
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(formatter)
+        return handler, path
+
+    print(f"{'variant':<28}{'请求路径 µs':>12}{'写完 µs':>10}{'日志 MB':>9}")
+    _measure("no logging", _app, None, None, args.requests, 1.0, "")
+
+    handler, path = output("legacy", _legacy_formatter())
+    legacy = BaseHTTPMiddleware(_app, dispatch=_legacy_middleware)
+    _measure("legacy (sync, indent=2)", legacy, handler, None, args.requests, 1.0, path)
+
+    handler, path = output("sync", JsonLineFormatter())
+    _measure("sync json line", middleware.LoggingMiddleware(_app), handler, None, args.requests, 1.0, path)
+
+    for name, rate in [("queue", 1.0), (f"queue + sample {args.sample_rate:g}", args.sample_rate)]:
+        handler, path = output(name.replace(" ", "_"), JsonLineFormatter())
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, handler)
+        _measure(
+            name, middleware.LoggingMiddleware(_app), _EnqueueHandler(log_queue), listener, args.requests, rate, path
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# 登录风暴：大量并发 POST /users/token，同时不停地请求一个不相干的同步接口（/ping）
+# 对比“不限流”（相当于以前：每个登录请求都在 FastAPI 线程池里直接算 argon2）和有界哈希池：
+#   - 登录的吞吐量、成功/503 数量、延迟
+#   - /ping 的延迟（线程池被登录请求占满时，其他同步接口也得排队）
+#   - 进程峰值内存（每个并发哈希约 64 MiB）
+# 运行：python -m benchmarks.bench_login_storm [--logins 200] [--concurrency 100]
+# 每种模式在单独的子进程里跑（哈希池按环境变量配置，峰值内存也互不影响）
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {
+    # 以前的行为：并发哈希数只受 FastAPI 线程池（40）限制，排队没有上限
+    "unbounded": {"PASSWORD_HASH_WORKERS": "40", "PASSWORD_HASH_MAX_QUEUE": "1000000"},
+    # 默认配置：线程数按内存预算算，排队满了返回 503
+    "bounded": {},
+}
+
+
+def _percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _build_app():
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from api.routes import users
+    from core.security import get_password_hash
+    from infrastructure.models import Base, UserDB
+    from middleware.dbsession_middleware import DBSessionMiddleware
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as session:
+        session.add(UserDB(
+            user_id="bench", username="bench", name="bench", email="bench@example.com",
+            hashed_password=get_password_hash("secret"), is_active=True,
+        ))
+        session.commit()
+
+    app = FastAPI()
+    app.add_middleware(DBSessionMiddleware, session_factory=factory)
+    app.include_router(users.router, prefix="/users")
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def _storm(logins: int, concurrency: int) -> dict:
+    import httpx
+
+    app = _build_app()
+    transport = httpx.ASGITransport(app=app)
+    login_latency, ping_latency, statuses = [], [], {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        remaining = iter(range(logins))
+        storm_running = True
+
+        async def login_worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.post("/users/token", data={"username": "bench", "password": "secret"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    login_latency.append(time.perf_counter() - start)
+
+        async def ping_worker():
+            while storm_running:
+                start = time.perf_counter()
+                await client.get("/ping")
+                ping_latency.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        pinger = asyncio.create_task(ping_worker())
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        storm_running = False
+        await pinger
+        elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "ok": statuses.get(200, 0),
+        "rejected_503": statuses.get(503, 0),
+        "login_p50_ms": round(_percentile(login_latency, 0.5) * 1000),
+        "login_p99_ms": round(_percentile(login_latency, 0.99) * 1000),
+        "ping_p99_ms": round(_percentile(ping_latency, 0.99) * 1000),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_storm(args.logins, args.concurrency))))
+        return
+
+    columns = ["elapsed_s", "ok", "rejected_503", "login_p50_ms", "login_p99_ms", "ping_p99_ms", "peak_rss_mb"]
+    print(f"{'mode':<12}" + "".join(f"{c:>15}" for c in columns))
+    for mode, env in MODES.items():
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_login_storm", "--child",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            env={**os.environ, **env}, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<12}" + "".join(f"{result[c]:>15}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# 响应序列化：GET /books/ 翻完 10 万本书的目录、GET /books/export 导出整个目录，以及只算序列化的耗时
+# 对比以前的写法（每行构造 BookResponse → response_model 校验并转成 dict → json.dumps）和现在的写法（dataclass 直接交给 orjson）
+# 运行：python -m benchmarks.bench_serialization [--rows 100000] [--size 100]
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi import Depends, FastAPI, Query
+from fastapi.responses import JSONResponse
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.dependencies import get_library_service
+from api.responses import FastJSONResponse
+from api.routes import books
+from api.schemas import BookPageResponse, to_book_response
+from core.dtos import BookFilter
+from core.models import Book
+from core.serialization import BACKENDS, available_backends
+from core.services import LibraryService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+
+def _legacy_app(service_dependency) -> FastAPI:
+    """以前的 GET /books/ 和 /books/export：每行一个 BookResponse，默认 JSONResponse（标准库 json）"""
+    app = FastAPI()
+
+    @app.get("/books/", response_model=BookPageResponse)
+    def list_books(size: int = Query(20), cursor: str | None = Query(None), service=Depends(service_dependency)):
+        page = service.list_books(BookFilter(), size=size, cursor=cursor)
+        return BookPageResponse(
+            items=[to_book_response(book) for book in page.items], size=page.size, next_cursor=page.next_cursor
+        )
+
+    @app.get("/books/export")
+    def export_books(service=Depends(service_dependency)):
+        from fastapi.responses import StreamingResponse
+
+        def chunks():
+            lines = []
+            for book in service.export_books(BookFilter()):
+                lines.append(to_book_response(book).model_dump_json())
+                if len(lines) >= books.EXPORT_CHUNK_LINES:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return app
+
+
+def _current_app(service_dependency) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_library_service] = service_dependency
+    return app
+
+
+async def _walk_catalog(client: httpx.AsyncClient, size: int) -> tuple[float, int]:
+    """按游标翻完整个目录，返回 (耗时, 请求数)"""
+    start, requests, cursor = time.perf_counter(), 0, None
+    while True:
+        params = {"size": size} if cursor is None else {"size": size, "cursor": cursor}
+        cursor = (await client.get("/books/", params=params)).json()["next_cursor"]
+        requests += 1
+        if cursor is None:
+            return time.perf_counter() - start, requests
+
+
+async def _export(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    async with client.stream("GET", "/books/export") as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return time.perf_counter() - start
+
+
+async def _measure(app: FastAPI, size: int) -> tuple[float, int, float]:
+    """直接调用 ASGI 应用（不走网络、不用 TestClient 的线程）"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        seconds, requests = await _walk_catalog(client, size)
+        return seconds, requests, await _export(client)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--size", type=int, default=100, help="GET /books/ 每页条数（接口上限 100）")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    rows = [Book(isbn=f"978-{i:09d}", title=f"图书 {i} 号：Python 从入门到实践", author="某作者") for i in range(args.rows)]
+
+    print(f"只算序列化 {args.rows} 行（不含数据库、HTTP）")
+    start = time.perf_counter()
+    # FastAPI 对 response_model 做的事：校验返回值，再 model_dump(mode="json")，最后 JSONResponse 用 json.dumps
+    page = BookPageResponse(items=[to_book_response(book) for book in rows], size=len(rows), next_cursor=None)
+    JSONResponse(BookPageResponse.model_validate(page).model_dump(mode="json"))
+    print(f"  {'BookResponse + json (旧写法)':<32}{(time.perf_counter() - start) * 1000:8.0f} ms")
+    for backend in available_backends():
+        serializer = BACKENDS[backend]()
+        start = time.perf_counter()
+        serializer.dumps({"items": rows})
+        print(f"  {'dataclass + ' + backend:<32}{(time.perf_counter() - start) * 1000:8.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as session:
+            repo = SqlAlchemyBookRepository(session)
+            for i in range(0, len(rows), 5000):
+                repo.bulk_upsert(rows[i : i + 5000])
+            session.commit()
+
+        session = sessionmaker(bind=engine)()
+
+        def service():
+            return LibraryService(user_repo=SqlAlchemyUserRepository(session), book_repo=SqlAlchemyBookRepository(session))
+
+        print(f"HTTP（ASGI，SQLite 文件，{args.rows} 本书；两种写法交替跑 {args.rounds} 轮，取最快的一轮）")
+        apps = {"旧写法": _legacy_app(service), "现在": _current_app(service)}
+        results = {name: [] for name in apps}
+        for _ in range(args.rounds):
+            for name, app in apps.items():
+                results[name].append(asyncio.run(_measure(app, args.size)))
+        for name, runs in results.items():
+            seconds, requests = min((seconds, requests) for seconds, requests, _ in runs)
+            export_seconds = min(export for _, _, export in runs)
+            print(
+                f"  {name:<6} GET /books/?size={args.size} 翻完目录：{seconds:6.2f} s"
+                f"（{seconds / requests * 1000:.2f} ms/请求）   GET /books/export：{export_seconds:6.2f} s"
+            )
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# 模拟多个 uvicorn worker（多进程）同时借书/还书，对比 SQLite 默认配置和性能模式（WAL 等 PRAGMA）
+# 运行：python -m benchmarks.bench_sqlite_concurrency [--workers 4] [--ops 300] [--busy-timeout-ms 0]
+# 说明：每个进程有自己的引擎和连接（和多 worker 部署一样），每次借/还都是一个独立事务（和一个请求一样）；
+#      统计总吞吐量（ops/s）和 "database is locked" 错误次数
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from core.services import BorrowService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
+from infrastructure.connection import build_engine_kwargs, enable_sqlite_performance_mode
+from infrastructure.models import Base, BookDB
+from settings import settings
+
+
+def _prepare_db(path: str, workers: int) -> None:
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **build_engine_kwargs(url))
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        # 每个 worker 借自己的那本书，避免业务上的冲突（BookNotAvailableError），只测数据库层的锁竞争
+        session.add_all(BookDB(isbn=f"bench-{i}", title=f"压测{i}", author="bench") for i in range(workers))
+        session.commit()
+    engine.dispose()
+
+
+def _worker(path: str, index: int, ops: int, performance_mode: bool, busy_timeout_ms: int, results) -> None:
+    logging.disable(logging.INFO)  # 借书的业务日志会淹没输出，也会影响计时
+    url = f"sqlite:///{path}"
+    kwargs = build_engine_kwargs(url)
+    # sqlite3 默认 timeout=5s（即 busy_timeout=5000），这里按参数覆盖，方便观察锁等待的影响
+    kwargs["connect_args"]["timeout"] = busy_timeout_ms / 1000
+    settings.SQLITE_BUSY_TIMEOUT_MS = busy_timeout_ms  # 性能模式的 PRAGMA busy_timeout 也用同一个值
+    engine = create_engine(url, **kwargs)
+    if performance_mode:
+        enable_sqlite_performance_mode(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    isbn, user_id = f"bench-{index}", f"user-{index}"
+    done = locked = 0
+    for _ in range(ops):
+        with factory() as session:
+            service = BorrowService(
+                book_repo=SqlAlchemyBookRepository(session),
+                borrow_repo=SqlAlchemyBorrowRepository(session),
+            )
+            try:
+                borrow = service.borrow_book(isbn, user_id)
+                session.commit()
+                service.return_book(borrow.borrow_id, user_id)
+                session.commit()
+                done += 2
+            except OperationalError as e:
+                session.rollback()
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+                _release_book(session, isbn)
+    engine.dispose()
+    results.put((done, locked))
+
+
+def _release_book(session, isbn: str) -> None:
+    """借书成功、还书失败时把书还回去，保证下一轮还能借；这一步本身也可能遇到锁，重试到成功为止"""
+    while True:
+        try:
+            session.query(BookDB).filter_by(isbn=isbn).update({"is_borrowed": False, "borrowed_by": None})
+            session.commit()
+            return
+        except OperationalError:
+            session.rollback()
+            time.sleep(0.001)
+
+
+def run(workers: int, ops: int, performance_mode: bool, busy_timeout_ms: int) -> tuple[float, int]:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    _prepare_db(path, workers)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_worker, args=(path, i, ops, performance_mode, busy_timeout_ms, results))
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    totals = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+    return sum(done for done, _ in totals) / elapsed, sum(locked for _, locked in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=300, help="每个 worker 的借+还轮数")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<18}{'ops/s':>10}{'locked errors':>16}")
+    for name, performance_mode in [("default", False), ("performance", True)]:
+        ops_per_sec, locked = run(args.workers, args.ops, performance_mode, args.busy_timeout_ms)
+        print(f"{name:<18}{ops_per_sec:>10.0f}{locked:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# argon2 参数校准：在部署的机器上测出“单次哈希大约 target-ms 毫秒”的参数
+# 参数越大越难暴力破解，但登录越慢、越占内存；合适的值取决于 CPU 和内存，不能写死。
+# 做法（和 argon2 官方建议一致）：
+# 1. memory_cost 先取内存预算（--max-memory-mib）
+# 2. time_cost 从 1 开始往上加，直到单次哈希的中位耗时达到目标
+# 3. 如果 time_cost=1 都超过目标，就把 memory_cost 减半再试（最低 MIN_MEMORY_MIB）
+# 运行：python -m core.argon2_calibration [--target-ms 250] [--max-memory-mib 64] [--parallelism 1]
+# 输出的几行直接贴到 .env；改完参数后，老用户下次登录会自动用新参数重新哈希
+import argparse
+import statistics
+import time
+
+from passlib.hash import argon2
+
+# OWASP 建议的 argon2id 最低内存（19 MiB）
+MIN_MEMORY_MIB = 19
+MAX_TIME_COST = 20
+
+
+def measure_ms(time_cost: int, memory_cost_kib: int, parallelism: int, samples: int = 5) -> float:
+    """用给定参数哈希 samples 次，返回耗时中位数（毫秒）"""
+    handler = argon2.using(rounds=time_cost, memory_cost=memory_cost_kib, parallelism=parallelism)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, max_memory_mib: int, parallelism: int, samples: int = 5) -> dict:
+    memory_mib = max_memory_mib
+    while True:
+        memory_cost_kib = memory_mib * 1024
+        elapsed = measure_ms(1, memory_cost_kib, parallelism, samples)
+        if elapsed <= target_ms or memory_mib <= MIN_MEMORY_MIB:
+            break
+        memory_mib = max(MIN_MEMORY_MIB, memory_mib // 2)
+
+    time_cost = 1
+    # 耗时和 time_cost 基本成正比；停在“再加 1 就超过目标”的位置
+    while time_cost < MAX_TIME_COST:
+        next_elapsed = measure_ms(time_cost + 1, memory_cost_kib, parallelism, samples)
+        if next_elapsed > target_ms:
+            break
+        time_cost, elapsed = time_cost + 1, next_elapsed
+
+    return {
+        "time_cost": time_cost,
+        "memory_cost_kib": memory_cost_kib,
+        "parallelism": parallelism,
+        "median_ms": round(elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测出本机合适的 argon2 参数")
+    parser.add_argument("--target-ms", type=float, default=250, help="单次哈希的目标耗时（毫秒）")
+    parser.add_argument("--max-memory-mib", type=int, default=64, help="单次哈希最多用多少内存（MiB）")
+    parser.add_argument("--parallelism", type=int, default=1, help="单次哈希用几个线程（argon2 的 lanes）")
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    result = calibrate(args.target_ms, args.max_memory_mib, args.parallelism, args.samples)
+    print(f"# 单次哈希中位耗时约 {result['median_ms']} ms")
+    print(f"ARGON2_TIME_COST={result['time_cost']}")
+    print(f"ARGON2_MEMORY_COST_KIB={result['memory_cost_kib']}")
+    print(f"ARGON2_PARALLELISM={result['parallelism']}")
+
+
+if __name__ == "__main__":
+    main()
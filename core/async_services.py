@@ -0,0 +1,303 @@
+# 异步版本的 LibraryService / BorrowService（settings.DB_ASYNC=True 时使用）
+# 业务规则和 core/services.py 完全一致，只是依赖的是 Async*Repository，每次访问仓储都要 await。
+# ⚠️ 改业务规则时，两边要一起改！
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from datetime import datetime, timedelta, timezone
+
+from core.models import Book, User, BorrowRecord
+from core.interfaces import AsyncUserRepository, AsyncBookRepository, AsyncBorrowRepository
+from core.dtos import (
+    UserCreateDto, ReturnBookDto, BorrowBookDto, MyBorrowDto, BookFilter, BookPageDto, UserPageDto, UserBatchDto,
+    BookImportReportDto, CirculationResultDto,
+)
+from core.book_import import BookImportRow, iter_chunks, dedupe_chunk, count_chunk, fail_chunk
+from settings import settings
+from core.password_hashing import password_hasher
+from core.pagination import decode_cursor, decode_key_cursor, decode_offset_cursor
+from core.services import (
+    BORROW_DURATION_DAYS, normalize_page_args, build_my_borrows, build_book_page, build_user_page, build_user_batch,
+    build_search_page,
+    build_borrow_results, check_returnable, build_return_results,
+)
+from core.exceptions import (
+    BookNotFoundError,
+    BookNotAvailableError,
+    BorrowRecordNotFoundError,
+    PermissionError,
+    BookAlreadyReturnError,
+    UsernameExistsError,
+    BookExistsError,
+)
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+
+class AsyncLibraryService:
+    # 图书相关方法
+    def __init__(self, user_repo: AsyncUserRepository, book_repo: AsyncBookRepository):
+        self.book_repo = book_repo
+        self.user_repo = user_repo
+
+    async def add_book(self, book: Book) -> None:
+        existing = await self.book_repo.get_by_isbn(book.isbn)
+        if existing:
+            raise BookExistsError(book.isbn)
+        return await self.book_repo.save(book)
+
+    async def get_book_by_isbn(self, isbn: str) -> Book:
+        return await self.book_repo.get_by_isbn(isbn)
+
+    async def get_all_books(self) -> list[Book]:
+        return await self.book_repo.get_all()
+
+    async def list_books(self, filters: BookFilter, size: int = 20, cursor: str | None = None) -> BookPageDto:
+        after_isbn = decode_key_cursor(cursor) if cursor else None
+        books = await self.book_repo.get_page(filters, size + 1, after_isbn)
+        return build_book_page(books, size)
+
+    async def search_books(self, query: str, size: int = 20, cursor: str | None = None) -> BookPageDto:
+        offset = decode_offset_cursor(cursor) if cursor else 0
+        if offset >= settings.BOOK_SEARCH_MAX_RESULTS:
+            return BookPageDto(items=[], size=size)
+        books = await self.book_repo.search(query, size + 1, offset)
+        return build_search_page(books, size, offset)
+
+    async def export_books(self, filters: BookFilter, batch_size: int = 500) -> AsyncIterator[Book]:
+        """
+        导出（异步版）：不能把同步的服务端游标跨 await 用，这里改成按 isbn 一批一批地 keyset 查询，
+        内存占用同样只和 batch_size 有关
+        """
+        after_isbn = None
+        while True:
+            books = await self.book_repo.get_page(filters, batch_size, after_isbn)
+            for book in books:
+                yield book
+            if len(books) < batch_size:
+                return
+            after_isbn = books[-1].isbn
+
+    async def import_books(
+        self,
+        rows: Iterable[BookImportRow],
+        update_existing: bool = False,
+        chunk_size: int = 1000,
+        commit: Callable[[], Awaitable[None]] | None = None,
+        rollback: Callable[[], Awaitable[None]] | None = None,
+    ) -> BookImportReportDto:
+        report = BookImportReportDto()
+        max_errors = settings.BOOK_IMPORT_MAX_ERRORS
+        for chunk in iter_chunks(rows, chunk_size, report, max_errors):
+            books = dedupe_chunk(chunk, update_existing)
+            try:
+                existing = await self.book_repo.bulk_upsert(books, update_existing)
+                if commit is not None:
+                    await commit()
+            except Exception as e:
+                logger.exception(f"批量导入图书：第 {chunk[0].line}-{chunk[-1].line} 行写入失败")
+                if rollback is not None:
+                    await rollback()
+                fail_chunk(report, chunk, e, max_errors)
+                continue
+            count_chunk(report, chunk, books, existing, update_existing)
+        return report
+
+    async def update_book(self, book: Book) -> None:
+        existing = await self.book_repo.get_by_isbn(book.isbn)
+        if not existing:
+            raise BookNotFoundError(book.isbn)
+        return await self.book_repo.save(book)
+
+    async def delete_book(self, isbn: str) -> bool:
+        return await self.book_repo.delete(isbn)
+
+    # 用户相关方法
+    async def add_user(self, user_create: UserCreateDto) -> User:
+        username = user_create.username
+        existing_user = await self.user_repo.get_by_username(username)
+        if existing_user:
+            raise UsernameExistsError(username)
+        return await self.user_repo.add(user_create)
+
+    async def get_user_by_id(self, user_id: str) -> User:
+        return await self.user_repo.get_by_id(user_id)
+
+    async def get_all_users(self) -> list[User]:
+        return await self.user_repo.get_all()
+
+    async def get_user_by_username(self, username: str) -> User:
+        return await self.user_repo.get_by_username(username)
+
+    async def list_users(self, size: int = 20, cursor: str | None = None) -> UserPageDto:
+        after_username = decode_key_cursor(cursor) if cursor else None
+        users = await self.user_repo.get_page(size + 1, after_username)
+        return build_user_page(users, size)
+
+    async def get_users_batch(self, user_ids: list[str], usernames: list[str]) -> UserBatchDto:
+        by_id = await self.user_repo.get_many_by_ids(user_ids) if user_ids else []
+        by_username = await self.user_repo.get_many_by_usernames(usernames) if usernames else []
+        return build_user_batch(user_ids, by_id, usernames, by_username)
+
+    async def authenticate_user(
+        self, username: str, password: str, release_db: Callable[[], Awaitable[None]] | None = None
+    ) -> User:
+        user = await self.user_repo.get_by_username(username)
+        if not user:
+            return None
+        # 同 LibraryService.authenticate_user：哈希之前先把数据库连接还回去
+        if release_db is not None:
+            await release_db()
+        # argon2 是 CPU 密集型计算，放到专用的哈希线程池里执行，不能卡住事件循环
+        valid, new_hash = await password_hasher.verify_and_update_async(password, user.hashed_password)
+        if not valid:
+            return None
+        if new_hash is not None:
+            # 哈希参数升级：用新参数重新哈希后存回去（同 LibraryService.authenticate_user）
+            await self.user_repo.update_password_hash(user.user_id, new_hash)
+            user.hashed_password = new_hash
+        return user
+
+
+class AsyncBorrowService:
+    def __init__(self, book_repo: AsyncBookRepository, borrow_repo: AsyncBorrowRepository):
+        self.book_repo = book_repo
+        self.borrow_repo = borrow_repo
+
+    # 借书
+    async def borrow_book(self, isbn: str, borrower_id: str) -> BorrowBookDto:
+        # 1. 条件更新：只有“存在且未借出”的书才会被标记为借出（原子操作，并发借同一本书不会都成功）
+        book = await self.book_repo.mark_borrowed(isbn, borrower_id)
+        if book is None:
+            # 2. 更新失败，才多查一次，区分“书不存在”和“已被借出”
+            existing = await self.book_repo.get_by_isbn(isbn)
+            if not existing:
+                raise BookNotFoundError(isbn)
+            raise BookNotAvailableError(isbn, existing.title)
+
+        # 3. 创建借阅记录
+        now = datetime.now(timezone.utc)
+        due_date = now + timedelta(days=BORROW_DURATION_DAYS)
+        borrow = BorrowRecord(
+            id=None,
+            book_isbn=book.isbn,
+            borrower_id=borrower_id,
+            borrowed_at=now,
+            due_date=due_date,
+        )
+
+        # 4. 保存借阅记录（图书状态已经在第 1 步更新好了）
+        saved_borrow = await self.borrow_repo.create(borrow)
+
+        logger.info(
+            "用户借了一本书",
+            extra={
+                "event": "BOOK_BORROWED",
+                "user_id": borrower_id,
+                "book_isbn": isbn,
+                "book_title": book.title,
+                "borrow_date": str(datetime.now(timezone.utc).date()),
+            }
+        )
+
+        # 5. 返回结果
+        return BorrowBookDto(
+            borrow_id=saved_borrow.id,
+            book_isbn=saved_borrow.book_isbn,
+            borrower_id=saved_borrow.borrower_id,
+            borrowed_at=saved_borrow.borrowed_at,
+            due_date=saved_borrow.due_date,
+        )
+
+    # 还书
+    async def return_book(self, borrow_id: int, current_user_id: str) -> ReturnBookDto:
+        # 1. 查找借阅记录
+        borrow = await self.borrow_repo.get_by_id(borrow_id)
+        if not borrow:
+            raise BorrowRecordNotFoundError(borrow_id)
+        # 2. 【关键】权限校验：是否属于当前用户？
+        if borrow.borrower_id != current_user_id:
+            raise PermissionError(current_user_id, borrow.borrower_id)
+        # 3.检查是否归还
+        if borrow.is_returned:
+            raise BookAlreadyReturnError(borrow_id)
+        # 4.检查是否逾期
+        now = datetime.now(timezone.utc)
+        is_overdue = now > borrow.due_date
+
+        # 5. 更新借阅记录
+        borrow.returned_at = now
+        borrow.is_returned = True
+        borrow.is_overdue = is_overdue
+
+        # 6. 保存借阅记录
+        await self.borrow_repo.save(borrow)
+
+        # 7.更新图书的状态，释放图书
+        # 一条 UPDATE 只改 is_borrowed/borrowed_by：不能先 get_by_isbn 再 save，
+        # 缓存里的那份可能是旧的，save 会把别人刚改的书名、作者写回旧值
+        await self.book_repo.release_many([borrow.book_isbn])
+
+        # 8. 返回借阅记录
+        return ReturnBookDto(
+            borrow_id=borrow.id,
+            book_isbn=borrow.book_isbn,
+            returned_at=now,
+            is_overdue=is_overdue,
+        )
+
+    # 批量借书（规则和 BorrowService.borrow_books 一致）
+    async def borrow_books(self, isbns: list[str], borrower_id: str) -> CirculationResultDto:
+        isbns = list(dict.fromkeys(isbns))
+        borrowed = {book.isbn: book for book in await self.book_repo.mark_many_borrowed(isbns, borrower_id)}
+        now = datetime.now(timezone.utc)
+        due_date = now + timedelta(days=BORROW_DURATION_DAYS)
+        records = await self.borrow_repo.create_many([
+            BorrowRecord(id=None, book_isbn=isbn, borrower_id=borrower_id, borrowed_at=now, due_date=due_date)
+            for isbn in isbns if isbn in borrowed
+        ])
+        missing = [isbn for isbn in isbns if isbn not in borrowed]
+        existing = {book.isbn: book for book in await self.book_repo.get_many_by_isbns(missing)} if missing else {}
+        logger.info(
+            "用户批量借书",
+            extra={"event": "BOOKS_BORROWED", "user_id": borrower_id, "book_isbns": list(borrowed)},
+        )
+        return build_borrow_results(isbns, records, existing)
+
+    # 批量还书（规则和 BorrowService.return_books 一致）
+    async def return_books(self, borrow_ids: list[int], current_user_id: str) -> CirculationResultDto:
+        borrow_ids = list(dict.fromkeys(borrow_ids))
+        borrows = {borrow.id: borrow for borrow in await self.borrow_repo.get_many_by_ids(borrow_ids)}
+        now = datetime.now(timezone.utc)
+        errors = check_returnable(borrow_ids, borrows, current_user_id)
+        valid_ids = [borrow_id for borrow_id in borrow_ids if borrow_id not in errors]
+        overdue_ids = {borrow_id for borrow_id in valid_ids if now > borrows[borrow_id].due_date}
+        returned = await self.borrow_repo.mark_many_returned(valid_ids, now, overdue_ids)
+        await self.book_repo.release_many(
+            [borrows[borrow_id].book_isbn for borrow_id in valid_ids if borrow_id in returned]
+        )
+        return build_return_results(borrow_ids, borrows, errors, returned, overdue_ids)
+
+    async def get_my_borrows(
+        self,
+        user_id: str,
+        page: int = 1,
+        size: int = 10,
+        cursor: str | None = None,
+        include_total: bool | None = None,
+    ) -> MyBorrowDto:
+        """分页规则同 BorrowService.get_my_borrows"""
+        page, size = normalize_page_args(page, size)
+        if include_total is None:
+            include_total = cursor is None
+
+        if cursor is not None:
+            borrows = await self.borrow_repo.get_borrows_by_user_after(
+                user_id, size + 1, decode_cursor(cursor)
+            )
+            total = await self.borrow_repo.count_by_user(user_id) if include_total else None
+            return build_my_borrows(borrows[:size], total, None, size, len(borrows) > size)
+
+        borrows, total = await self.borrow_repo.get_borrows_by_user(
+            user_id, page, size, include_total=include_total
+        )
+        has_more = len(borrows) == size and (total is None or page * size < total)
+        return build_my_borrows(borrows, total, page, size, has_more)
@@ -0,0 +1,202 @@
+# 批量导入图书（POST /books/bulk 和命令行共用）
+# 以前只能一本一本 POST /books/：每本书先查一次是否存在、保存时再查一次，导入几十万本要几个小时。
+# 现在：
+# - 流式读取 JSON Lines 或 CSV（一行一本书），内存占用和文件大小无关
+# - 每 chunk_size 本一批：一条 IN 查询 + 一条多行 INSERT ... ON CONFLICT，每批单独提交
+#   （一批出错只影响这一批，前面的已经提交；不会有一个几十万行的大事务）
+# - 每一行的错误（缺字段、JSON 格式错误、整批写入失败）都记在报告里，带行号；
+#   文件读到一半读不下去（编码不对、CSV 格式错误）也不会 500：停在那一行，返回已经导入的部分和 fatal_error
+# 命令行：python -m core.book_import books.jsonl [--format csv] [--on-conflict update] [--chunk-size 1000]
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from core.dtos import BookImportErrorDto, BookImportReportDto
+from core.exceptions import InvalidImportFileError
+from core.models import Book
+
+FORMATS = ("jsonl", "csv")
+REQUIRED_FIELDS = ("isbn", "title", "author")
+
+
+@dataclass
+class BookImportRow:
+    line: int
+    book: Book | None  # 解析失败时为 None
+    isbn: str | None = None
+    error: str | None = None
+
+
+def detect_format(filename: str | None) -> str:
+    """按扩展名猜格式：.csv 是 CSV，其他（.jsonl / .ndjson / .json）按 JSON Lines 处理"""
+    return "csv" if filename and filename.lower().endswith(".csv") else "jsonl"
+
+
+def read_book_rows(stream: BinaryIO, fmt: str) -> Iterator[BookImportRow]:
+    """逐行解析上传的文件，一行一个 BookImportRow（空行跳过）"""
+    if fmt == "jsonl":
+        return _read_jsonl(stream)
+    if fmt == "csv":
+        return _read_csv(stream)
+    raise InvalidImportFileError(f"不支持的格式：{fmt}，可选 {', '.join(FORMATS)}")
+
+
+def _read_jsonl(stream: BinaryIO) -> Iterator[BookImportRow]:
+    for line_no, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:  # 包括 UnicodeDecodeError
+            yield BookImportRow(line=line_no, book=None, error=f"JSON 格式错误：{e}")
+            continue
+        if not isinstance(record, dict):
+            yield BookImportRow(line=line_no, book=None, error="每一行必须是一个 JSON 对象")
+            continue
+        yield _to_row(line_no, record)
+
+
+def _read_csv(stream: BinaryIO) -> Iterator[BookImportRow]:
+    # utf-8-sig：兼容 Excel 导出的带 BOM 的 CSV
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    # 表头在这里就读出来校验：表头不对是整个文件的问题，调用方直接返回 400，一本都不导入
+    try:
+        fieldnames = reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as e:
+        text.detach()
+        raise InvalidImportFileError(f"读不出 CSV 表头：{e}") from e
+    missing = [name for name in REQUIRED_FIELDS if name not in fieldnames]
+    if missing:
+        text.detach()
+        raise InvalidImportFileError(f"CSV 表头缺少字段：{', '.join(missing)}")
+    return _read_csv_records(reader, text)
+
+
+def _read_csv_records(reader: csv.DictReader, text: io.TextIOWrapper) -> Iterator[BookImportRow]:
+    # 读到一半出错（编码不对、CSV 格式错误）时抛 InvalidImportFileError，带上行号，
+    # import_books 把它记在报告里，前面已经提交的批次不受影响
+    try:
+        for record in reader:
+            yield _to_row(reader.line_num, record)
+    except UnicodeDecodeError as e:
+        line = reader.line_num + 1
+        raise InvalidImportFileError(f"文件不是 UTF-8 编码（第 {line} 行附近）", line=line) from e
+    except csv.Error as e:
+        line = reader.line_num
+        raise InvalidImportFileError(f"CSV 格式错误（第 {line} 行）：{e}", line=line) from e
+    finally:
+        text.detach()  # 不要关掉调用方的文件
+
+
+def _to_row(line_no: int, record: dict) -> BookImportRow:
+    isbn = record.get("isbn")
+    values = {}
+    for name in REQUIRED_FIELDS:
+        value = record.get(name)
+        if not isinstance(value, str) or not value.strip():
+            return BookImportRow(
+                line=line_no, book=None, isbn=isbn if isinstance(isbn, str) else None, error=f"缺少字段 {name}"
+            )
+        values[name] = value.strip()
+    return BookImportRow(line=line_no, book=Book(**values), isbn=values["isbn"])
+
+
+# ───────────────────────────────
+# 下面几个函数同步/异步 LibraryService.import_books 共用
+# ───────────────────────────────
+def iter_chunks(
+    rows: Iterable[BookImportRow], chunk_size: int, report: BookImportReportDto, max_errors: int
+) -> Iterator[list[BookImportRow]]:
+    """
+    把解析成功的行攒成一批一批；解析失败的行直接记到报告里
+    文件读到一半就读不下去（InvalidImportFileError）时记成 report.fatal_error，已经攒好的行照样写入，后面的不再读
+    """
+    chunk = []
+    try:
+        for row in rows:
+            report.total += 1
+            if row.book is None:
+                add_error(report, row.line, row.isbn, row.error, max_errors)
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    except InvalidImportFileError as e:
+        report.fatal_error = BookImportErrorDto(line=e.line or 0, isbn=None, error=e.detail)
+    if chunk:
+        yield chunk
+
+
+def dedupe_chunk(chunk: list[BookImportRow], update_existing: bool) -> list[Book]:
+    """
+    同一批里 isbn 重复时只留一条（一条 INSERT ... ON CONFLICT DO UPDATE 不能改同一行两次）：
+    跳过模式留第一条（和“已存在就跳过”一致），更新模式留最后一条（和“后写的覆盖先写的”一致）
+    """
+    books = {}
+    for row in chunk:
+        if update_existing or row.book.isbn not in books:
+            books[row.book.isbn] = row.book
+    return list(books.values())
+
+
+def count_chunk(
+    report: BookImportReportDto, chunk: list[BookImportRow], books: list[Book], existing: set[str], update_existing: bool
+) -> None:
+    """一批写入成功后计数；被 dedupe_chunk 去掉的重复行算作“已存在”"""
+    inserted = len(books) - len(existing)
+    report.inserted += inserted
+    if update_existing:
+        report.updated += len(chunk) - inserted
+    else:
+        report.skipped += len(chunk) - inserted
+
+
+def fail_chunk(report: BookImportReportDto, chunk: list[BookImportRow], error: Exception, max_errors: int) -> None:
+    for row in chunk:
+        add_error(report, row.line, row.isbn, f"写入失败：{error}", max_errors)
+
+
+def add_error(report: BookImportReportDto, line: int, isbn: str | None, error: str, max_errors: int) -> None:
+    report.failed += 1
+    if len(report.errors) < max_errors:
+        report.errors.append(BookImportErrorDto(line=line, isbn=isbn, error=error))
+
+
+def main():
+    import argparse
+    from dataclasses import asdict
+
+    from core.services import LibraryService
+    from infrastructure.book_repository import SqlAlchemyBookRepository
+    from infrastructure.connection import SessionLocal
+    from infrastructure.user_repository import SqlAlchemyUserRepository
+    from settings import settings
+
+    parser = argparse.ArgumentParser(description="从 JSON Lines / CSV 文件批量导入图书")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="不填按扩展名判断")
+    parser.add_argument("--on-conflict", choices=("skip", "update"), default="skip", help="isbn 已存在时跳过还是更新")
+    parser.add_argument("--chunk-size", type=int, default=settings.BOOK_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with SessionLocal() as session, open(args.path, "rb") as f:
+        service = LibraryService(
+            user_repo=SqlAlchemyUserRepository(session), book_repo=SqlAlchemyBookRepository(session)
+        )
+        report = service.import_books(
+            read_book_rows(f, args.format or detect_format(args.path)),
+            update_existing=args.on_conflict == "update",
+            chunk_size=args.chunk_size,
+            commit=session.commit,
+            rollback=session.rollback,
+        )
+    print(json.dumps(asdict(report), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# 图书全文搜索（GET /books/search）：分词规则 + 纯 Python 倒排索引
+# 分词规则数据库和内存实现共用，保证同一个查询在哪种存储上结果都一样：
+# - 字母数字连续的一段是一个词（先做全角转半角、转小写）："Python3" → python3，查询时按前缀匹配（"pyth" 能搜到）
+# - 中文没有空格，按相邻两个字（bigram）切："三体地球" → 三体 体地 地球 球
+#   查询时多字的词必须按顺序相邻出现（短语匹配），等价于“包含这段文字”；单字按前缀匹配
+#   （每段末尾单独补一个字，这样单字查询也能命中结尾的那个字）
+# - 一个查询里的多个词是 AND 关系，书名或作者里出现都算
+# - 排序：命中书名的词多的在前；一样多时书名短的在前（书名越短，关键词占的比重越大），再按 rank_key
+# 数据库实现见 infrastructure/book_search_index.py；JSON / 内存仓库用下面的 BookSearchIndex
+import bisect
+import hashlib
+import heapq
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+from core.models import Book
+
+# 查询里最多取前几个词，防止超长查询拖慢搜索
+MAX_QUERY_TERMS = 8
+
+# 中日韩文字：平假名/片假名、CJK 统一表意文字（含扩展 A）、韩文音节、兼容表意文字
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|([^\W_{_CJK}]+)")
+
+
+@dataclass(frozen=True)
+class SearchTerm:
+    text: str  # 原始的一段：一个词或一段连续的中文
+    tokens: tuple[str, ...]  # 多个时必须按顺序相邻出现
+    prefix: bool  # 最后一个 token 是否前缀匹配
+
+
+def rank_key(isbn: str, title: str) -> int:
+    """
+    同分时的排序键：高 15 位是书名长度，低 48 位是 isbn 的哈希（同样长的书名打散，不偏向某个号段）
+    SQLite 上直接拿它当 FTS5 表的 rowid：FTS5 按 rowid 顺序产出命中，也就是书名短的先出来（见 infrastructure/book_search_index.py）
+    """
+    digest = hashlib.blake2b(isbn.encode("utf-8"), digest_size=6).digest()
+    return min(len(title), 0x7FFF) << 48 | int.from_bytes(digest, "big")
+
+
+def normalize(text: str) -> str:
+    """全角转半角（NFKC）+ 小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def index_tokens(text: str) -> list[str]:
+    """建索引用的分词，按出现顺序（短语匹配依赖顺序）"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(normalize(text)):
+        if word:
+            tokens.append(word)
+        else:
+            tokens.extend(cjk[i : i + 2] for i in range(len(cjk) - 1))
+            tokens.append(cjk[-1])
+    return tokens
+
+
+def query_terms(query: str) -> list[SearchTerm]:
+    """把查询拆成 AND 关系的若干项；没有可搜索的字符时返回空列表"""
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(normalize(query))[:MAX_QUERY_TERMS]:
+        if word:
+            terms.append(SearchTerm(text=word, tokens=(word,), prefix=True))
+        elif len(cjk) == 1:
+            terms.append(SearchTerm(text=cjk, tokens=(cjk,), prefix=True))
+        else:
+            bigrams = tuple(cjk[i : i + 2] for i in range(len(cjk) - 1))
+            terms.append(SearchTerm(text=cjk, tokens=bigrams, prefix=False))
+    return terms
+
+
+class BookSearchIndex:
+    """
+    JSON / 内存仓库用的倒排索引：token -> isbn 集合，书名和作者分开存（打分要区分）
+    前缀匹配在排好序的词表上用 bisect 找到范围，不用遍历所有词
+    """
+
+    def __init__(self, books: list[Book] = ()):
+        self._books: dict[str, Book] = {}
+        self._texts: dict[str, tuple[str, str]] = {}  # isbn -> (规范化的书名, 规范化的作者)，短语匹配时核对
+        self._order: dict[str, int] = {}  # isbn -> rank_key
+        self._postings: tuple[dict[str, set[str]], dict[str, set[str]]] = ({}, {})  # (书名, 作者)
+        self._vocabulary: list[str] = []  # 两个字段所有 token，排好序
+        for book in books:
+            self.add(book)
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def add(self, book: Book) -> None:
+        """新增或更新一本书（书名、作者没变时什么都不做）"""
+        old = self._books.get(book.isbn)
+        if old is not None and (old.title, old.author) == (book.title, book.author):
+            self._books[book.isbn] = book
+            return
+        if old is not None:
+            self.remove(book.isbn)
+        self._books[book.isbn] = book
+        self._texts[book.isbn] = (normalize(book.title), normalize(book.author))
+        self._order[book.isbn] = rank_key(book.isbn, book.title)
+        for postings, text in zip(self._postings, (book.title, book.author)):
+            for token in set(index_tokens(text)):
+                if token not in self._postings[0] and token not in self._postings[1]:
+                    bisect.insort(self._vocabulary, token)
+                postings.setdefault(token, set()).add(book.isbn)
+
+    def remove(self, isbn: str) -> None:
+        book = self._books.pop(isbn, None)
+        if book is None:
+            return
+        del self._texts[isbn]
+        del self._order[isbn]
+        for postings, text in zip(self._postings, (book.title, book.author)):
+            for token in set(index_tokens(text)):
+                isbns = postings[token]
+                isbns.discard(isbn)
+                if not isbns:
+                    del postings[token]
+                    if token not in self._postings[0] and token not in self._postings[1]:
+                        del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        """按相关度排序（规则见文件开头），取 [offset, offset + limit)"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        candidates = None
+        title_hits = []  # 每个词在书名里命中的 isbn
+        for term in terms:
+            in_title = self._match(term, 0)
+            matched = in_title | self._match(term, 1)
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+            title_hits.append(in_title)
+
+        # 按命中书名的词数分桶，从多到少每个桶里按 rank_key 取前几本，凑够 offset + limit 本就停（不用给每本书排序）
+        if len(title_hits) == 1:
+            buckets = [title_hits[0] & candidates, candidates - title_hits[0]]
+        else:
+            counts = Counter()
+            for in_title in title_hits:
+                counts.update(in_title & candidates)
+            by_count = {}
+            for isbn in candidates:
+                by_count.setdefault(counts[isbn], []).append(isbn)
+            buckets = [by_count[count] for count in sorted(by_count, reverse=True)]
+        ranked = []
+        for bucket in buckets:
+            ranked += heapq.nsmallest(offset + limit - len(ranked), bucket, key=self._order.__getitem__)
+            if len(ranked) >= offset + limit:
+                break
+        return [self._books[isbn] for isbn in ranked[offset : offset + limit]]
+
+    def _match(self, term: SearchTerm, field: int) -> set[str]:
+        postings = self._postings[field]
+        if term.prefix:
+            vocabulary, prefix = self._vocabulary, term.tokens[0]
+            matched = set()
+            i = bisect.bisect_left(vocabulary, prefix)
+            while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+                matched |= postings.get(vocabulary[i], set())
+                i += 1
+            return matched
+        sets = sorted((postings.get(token, set()) for token in term.tokens), key=len)
+        matched = set(sets[0]).intersection(*sets[1:])
+        if len(term.tokens) > 1:
+            # 每个 bigram 都出现不代表它们相邻，再核对一次原文
+            matched = {isbn for isbn in matched if term.text in self._texts[isbn][field]}
+        return matched
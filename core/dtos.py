@@ -1,5 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from .models import Book, User
 
 @dataclass
 class UserCreateDto:
@@ -57,13 +58,97 @@ class BorrowRecordDto:
             raise ValueError("图书已归还")
         self.returned_at = datetime.now(timezone.utc)
 
+# 分页结果：偏移分页时 page 有值；游标分页时 page 为 None
+# total/pages 只有在需要总数（include_total）时才会计算，否则为 None
 @dataclass
 class MyBorrowDto:
     items: list[BorrowRecordDto]
-    total: int
-    page: int
+    total: int | None
+    page: int | None
     size: int
-    pages: int
+    pages: int | None
+    next_cursor: str | None = None  # 下一页游标，没有更多数据时为 None
 
 
     
+
+
+# 图书目录的筛选条件（都是可选的，None 表示不过滤）
+@dataclass(frozen=True)
+class BookFilter:
+    author: str | None = None  # 作者包含（不区分大小写）
+    title: str | None = None  # 书名包含（不区分大小写）
+    available: bool | None = None  # True：只看可借的；False：只看已借出的
+
+
+# 图书目录分页结果（按 isbn 的游标分页）
+@dataclass
+class BookPageDto:
+    items: list[Book]
+    size: int
+    next_cursor: str | None = None  # 下一页游标，没有更多数据时为 None
+
+
+# 批量借书 / 批量还书：每一项的结果
+@dataclass
+class CirculationItemDto:
+    ok: bool
+    book_isbn: str | None = None
+    borrow_id: int | None = None
+    due_date: datetime | None = None  # 借书成功时
+    is_overdue: bool | None = None  # 还书成功时
+    error_code: str | None = None  # 失败时：和单本接口的业务异常 code 一致（BOOK_NOT_AVAILABLE 等）
+    error: str | None = None
+
+
+@dataclass
+class CirculationResultDto:
+    items: list[CirculationItemDto]  # 和请求的顺序一致
+    succeeded: int
+    failed: int
+
+
+# 批量导入图书：一行的错误（line 是文件里的行号，从 1 开始；CSV 的第 1 行是表头）
+@dataclass
+class BookImportErrorDto:
+    line: int
+    isbn: str | None
+    error: str
+
+
+# 批量导入图书的结果
+@dataclass
+class BookImportReportDto:
+    total: int = 0  # 读到的数据行数
+    inserted: int = 0
+    updated: int = 0  # 已存在且 on_conflict=update
+    skipped: int = 0  # 已存在且 on_conflict=skip
+    failed: int = 0
+    errors: list[BookImportErrorDto] = field(default_factory=list)  # 最多 BOOK_IMPORT_MAX_ERRORS 条，failed 是总数
+    fatal_error: BookImportErrorDto | None = None  # 文件读到一半就读不下去了，后面的行没有导入
+
+
+# 用户列表分页结果（按 username 的游标分页）
+@dataclass
+class UserPageDto:
+    items: list[User]
+    size: int
+    next_cursor: str | None = None
+
+
+# 批量查询用户的结果：找到的用户按请求顺序排列，找不到的原样列在 not_found 里
+@dataclass
+class UserBatchDto:
+    items: list[User]
+    not_found: list[str]
+
+
+# 事务性发件箱（outbox）里的一条事件：和业务数据在同一个事务里写入，提交后由 relay 投递
+# key 是去重键（如 "borrow_created:42"）：投递是“至少一次”，下游按它识别重复
+@dataclass
+class OutboxEventDto:
+    topic: str
+    key: str
+    payload: dict
+    id: int | None = None
+    attempts: int = 0  # 第几次投递（relay 领取时加 1）
@@ -10,6 +10,16 @@ class UnauthorizedException(HTTPException):
         )
 
 
+class ServiceOverloadedException(HTTPException):
+    """服务过载（比如密码哈希线程池排满了）：返回 503，让客户端过一会儿再试"""
+    def __init__(self, detail_msg: str = "服务繁忙，请稍后重试", retry_after_seconds: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail_msg,
+            headers={"Retry-After": str(retry_after_seconds)},
+        )
+
+
 # 所有业务异常的基类
 class BusinessException(Exception):
     """所有业务异常的基类"""
@@ -71,6 +81,14 @@ class BookAlreadyReturnError(BusinessException):
             detail=f"borrow_id={borrow_id}",
         )
 
+class InvalidCursorError(BusinessException):
+    def __init__(self, cursor: str):
+        super().__init__(
+            code="INVALID_CURSOR",
+            message="分页游标无效",
+            detail=f"cursor={cursor}",
+        )
+
 # 用户业务
 class UsernameExistsError(BusinessException):
     def __init__(self, username: str):
@@ -89,6 +107,15 @@ class BookExistsError(BusinessException):
             detail=f"isbn={isbn}",
         )
 
+class InvalidImportFileError(BusinessException):
+    def __init__(self, reason: str, line: int | None = None):
+        super().__init__(
+            code="INVALID_IMPORT_FILE",
+            message="导入文件格式不正确",
+            detail=reason,
+        )
+        self.line = line  # 读到第几行出的错（表头之类的文件级错误为 None）
+
 # - 异常自带 **错误码（code）**，前端可做 switch 判断
 # - `message` 给用户看，`detail` 给开发者看（日志用）
 # - 继承关系清晰，便于全局捕获
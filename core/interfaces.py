@@ -1,7 +1,9 @@
 #  第二步：定义抽象接口（`core/interfaces.py`）
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from datetime import datetime
 from .models import Book, User, BorrowRecord
-from .dtos import UserCreateDto
+from .dtos import BookFilter, OutboxEventDto, UserCreateDto
 
 class BookRepository(ABC):
     @abstractmethod
@@ -23,6 +25,41 @@ class BookRepository(ABC):
     @abstractmethod
     def get_all_available(self) -> list[Book]:
         pass
+    @abstractmethod
+    def mark_borrowed(self, isbn: str, borrower_id: str) -> Book | None:
+        """原子地把一本“未借出”的书标记为借出；书不存在或已被借出时返回 None，不做任何修改"""
+        pass
+    @abstractmethod
+    def get_page(self, filters: BookFilter, limit: int, after_isbn: str | None = None) -> list[Book]:
+        """按 isbn 排序的一页图书（keyset 分页：只取 isbn > after_isbn 的），筛选条件在数据库里执行"""
+        pass
+    @abstractmethod
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        """全文搜索书名和作者（分词规则见 core/book_search.py），按相关度排序；查询里没有可搜索的字符时返回空列表"""
+        pass
+    @abstractmethod
+    def iter_books(self, filters: BookFilter, batch_size: int = 500) -> Iterator[Book]:
+        """逐条产出符合条件的图书，内部按批从数据库取（内存占用和总数无关），用于导出"""
+        pass
+    @abstractmethod
+    def bulk_upsert(self, books: list[Book], update_existing: bool = False) -> set[str]:
+        """
+        批量写入（isbn 不能重复）：已存在的书 update_existing=True 时更新书名和作者（借阅状态不动），否则跳过
+        返回写入前就已存在的 isbn
+        """
+        pass
+    @abstractmethod
+    def get_many_by_isbns(self, isbns: list[str]) -> list[Book]:
+        """一次查询取多本书（IN），不存在的跳过，不保证顺序"""
+        pass
+    @abstractmethod
+    def mark_many_borrowed(self, isbns: list[str], borrower_id: str) -> list[Book]:
+        """mark_borrowed 的批量版（一条 UPDATE）：返回成功标记为借出的书，不存在或已被借出的不在里面"""
+        pass
+    @abstractmethod
+    def release_many(self, isbns: list[str]) -> None:
+        """批量把书标记为未借出（还书用，一条 UPDATE）"""
+        pass
 class UserRepository(ABC):
     @abstractmethod
     def add(self, user: UserCreateDto) -> User:
@@ -36,6 +73,21 @@ class UserRepository(ABC):
     @abstractmethod
     def get_by_username(self, username: str) -> User | None:
         pass
+    @abstractmethod
+    def get_many_by_ids(self, user_ids: list[str]) -> list[User]:
+        """一次查询取多个用户（IN），不存在的 id 直接跳过，不保证顺序"""
+        pass
+    @abstractmethod
+    def get_many_by_usernames(self, usernames: list[str]) -> list[User]:
+        pass
+    @abstractmethod
+    def get_page(self, limit: int, after_username: str | None = None) -> list[User]:
+        """按 username 排序，取 after_username 之后的 limit 条（游标分页）"""
+        pass
+    @abstractmethod
+    def update_password_hash(self, user_id: str, hashed_password: str) -> None:
+        """保存重新计算过的密码哈希（登录时哈希参数升级用）"""
+        pass
 
 class BorrowRepository(ABC):
     @abstractmethod
@@ -49,8 +101,141 @@ class BorrowRepository(ABC):
     def save(self, borrow_record: BorrowRecord) -> None:
         pass
 
-    # 返回：元组(记录列表, 总数量)
+    # 返回：元组(记录列表, 总数量)；include_total=False 时不查总数，总数量为 None
+    @abstractmethod
+    def get_borrows_by_user(self, user_id: str, page: int = 1, size: int = 10, include_total: bool = True) -> tuple[list[BorrowRecord], int | None]:
+        pass
+
+    # 游标分页：返回 (borrowed_at, id) 严格排在 after 之后的 limit 条记录（按借阅时间倒序）
+    @abstractmethod
+    def get_borrows_by_user_after(self, user_id: str, limit: int, after: tuple[datetime, int] | None = None) -> list[BorrowRecord]:
+        pass
+
+    @abstractmethod
+    def count_by_user(self, user_id: str) -> int:
+        pass
+
+    # 批量借还（一个事务、按集合操作）
+    @abstractmethod
+    def create_many(self, borrow_records: list[BorrowRecord]) -> list[BorrowRecord]:
+        pass
+    @abstractmethod
+    def get_many_by_ids(self, borrow_ids: list[int]) -> list[BorrowRecord]:
+        pass
+    @abstractmethod
+    def mark_many_returned(self, borrow_ids: list[int], returned_at: datetime, overdue_ids: set[int]) -> set[int]:
+        """一条 UPDATE 把还没归还的记录标记为已归还（overdue_ids 里的同时标记逾期），返回实际更新了的 id"""
+        pass
+
+
+
+# 事务性发件箱：和业务写入共用同一个会话（同一个事务），投递由 infrastructure/outbox_relay.py 负责
+class OutboxRepository(ABC):
+    @abstractmethod
+    def add_many(self, events: list[OutboxEventDto]) -> None:
+        pass
+
+
+
+# 异步版本的仓储接口（settings.DB_ASYNC=True 时使用），方法和上面一一对应，只是都要 await
+class AsyncBookRepository(ABC):
+    @abstractmethod
+    async def get_by_isbn(self, isbn: str) -> Book | None:
+        pass
+    @abstractmethod
+    async def get_all(self) -> list[Book]:
+        pass
+    @abstractmethod
+    async def save(self, book: Book) -> None:
+        pass
+    @abstractmethod
+    async def delete(self, isbn: str) -> bool:
+        pass
+    @abstractmethod
+    async def get_borrows_by_user(self, user_id: str) -> list[Book]:
+        pass
+    @abstractmethod
+    async def get_all_available(self) -> list[Book]:
+        pass
+    @abstractmethod
+    async def mark_borrowed(self, isbn: str, borrower_id: str) -> Book | None:
+        pass
+    @abstractmethod
+    async def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        pass
+    @abstractmethod
+    async def get_page(self, filters: BookFilter, limit: int, after_isbn: str | None = None) -> list[Book]:
+        pass
+    @abstractmethod
+    async def bulk_upsert(self, books: list[Book], update_existing: bool = False) -> set[str]:
+        pass
+    @abstractmethod
+    async def get_many_by_isbns(self, isbns: list[str]) -> list[Book]:
+        pass
+    @abstractmethod
+    async def mark_many_borrowed(self, isbns: list[str], borrower_id: str) -> list[Book]:
+        pass
+    @abstractmethod
+    async def release_many(self, isbns: list[str]) -> None:
+        pass
+
+class AsyncUserRepository(ABC):
+    @abstractmethod
+    async def add(self, user: UserCreateDto) -> User:
+        pass
     @abstractmethod
-    def get_borrows_by_user(self, user_id: str, page: int = 1, size: int = 10) -> tuple[list[BorrowRecord], int]:
+    async def get_by_id(self, user_id: str) -> User | None:
+        pass
+    @abstractmethod
+    async def get_all(self) -> list[User]:
+        pass
+    @abstractmethod
+    async def get_by_username(self, username: str) -> User | None:
+        pass
+    @abstractmethod
+    async def get_many_by_ids(self, user_ids: list[str]) -> list[User]:
+        pass
+    @abstractmethod
+    async def get_many_by_usernames(self, usernames: list[str]) -> list[User]:
+        pass
+    @abstractmethod
+    async def get_page(self, limit: int, after_username: str | None = None) -> list[User]:
+        pass
+    @abstractmethod
+    async def update_password_hash(self, user_id: str, hashed_password: str) -> None:
         pass
 
+class AsyncBorrowRepository(ABC):
+    @abstractmethod
+    async def create(self, borrow_record: BorrowRecord) -> BorrowRecord:
+        pass
+    @abstractmethod
+    async def get_by_id(self, borrow_id: int) -> BorrowRecord | None:
+        pass
+    @abstractmethod
+    async def save(self, borrow_record: BorrowRecord) -> None:
+        pass
+    @abstractmethod
+    async def get_borrows_by_user(self, user_id: str, page: int = 1, size: int = 10, include_total: bool = True) -> tuple[list[BorrowRecord], int | None]:
+        pass
+    @abstractmethod
+    async def get_borrows_by_user_after(self, user_id: str, limit: int, after: tuple[datetime, int] | None = None) -> list[BorrowRecord]:
+        pass
+    @abstractmethod
+    async def count_by_user(self, user_id: str) -> int:
+        pass
+    @abstractmethod
+    async def create_many(self, borrow_records: list[BorrowRecord]) -> list[BorrowRecord]:
+        pass
+    @abstractmethod
+    async def get_many_by_ids(self, borrow_ids: list[int]) -> list[BorrowRecord]:
+        pass
+    @abstractmethod
+    async def mark_many_returned(self, borrow_ids: list[int], returned_at: datetime, overdue_ids: set[int]) -> set[int]:
+        pass
+
+
+class AsyncOutboxRepository(ABC):
+    @abstractmethod
+    async def add_many(self, events: list[OutboxEventDto]) -> None:
+        pass
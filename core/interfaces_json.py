@@ -7,6 +7,7 @@ class BookRepository(Protocol):  # 定义图书接口
     def get_by_isbn(self, isbn: str) -> Book | None: ...  # 根据 isbn 获取图书
     def save(self, book: Book) -> None: ...  # 保存图书
     def list_all(self) -> list[Book]: ...  # 获取所有图书
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]: ...  # 全文搜索（按相关度排序）
 
 
 class UserRepository(Protocol):  # 定义用户接口
@@ -0,0 +1,168 @@
+# JWT 编解码（签发 / 校验 access token）
+# 以前 create_access_token / decode_access_token 直接调 python-jose，每次都把 SECRET_KEY 重新包装成密钥对象，
+# 而且只能用 HMAC（HS256），所有要校验 token 的服务都得拿到同一个密钥。现在：
+# - 密钥只在启动时解析一次（HMAC 密钥、PEM 格式的私钥/公钥），之后每次签发/校验直接用解析好的密钥对象
+# - 支持非对称算法 EdDSA（Ed25519）/ ES256：签发方持有私钥，边缘服务只配公钥就能校验，拿不到签发能力
+# - 后端可插拔：PyJWT（更快，支持 EdDSA）优先，装不上时退回 python-jose（不支持 EdDSA）
+# 各算法、各后端的吞吐量见 python -m benchmarks.bench_jwt
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from settings import settings
+
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"ES256", "EdDSA"}
+
+
+class InvalidTokenError(Exception):
+    """签名不对、过期、格式错误……调用方统一当作“无法验证凭据”处理"""
+
+
+class JwtCodec(ABC):
+    """
+    signing_key：HMAC 时是密钥字符串，非对称算法时是 PEM 私钥；只做校验的服务可以不传
+    verification_key：非对称算法的 PEM 公钥；不传的话从私钥推出来（HMAC 时用同一个密钥）
+    """
+
+    name: str
+
+    def __init__(self, algorithm: str, signing_key: str | None = None, verification_key: str | None = None):
+        if algorithm not in HMAC_ALGORITHMS | ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"不支持的 JWT 算法：{algorithm}")
+        if signing_key is None and verification_key is None:
+            raise ValueError("至少需要签名密钥或校验公钥中的一个")
+        self.algorithm = algorithm
+        self.can_sign = signing_key is not None
+
+    @abstractmethod
+    def encode(self, claims: dict) -> str:
+        pass
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        """校验签名和 exp，返回 payload；失败（包括没有 exp / sub）抛 InvalidTokenError"""
+        pass
+
+    def _require_signing_key(self) -> None:
+        if not self.can_sign:
+            raise RuntimeError("当前只配置了校验公钥，不能签发 token")
+
+
+def _load_asymmetric_keys(signing_key: str | None, verification_key: str | None):
+    """把 PEM 解析成 cryptography 的密钥对象（只在启动时做一次）"""
+    from cryptography.hazmat.primitives import serialization
+
+    private_key = None
+    if signing_key is not None:
+        private_key = serialization.load_pem_private_key(signing_key.encode(), password=None)
+    if verification_key is not None:
+        public_key = serialization.load_pem_public_key(verification_key.encode())
+    else:
+        public_key = private_key.public_key()
+    return private_key, public_key
+
+
+class PyJWTCodec(JwtCodec):
+    name = "pyjwt"
+
+    def __init__(self, algorithm: str, signing_key: str | None = None, verification_key: str | None = None):
+        super().__init__(algorithm, signing_key, verification_key)
+        import jwt
+
+        self._jwt = jwt
+        if algorithm in HMAC_ALGORITHMS:
+            key = (signing_key or verification_key).encode()
+            self._signing_key, self._verification_key = key, key
+        else:
+            self._signing_key, self._verification_key = _load_asymmetric_keys(signing_key, verification_key)
+        self._algorithms = [algorithm]
+
+    def encode(self, claims: dict) -> str:
+        self._require_signing_key()
+        return self._jwt.encode(claims, self._signing_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(
+                token, self._verification_key, algorithms=self._algorithms, options={"require": ["exp", "sub"]}
+            )
+        except self._jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class JoseCodec(JwtCodec):
+    name = "jose"
+
+    def __init__(self, algorithm: str, signing_key: str | None = None, verification_key: str | None = None):
+        super().__init__(algorithm, signing_key, verification_key)
+        if algorithm == "EdDSA":
+            raise ValueError("python-jose 不支持 EdDSA，请安装 PyJWT 或改用 ES256")
+        from jose import jwk, jwt
+
+        self._jwt = jwt
+        if algorithm in HMAC_ALGORITHMS:
+            key = jwk.construct(signing_key or verification_key, algorithm)
+            self._signing_key, self._verification_key = key, key
+        else:
+            private_key, public_key = _load_asymmetric_keys(signing_key, verification_key)
+            self._signing_key = jwk.construct(private_key, algorithm) if private_key is not None else None
+            self._verification_key = jwk.construct(public_key, algorithm)
+        self._algorithms = [algorithm]
+
+    def encode(self, claims: dict) -> str:
+        self._require_signing_key()
+        return self._jwt.encode(claims, self._signing_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        from jose import JWTError
+
+        try:
+            return self._jwt.decode(
+                token, self._verification_key, algorithms=self._algorithms,
+                options={"require_exp": True, "require_sub": True},
+            )
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+BACKENDS: dict[str, type[JwtCodec]] = {"pyjwt": PyJWTCodec, "jose": JoseCodec}
+
+
+def available_backends() -> list[str]:
+    """按速度从快到慢排好的、本机装了的后端"""
+    names = []
+    for name, module in (("pyjwt", "jwt"), ("jose", "jose")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def create_codec(
+    backend: str, algorithm: str, signing_key: str | None = None, verification_key: str | None = None
+) -> JwtCodec:
+    """backend="auto" 时用最快的、支持该算法的后端"""
+    if backend != "auto":
+        return BACKENDS[backend](algorithm, signing_key, verification_key)
+    candidates = [name for name in available_backends() if not (name == "jose" and algorithm == "EdDSA")]
+    if not candidates:
+        raise ValueError(f"没有可用的 JWT 后端支持 {algorithm}（EdDSA 需要安装 PyJWT）")
+    return BACKENDS[candidates[0]](algorithm, signing_key, verification_key)
+
+
+def _read_key_file(path: str | None) -> str | None:
+    return Path(path).read_text() if path else None
+
+
+def create_codec_from_settings() -> JwtCodec:
+    """HMAC 用 SECRET_KEY；非对称算法用 JWT_PRIVATE_KEY_PATH / JWT_PUBLIC_KEY_PATH 指向的 PEM 文件"""
+    if settings.ALGORITHM in HMAC_ALGORITHMS:
+        return create_codec(settings.JWT_BACKEND, settings.ALGORITHM, signing_key=settings.SECRET_KEY)
+    return create_codec(
+        settings.JWT_BACKEND,
+        settings.ALGORITHM,
+        signing_key=_read_key_file(settings.JWT_PRIVATE_KEY_PATH),
+        verification_key=_read_key_file(settings.JWT_PUBLIC_KEY_PATH),
+    )
@@ -1,28 +1,173 @@
+import atexit
 import logging
+import os
+import queue
 import sys
-import json
-from datetime import datetime, timezone
-from pythonjsonlogger import jsonlogger # pip install python-json-logger
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from core.serialization import serializer
 from settings import settings # 从 settings.py 中导入设置
 
-# 自定义 JSON 格式化器
-# 需要根据不同环境选择不同的日志格式
-# 环境修改 settings.py
-class CustomJsonFormatter(jsonlogger.JsonFormatter):
+# 日志管道
+# 以前每个 logger 挂一个 StreamHandler：格式化（缩进 2 格的 JSON、每条都 strftime）和写 stdout 都在调用方的线程里做，
+# 接口里打一条日志就要等终端/管道写完
+# 现在（LOG_ASYNC=true）：
+# - 所有 logger 共用一个 QueueHandler，调用方只把日志记录放进内存队列
+# - 后台的 QueueListener 线程负责格式化、写 stdout
+# - 生产环境一条日志一行紧凑 JSON（orjson），时间戳按秒缓存，同一秒内不再重复 strftime
+# 队列不设上限：日志不丢，代价是 stdout 长时间写不动时内存会涨
+# 进程退出时（atexit）先把队列里剩下的日志写完
+
+# 日志记录自带的属性，不算 extra 字段
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class _CachedTimeMixin:
+    """同一秒内的日志复用已经格式化好的“年-月-日 时:分:秒”，只拼上毫秒/微秒"""
+    _time_fmt = "%Y-%m-%d %H:%M:%S"
+    _time_func = staticmethod(time.localtime)
+    _cached_second = -1
+    _cached_text = ""
+
+    def _second_text(self, created: float) -> str:
+        second = int(created)
+        if second != self._cached_second:
+            # 格式化线程只有一个（QueueListener），不用加锁；LOG_ASYNC=false 时最坏多算一次
+            self._cached_text = time.strftime(self._time_fmt, self._time_func(second))
+            self._cached_second = second
+        return self._cached_text
+
+
+class TextFormatter(_CachedTimeMixin, logging.Formatter):
+    """开发环境：易读的文字格式"""
+
+    def formatTime(self, record, datefmt=None):
+        return self._second_text(record.created)
+
+
+class JsonLineFormatter(_CachedTimeMixin, logging.Formatter):
+    """
+    生产环境：一条日志一行 JSON（不缩进、中文不转义）
+    固定字段 timestamp / level / name / message / env，extra 里传的字段（event、user_id 等）原样放进去
     """
-    自定义 JSON 格式化器
+    _time_fmt = "%Y-%m-%dT%H:%M:%S"
+    _time_func = staticmethod(time.gmtime)
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_dict = {
+            # ISO 8601（UTC），精确到微秒
+            "timestamp": f"{self._second_text(record.created)}.{int(record.created % 1 * 1_000_000):06d}Z",
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                log_dict[key] = value
+        if record.exc_info:
+            log_dict["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_dict["exc_info"] = record.exc_text
+        if record.stack_info:
+            log_dict["stack_info"] = self.formatStack(record.stack_info)
+        log_dict["env"] = settings.APP_ENV
+        try:
+            return serializer.dumps(log_dict).decode("utf-8")
+        except TypeError:
+            # extra 里有序列化器不认识的对象：转成字符串，不能因为一条日志抛异常
+            safe = {key: value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+                    for key, value in log_dict.items()}
+            return serializer.dumps(safe).decode("utf-8")
+
+
+class _EnqueueHandler(QueueHandler):
     """
-    def add_fields(self, log_dict, record, message_dict):
-        super().add_fields(log_dict, record, message_dict)
-        if not log_dict.get('timestamp'):
-            # 使用 ISO 8601 格式时间戳
-            log_dict['timestamp'] =  datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-        if log_dict.get('level'):
-            log_dict['level'] = log_dict['level'].upper()
-        else:
-            log_dict['level'] = record.levelname
-        # 添加环境信息
-        log_dict['env'] = settings.APP_ENV
+    标准库的 QueueHandler 在放进队列之前会先完整格式化一遍（为了能跨进程传递），格式化还是在调用方线程里做
+    这里队列在同一个进程里：只把 msg % args 先算好（args 可能是之后会被修改的对象），格式化留给后台线程
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def _make_formatter() -> logging.Formatter:
+    if settings.is_prod:
+        return JsonLineFormatter()  # 生产环境输出json
+    # 开发环境输出彩色易读文字
+    return TextFormatter(fmt="%(levelname)-8s %(asctime)s — %(message)s")
+
+
+def _make_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout) # **handler** = “日志要输出到哪里”（屏幕、文件、网络等）
+    handler.setFormatter(_make_formatter())
+    return handler
+
+
+_lock = threading.Lock()
+_handler: logging.Handler | None = None
+_listener: QueueListener | None = None
+
+
+def _get_handler() -> logging.Handler:
+    """所有 logger 共用的处理器：LOG_ASYNC=true 时是队列（第一次用到时启动后台线程），否则直接写 stdout"""
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            output = _make_output_handler()
+            if settings.LOG_ASYNC:
+                log_queue: queue.SimpleQueue = queue.SimpleQueue()
+                _listener = QueueListener(log_queue, output, respect_handler_level=True)
+                _listener.start()
+                _handler = _EnqueueHandler(log_queue)
+            else:
+                _handler = output
+        return _handler
+
+
+def _restart_after_fork() -> None:
+    # fork 出来的子进程（gunicorn worker 等）里没有父进程的后台线程：换一个新队列、新线程，已经挂上的 logger 跟着切换
+    global _listener
+    if _listener is None:
+        return
+    output = _make_output_handler()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    _handler.queue = log_queue
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+@atexit.register
+def stop_logging() -> None:
+    """把队列里剩下的日志写完再退出"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):  # stdout 已经被关掉（测试框架替换过 stdout 之类）
+                pass
+
+
+def setup_logging() -> None:
+    """
+    第三方库（uvicorn、SQLAlchemy、Celery……）的日志也走同一个管道，级别用 LOG_LEVEL
+    以前 api/main.py 用 logging.basicConfig 强制所有库 DEBUG 级别同步输出，每个请求都有大量日志在请求线程里写终端
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [_get_handler()]
+    root.setLevel(settings.LOG_LEVEL.upper())
+
 
 def get_logger(name: str) -> logging.Logger:
     """获取配置好的logger实例"""
@@ -31,31 +176,13 @@ def get_logger(name: str) -> logging.Logger:
     if logger.handlers:
         return logger
     logger.setLevel(logging.DEBUG if settings.is_dev else logging.INFO)  # 设置日志级别
-
-    if settings.is_prod:
-        # 生产环境输出json
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = CustomJsonFormatter(
-                '%(timestamp)s %(level)s %(name)s %(message)s %(event)s',
-                json_ensure_ascii=False, # 关键！防止中文转义
-                json_indent=2 # 缩进2个空格
-        )
-        handler.setFormatter(formatter)
-    else:
-        # 开发环境输出彩色易读文字
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = logging.Formatter(
-            fmt="%(levelname)-8s %(asctime)s — %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        handler.setFormatter(formatter)
-
-    logger.addHandler(handler) # **handler** = “日志要输出到哪里”（屏幕、文件、网络等）  
+    logger.addHandler(_get_handler())
     logger.propagate = False  #  防止日志被上级重复打印
     return logger
-       
+
 # 这个 logger 会：
 # - 自动根据 `APP_ENV` 切换格式
 # - 添加 `timestamp`、`env` 等字段
 # - 支持传入结构化数据（如 `user_id`, `book_id`）
-
+# - 记录日志不阻塞调用方（LOG_ASYNC）
+# 拼 extra 之前先问一下 `logger.isEnabledFor(...)`：级别不够的日志连字典都不用建（见 middleware/logging_middleware.py）
@@ -0,0 +1,38 @@
+# 事务性发件箱（outbox）的事件类型和内容
+# 借书 / 还书接口不再直接做副作用（写借阅日志、audit_logs、提交邮件任务），只把事件和借阅记录写在同一个事务里；
+# 事务提交后由 relay（infrastructure/outbox_relay.py）投递。事件里带上投递要用到的全部信息，relay 不用再查用户表
+from .dtos import OutboxEventDto
+from .models import User
+
+BORROW_CREATED = "borrow_created"
+BORROW_RETURNED = "borrow_returned"
+
+
+def event_key(topic: str, borrow_id: int) -> str:
+    """去重键用借阅记录 ID：一条借阅记录只会被借出一次、归还一次"""
+    return f"{topic}:{borrow_id}"
+
+
+def circulation_events(
+    topic: str, user: User, borrows: list[tuple[str, int]], at: float, task_id: str | None = None
+) -> list[OutboxEventDto]:
+    """
+    借书 / 还书事件，borrows 是 (ISBN, 借阅记录 ID) 列表，at 是发生时间（time.time()）
+    task_id 是接口返回给客户端的通知任务 ID，汇总邮件发出后用它也能查到状态（见 utils/notification_digest.py）
+    """
+    return [
+        OutboxEventDto(
+            topic=topic,
+            key=event_key(topic, borrow_id),
+            payload={
+                "user_id": user.user_id,
+                "name": user.name,
+                "email": user.email,
+                "book_id": isbn,
+                "borrow_id": borrow_id,
+                "at": at,
+                "task_id": task_id,
+            },
+        )
+        for isbn, borrow_id in borrows
+    ]
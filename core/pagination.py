@@ -0,0 +1,57 @@
+# 游标（keyset）分页工具
+# 游标对前端是“不透明”的字符串：前端只需要把上一页返回的 `next_cursor` 原样传回来，
+# 不需要（也不应该）关心里面存了什么。
+import base64
+import json
+from datetime import datetime
+
+from core.exceptions import InvalidCursorError
+
+
+def encode_cursor(borrowed_at: datetime, record_id: int) -> str:
+    """把 (borrowed_at, id) 编码成 URL 安全的游标字符串"""
+    raw = json.dumps({"b": borrowed_at.isoformat(), "i": record_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """把游标字符串还原成 (borrowed_at, id)，格式不对时抛出 InvalidCursorError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["b"]), int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(cursor) from e
+
+
+def encode_key_cursor(key: str) -> str:
+    """单一排序键（比如图书的 isbn）的游标：上一页最后一条记录的键"""
+    raw = json.dumps({"k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_key_cursor(cursor: str) -> str:
+    """encode_key_cursor 的逆操作，格式不对时抛出 InvalidCursorError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return str(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["k"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(cursor) from e
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """按相关度排序的结果（比如全文搜索）没有稳定的排序键，只能用偏移量做游标"""
+    raw = json.dumps({"o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """encode_offset_cursor 的逆操作，格式不对（或偏移量为负）时抛出 InvalidCursorError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(cursor) from e
+    if offset < 0:
+        raise InvalidCursorError(cursor)
+    return offset
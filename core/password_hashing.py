@@ -0,0 +1,98 @@
+# 专用的密码哈希线程池（argon2）
+# argon2 每次哈希要占 memory_cost（默认 64 MiB）内存、几百毫秒 CPU。以前注册/登录直接在请求线程里算：
+# 一波登录请求能占满 FastAPI 的整个线程池（其他接口跟着排队），同时算几十个哈希内存也会暴涨。
+# 现在：
+# - 单独的线程池，线程数按“内存预算 / 每次哈希的内存”算出来（也不超过 CPU 核数），同时在算的哈希数有上限
+#   （argon2 的 C 实现计算时会释放 GIL，线程就能真正并行）
+# - 排队的任务数也有上限，满了直接抛 ServiceOverloadedException（503 + Retry-After），让客户端稍后重试，
+#   而不是无限排队、所有请求一起超时
+# - 同时提供同步接口（同步路由/服务用）和异步接口（async 路由用，不占事件循环）
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core.exceptions import ServiceOverloadedException
+from core.security import get_password_hash, pwd_context, verify_and_update_password, verify_password
+from settings import settings
+
+
+def default_worker_count(memory_budget_mb: int) -> int:
+    """按内存预算算线程数：预算 / 单次哈希内存，至少 1 个，最多 CPU 核数"""
+    memory_cost_kib = pwd_context.handler("argon2").memory_cost
+    by_memory = (memory_budget_mb * 1024) // memory_cost_kib
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+
+class PasswordHashingPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0  # 正在算 + 排队中的任务数
+        self.completed = 0
+        self.rejected = 0
+
+    # ───────────────────────────────
+    # 同步接口：在调用线程里等结果（同步路由本来就跑在线程池里）
+    # ───────────────────────────────
+    def hash(self, password: str) -> str:
+        return self._submit(get_password_hash, password).result()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(verify_password, plain_password, hashed_password).result()
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return self._submit(verify_and_update_password, plain_password, hashed_password).result()
+
+    # ───────────────────────────────
+    # 异步接口：await 期间事件循环可以处理别的请求
+    # ───────────────────────────────
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(get_password_hash, password))
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(verify_password, plain_password, hashed_password))
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await asyncio.wrap_future(
+            self._submit(verify_and_update_password, plain_password, hashed_password)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, fn, *args) -> Future:
+        # 准入控制：正在算的（workers 个）+ 排队的（max_queue 个）满了就拒绝
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ServiceOverloadedException("登录/注册请求过多，请稍后重试")
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+
+def create_password_hashing_pool() -> PasswordHashingPool:
+    workers = settings.PASSWORD_HASH_WORKERS or default_worker_count(settings.PASSWORD_HASH_MEMORY_BUDGET_MB)
+    return PasswordHashingPool(workers=workers, max_queue=settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+# 进程内共享（每个 worker 进程一个池）
+password_hasher = create_password_hashing_pool()
@@ -1,15 +1,30 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from jose import jwt, JWTError
 from fastapi import HTTPException, status
 from core.exceptions import UnauthorizedException
+from core.jwt_codec import InvalidTokenError, create_codec_from_settings
 from settings import settings
 import os
 from dotenv import load_dotenv
 load_dotenv()
 # 创建密码工具函数
+def argon2_context_kwargs() -> dict:
+    """
+    argon2 的参数（time_cost / memory_cost / parallelism）来自 settings，没配置的用 passlib 默认值
+    合适的值和机器有关，用 `python -m core.argon2_calibration` 在部署的机器上测出来
+    """
+    kwargs = {}
+    if settings.ARGON2_TIME_COST is not None:
+        kwargs["argon2__rounds"] = settings.ARGON2_TIME_COST
+    if settings.ARGON2_MEMORY_COST_KIB is not None:
+        kwargs["argon2__memory_cost"] = settings.ARGON2_MEMORY_COST_KIB
+    if settings.ARGON2_PARALLELISM is not None:
+        kwargs["argon2__parallelism"] = settings.ARGON2_PARALLELISM
+    return kwargs
+
+
 # 声明使用 argon2 算法
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **argon2_context_kwargs())
 # 验证密码
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证明文密码是否与哈希匹配"""
@@ -18,6 +33,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     """对明文密码进行哈希"""
     return pwd_context.hash(password)
+# 验证密码，并检查哈希是否需要升级
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    返回 (是否匹配, 新哈希)：密码正确、但旧哈希用的参数（或算法）和当前配置不一样时，
+    新哈希是用当前参数重新算的，调用方应该把它存回数据库；否则为 None
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
 
 
 # 创建 JWT 工具函数
@@ -27,7 +49,8 @@ def get_password_hash(password: str) -> str:
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
-
+# 启动时按 settings 建好编解码器（密钥只解析一次），见 core/jwt_codec.py
+token_codec = create_codec_from_settings()
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -37,7 +60,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = token_codec.encode(to_encode)
     return encoded_jwt
 #  `create_access_token({"sub": "alice"})` → 返回一串 JWT 字符串
 
@@ -45,14 +68,18 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 # 添加 JWT 解码函数
 def decode_access_token(token: str) -> str:
     """解码 JWT，返回 username（即 'sub' 字段）"""
+    return decode_access_token_payload(token)["sub"]
+
+
+def decode_access_token_payload(token: str) -> dict:
+    """校验签名和过期时间，返回完整的 payload（保证有 'sub' 和 'exp'）；token 缓存要用到里面的 'exp'"""
     try:
-        payload = jwt.decode(token=token,key=SECRET_KEY,algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise UnauthorizedException("无法验证凭据")
-        return username
-    except JWTError:
+        payload = token_codec.decode(token)
+    except InvalidTokenError:
+        raise UnauthorizedException("无法验证凭据")
+    if payload.get("sub") is None:
         raise UnauthorizedException("无法验证凭据")
+    return payload
 
 
 
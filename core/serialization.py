@@ -0,0 +1,91 @@
+# JSON 序列化（JSON 文件仓库、API 响应、图书缓存共用）
+# - 后端可插拔：orjson（快几倍，直接支持 dataclass / datetime）优先，没装时退回标准库 json
+# - 两个后端输出一致：UTF-8 字节、紧凑格式、中文不转义；dataclass 按字段转成对象，datetime 转成 ISO 8601
+#   所以 API 列表接口可以把 dataclass（Book 等）直接交给序列化器，不用先逐行构造 Pydantic 对象
+# 各后端的速度见 python -m benchmarks.bench_serialization
+import dataclasses
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from enum import Enum
+from uuid import UUID
+
+from settings import settings
+
+
+class JsonSerializer(ABC):
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj, indent: bool = False) -> bytes:
+        """indent=True 时缩进 2 格（给人看的文件用）"""
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes | str):
+        pass
+
+
+class OrjsonSerializer(JsonSerializer):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        # NON_STR_KEYS：和 json 一样允许 int 等类型的 key
+        self._options = orjson.OPT_NON_STR_KEYS
+        self._indent_options = self._options | orjson.OPT_INDENT_2
+
+    def dumps(self, obj, indent: bool = False) -> bytes:
+        return self._orjson.dumps(obj, option=self._indent_options if indent else self._options)
+
+    def loads(self, data: bytes | str):
+        return self._orjson.loads(data)
+
+
+def _default(obj):
+    """标准库 json 不认识的类型，按 orjson 的规则转换"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"{type(obj).__name__} 不能序列化成 JSON")
+
+
+class StdlibJsonSerializer(JsonSerializer):
+    name = "json"
+
+    def dumps(self, obj, indent: bool = False) -> bytes:
+        if indent:
+            return json.dumps(obj, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    def loads(self, data: bytes | str):
+        return json.loads(data)
+
+
+BACKENDS: dict[str, type[JsonSerializer]] = {"orjson": OrjsonSerializer, "json": StdlibJsonSerializer}
+
+
+def available_backends() -> list[str]:
+    """按速度从快到慢排好的、本机装了的后端"""
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return ["json"]
+    return ["orjson", "json"]
+
+
+def create_serializer(backend: str) -> JsonSerializer:
+    """backend="auto" 时用最快的后端"""
+    if backend == "auto":
+        backend = available_backends()[0]
+    return BACKENDS[backend]()
+
+
+serializer = create_serializer(settings.JSON_BACKEND)
@@ -1,10 +1,20 @@
 # 创建借阅服务（Borrow Service）
 from core.models import Book, User, BorrowRecord
 from core.interfaces import UserRepository, BookRepository, BorrowRepository
-from core.dtos import UserCreateDto, ReturnBookDto, BorrowBookDto, MyBorrowDto
-from core.security import verify_password
+from collections.abc import Callable, Iterable, Iterator
+from core.dtos import (
+    UserCreateDto, ReturnBookDto, BorrowBookDto, MyBorrowDto, BookFilter, BookPageDto, UserPageDto, UserBatchDto,
+    BookImportReportDto, CirculationItemDto, CirculationResultDto,
+)
+from core.book_import import BookImportRow, iter_chunks, dedupe_chunk, count_chunk, fail_chunk
+from settings import settings
+from core.password_hashing import password_hasher
+from core.pagination import (
+    encode_cursor, decode_cursor, encode_key_cursor, decode_key_cursor, encode_offset_cursor, decode_offset_cursor,
+)
 from datetime import datetime, timedelta, timezone
 from core.exceptions import (
+    BusinessException,
     BookNotFoundError,
     BookNotAvailableError,
     BorrowRecordNotFoundError,
@@ -38,6 +48,53 @@ class LibraryService:
     def get_all_books(self) -> list[Book]:
         return self.book_repo.get_all()
 
+    def list_books(self, filters: BookFilter, size: int = 20, cursor: str | None = None) -> BookPageDto:
+        """图书目录的一页（按 isbn 游标分页）；多取一条来判断还有没有下一页"""
+        after_isbn = decode_key_cursor(cursor) if cursor else None
+        books = self.book_repo.get_page(filters, size + 1, after_isbn)
+        return build_book_page(books, size)
+
+    def search_books(self, query: str, size: int = 20, cursor: str | None = None) -> BookPageDto:
+        """全文搜索书名和作者，按相关度排序；游标是偏移量，最多翻到 BOOK_SEARCH_MAX_RESULTS 条"""
+        offset = decode_offset_cursor(cursor) if cursor else 0
+        if offset >= settings.BOOK_SEARCH_MAX_RESULTS:
+            return BookPageDto(items=[], size=size)
+        books = self.book_repo.search(query, size + 1, offset)
+        return build_search_page(books, size, offset)
+
+    def export_books(self, filters: BookFilter, batch_size: int = 500) -> Iterator[Book]:
+        """导出符合条件的全部图书（流式，内存占用和总数无关）"""
+        return self.book_repo.iter_books(filters, batch_size)
+
+    def import_books(
+        self,
+        rows: Iterable[BookImportRow],
+        update_existing: bool = False,
+        chunk_size: int = 1000,
+        commit: Callable[[], None] | None = None,
+        rollback: Callable[[], None] | None = None,
+    ) -> BookImportReportDto:
+        """
+        批量导入（见 core/book_import.py）：每 chunk_size 行一次 bulk_upsert，然后调 commit 提交这一批；
+        某一批写入失败就调 rollback，这一批的行都记为失败，继续导入后面的
+        """
+        report = BookImportReportDto()
+        max_errors = settings.BOOK_IMPORT_MAX_ERRORS
+        for chunk in iter_chunks(rows, chunk_size, report, max_errors):
+            books = dedupe_chunk(chunk, update_existing)
+            try:
+                existing = self.book_repo.bulk_upsert(books, update_existing)
+                if commit is not None:
+                    commit()
+            except Exception as e:
+                logger.exception(f"批量导入图书：第 {chunk[0].line}-{chunk[-1].line} 行写入失败")
+                if rollback is not None:
+                    rollback()
+                fail_chunk(report, chunk, e, max_errors)
+                continue
+            count_chunk(report, chunk, books, existing, update_existing)
+        return report
+
     def update_book(self, book: Book) -> None:
         existing = self.book_repo.get_by_isbn(book.isbn)
         if not existing:
@@ -68,13 +125,38 @@ class LibraryService:
     def get_user_by_username(self, username: str) -> User:
         return self.user_repo.get_by_username(username)
 
+    def list_users(self, size: int = 20, cursor: str | None = None) -> UserPageDto:
+        """用户列表的一页（按 username 游标分页），代替一次取全部的 get_all_users"""
+        after_username = decode_key_cursor(cursor) if cursor else None
+        users = self.user_repo.get_page(size + 1, after_username)
+        return build_user_page(users, size)
+
+    def get_users_batch(self, user_ids: list[str], usernames: list[str]) -> UserBatchDto:
+        """一次取多个用户（前端展示借阅人列表用），每种键最多一条 IN 查询，代替逐个调 get_user_by_username"""
+        by_id = self.user_repo.get_many_by_ids(user_ids) if user_ids else []
+        by_username = self.user_repo.get_many_by_usernames(usernames) if usernames else []
+        return build_user_batch(user_ids, by_id, usernames, by_username)
+
     # **重要**：你的 `User` 领域模型 **必须包含 `hashed_password`**，否则无法验证！
-    def authenticate_user(self, username: str, password: str) -> User:
+    def authenticate_user(
+        self, username: str, password: str, release_db: Callable[[], None] | None = None
+    ) -> User:
         user = self.user_repo.get_by_username(username)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        # 查完用户就不再需要数据库了：argon2 要算几百毫秒，登录高峰时一直占着连接会把连接池耗尽
+        # release_db 由调用方传入（比如 session.close），把连接提前还给连接池
+        if release_db is not None:
+            release_db()
+        # argon2 放到专用的哈希线程池里算（有并发上限，排满了抛 503）
+        valid, new_hash = password_hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
             return None
+        if new_hash is not None:
+            # 旧哈希的参数和当前配置（settings.ARGON2_*）不一样：趁有明文密码，用新参数重新哈希存回去
+            # 会话 close 之后还能继续用，会重新借一个连接；请求结束时由 DBSessionMiddleware 提交
+            self.user_repo.update_password_hash(user.user_id, new_hash)
+            user.hashed_password = new_hash
         return user
 
 
@@ -85,15 +167,14 @@ class BorrowService:
 
     # 借书
     def borrow_book(self, isbn: str, borrower_id: str) -> BorrowBookDto:
-
-
-        # 1、检查图书是否存在
-        book = self.book_repo.get_by_isbn(isbn)
-        if not book:
-            raise BookNotFoundError(isbn)
-        # 2. 检查是否已经被借出
-        if book.is_borrowed:
-            raise BookNotAvailableError(isbn, book.title)
+        # 1. 条件更新：只有“存在且未借出”的书才会被标记为借出（原子操作，并发借同一本书不会都成功）
+        book = self.book_repo.mark_borrowed(isbn, borrower_id)
+        if book is None:
+            # 2. 更新失败，才多查一次，区分“书不存在”和“已被借出”
+            existing = self.book_repo.get_by_isbn(isbn)
+            if not existing:
+                raise BookNotFoundError(isbn)
+            raise BookNotAvailableError(isbn, existing.title)
 
         # 3. 创建借阅记录
         # 存储用 UTC，展示用本地时区
@@ -107,14 +188,9 @@ class BorrowService:
             due_date=due_date,
         )
 
-        # 4. 保存借阅记录
+        # 4. 保存借阅记录（图书状态已经在第 1 步更新好了）
         saved_borrow = self.borrow_repo.create(borrow)
 
-        # 5. 更新图书的状态
-        book.is_borrowed = True
-        book.borrowed_by = borrower_id
-        self.book_repo.save(book)
-
         # 记录结构化日志
         # 🔑 关键点：
         # - 使用 `extra={}` 传入结构化字段
@@ -141,7 +217,7 @@ class BorrowService:
 
 
 
-        # 6. 返回结果
+        # 5. 返回结果
         return BorrowBookDto(
             borrow_id=saved_borrow.id,
             book_isbn=saved_borrow.book_isbn,
@@ -177,11 +253,9 @@ class BorrowService:
         self.borrow_repo.save(borrow)
 
         # 7.更新图书的状态，释放图书
-        book = self.book_repo.get_by_isbn(borrow.book_isbn)
-        if book:
-            book.is_borrowed = False
-            book.borrowed_by = None
-            self.book_repo.save(book)
+        # 一条 UPDATE 只改 is_borrowed/borrowed_by：不能先 get_by_isbn 再 save，
+        # 缓存里的那份可能是旧的，save 会把别人刚改的书名、作者写回旧值
+        self.book_repo.release_many([borrow.book_isbn])
 
         # 8. 返回借阅记录
         return ReturnBookDto(
@@ -191,24 +265,216 @@ class BorrowService:
             is_overdue=is_overdue,
         )
 
+    # 批量借书（借还书台一次借多本）
+    def borrow_books(self, isbns: list[str], borrower_id: str) -> CirculationResultDto:
+        """
+        和逐本调用 borrow_book 的规则一样，但整批只用固定的几条 SQL，在同一个事务里：
+        1. 一条 UPDATE ... WHERE isbn IN (...) AND is_borrowed = false 把能借的都标记为借出
+        2. 一次 flush 批量插入借阅记录
+        3. 有借不到的，再用一条 IN 查询区分“不存在”和“已被借出”
+        某本借不到不影响其他的，每本的结果都在返回值里
+        """
+        isbns = list(dict.fromkeys(isbns))
+        borrowed = {book.isbn: book for book in self.book_repo.mark_many_borrowed(isbns, borrower_id)}
+        now = datetime.now(timezone.utc)
+        due_date = now + timedelta(days=BORROW_DURATION_DAYS)
+        records = self.borrow_repo.create_many([
+            BorrowRecord(id=None, book_isbn=isbn, borrower_id=borrower_id, borrowed_at=now, due_date=due_date)
+            for isbn in isbns if isbn in borrowed
+        ])
+        missing = [isbn for isbn in isbns if isbn not in borrowed]
+        existing = {book.isbn: book for book in self.book_repo.get_many_by_isbns(missing)} if missing else {}
+        logger.info(
+            "用户批量借书",
+            extra={"event": "BOOKS_BORROWED", "user_id": borrower_id, "book_isbns": list(borrowed)},
+        )
+        return build_borrow_results(isbns, records, existing)
+
+    # 批量还书
+    def return_books(self, borrow_ids: list[int], current_user_id: str) -> CirculationResultDto:
+        """
+        和逐条调用 return_book 的规则一样（记录存在、属于当前用户、还没归还），整批：
+        一条 IN 查询取记录 → 一条 UPDATE 标记归还（CASE 写逾期）→ 一条 UPDATE 释放图书
+        """
+        borrow_ids = list(dict.fromkeys(borrow_ids))
+        borrows = {borrow.id: borrow for borrow in self.borrow_repo.get_many_by_ids(borrow_ids)}
+        now = datetime.now(timezone.utc)
+        errors = check_returnable(borrow_ids, borrows, current_user_id)
+        valid_ids = [borrow_id for borrow_id in borrow_ids if borrow_id not in errors]
+        overdue_ids = {borrow_id for borrow_id in valid_ids if now > borrows[borrow_id].due_date}
+        returned = self.borrow_repo.mark_many_returned(valid_ids, now, overdue_ids)
+        self.book_repo.release_many([borrows[borrow_id].book_isbn for borrow_id in valid_ids if borrow_id in returned])
+        return build_return_results(borrow_ids, borrows, errors, returned, overdue_ids)
+
     def get_my_borrows(
-        self, user_id: str, page: int = 1, size: int = 10
+        self,
+        user_id: str,
+        page: int = 1,
+        size: int = 10,
+        cursor: str | None = None,
+        include_total: bool | None = None,
     ) -> MyBorrowDto:
-        if page < 1:
-            page = 1
-        if size < 1:
-            size = 10
-        if size > 100:  # 防止恶意请求
-            size = 100
+        """
+        查询我的借阅记录，支持两种分页方式：
+        - 偏移分页（默认）：按 page/size 翻页，默认返回 total/pages
+        - 游标分页：传入上一页返回的 next_cursor，按 (borrowed_at, id) 定位，深翻页也不变慢，默认不查 total
+        两种方式都会返回 next_cursor，所以前端可以从第一页开始就切换成游标翻页
+        include_total 为 None 时按上面的默认规则，显式传 True/False 可以覆盖
+        """
+        page, size = normalize_page_args(page, size)
+        if include_total is None:
+            include_total = cursor is None
+
+        if cursor is not None:
+            # 多查一条，用来判断后面还有没有数据（决定是否返回 next_cursor）
+            borrows = self.borrow_repo.get_borrows_by_user_after(
+                user_id, size + 1, decode_cursor(cursor)
+            )
+            total = self.borrow_repo.count_by_user(user_id) if include_total else None
+            return build_my_borrows(borrows[:size], total, None, size, len(borrows) > size)
+
         # total 该用户借阅记录的总数量
         # 返回的元组直接解包，赋值给两个变量
-        borrows, total = self.borrow_repo.get_borrows_by_user(user_id, page, size)
-        # 客户想在查询的时候直接看到是否已经归还和是否逾期，而数据库中的is_overdue是在还书之后才更新的，所以需要在这里计算
-        for borrow in borrows:
-            borrow.is_returned = borrow.is_book_returned
-            borrow.is_overdue = borrow.is_book_overdue
-        pages = (total + size - 1) // size  # 总页数 向上取整
-
-        return MyBorrowDto(
-            items=borrows, total=total, page=page, size=size, pages=pages
+        borrows, total = self.borrow_repo.get_borrows_by_user(
+            user_id, page, size, include_total=include_total
         )
+        # 知道总数时可以精确判断；不知道时只要这一页是满的，就认为可能还有下一页
+        has_more = len(borrows) == size and (total is None or page * size < total)
+        return build_my_borrows(borrows, total, page, size, has_more)
+
+
+# 下面几个函数同步/异步服务（core/async_services.py）共用
+def build_book_page(books: list[Book], size: int) -> BookPageDto:
+    """books 是多取了一条（size + 1）的结果：多出来的那条说明还有下一页"""
+    has_more = len(books) > size
+    books = books[:size]
+    next_cursor = encode_key_cursor(books[-1].isbn) if has_more else None
+    return BookPageDto(items=books, size=size, next_cursor=next_cursor)
+
+
+def build_search_page(books: list[Book], size: int, offset: int) -> BookPageDto:
+    """同 build_book_page，游标是下一页的偏移量；到了 BOOK_SEARCH_MAX_RESULTS 就不再给下一页"""
+    has_more = len(books) > size and offset + size < settings.BOOK_SEARCH_MAX_RESULTS
+    next_cursor = encode_offset_cursor(offset + size) if has_more else None
+    return BookPageDto(items=books[:size], size=size, next_cursor=next_cursor)
+
+
+def build_user_page(users: list[User], size: int) -> UserPageDto:
+    """同 build_book_page，游标是最后一个用户的 username"""
+    has_more = len(users) > size
+    users = users[:size]
+    next_cursor = encode_key_cursor(users[-1].username) if has_more else None
+    return UserPageDto(items=users, size=size, next_cursor=next_cursor)
+
+
+def build_user_batch(
+    user_ids: list[str], by_id: list[User], usernames: list[str], by_username: list[User]
+) -> UserBatchDto:
+    """按请求的顺序排好（数据库返回的顺序不固定），同一个用户只出现一次"""
+    found_ids = {user.user_id: user for user in by_id}
+    found_usernames = {user.username: user for user in by_username}
+    items, seen, not_found = [], set(), []
+    for keys, found in ((user_ids, found_ids), (usernames, found_usernames)):
+        for key in keys:
+            user = found.get(key)
+            if user is None:
+                not_found.append(key)
+            elif user.user_id not in seen:
+                seen.add(user.user_id)
+                items.append(user)
+    return UserBatchDto(items=items, not_found=list(dict.fromkeys(not_found)))
+
+
+def build_borrow_results(
+    isbns: list[str], records: list[BorrowRecord], existing: dict[str, Book]
+) -> CirculationResultDto:
+    """按请求顺序组装批量借书的结果；借不到的用和单本接口一样的业务异常给出 code 和提示"""
+    records_by_isbn = {record.book_isbn: record for record in records}
+    items = []
+    for isbn in isbns:
+        record = records_by_isbn.get(isbn)
+        if record is not None:
+            items.append(CirculationItemDto(
+                ok=True, book_isbn=isbn, borrow_id=record.id, due_date=record.due_date
+            ))
+            continue
+        book = existing.get(isbn)
+        error = BookNotAvailableError(isbn, book.title) if book else BookNotFoundError(isbn)
+        items.append(CirculationItemDto(ok=False, book_isbn=isbn, error_code=error.code, error=error.message))
+    return CirculationResultDto(items=items, succeeded=len(records), failed=len(items) - len(records))
+
+
+def check_returnable(
+    borrow_ids: list[int], borrows: dict[int, BorrowRecord], current_user_id: str
+) -> dict[int, BusinessException]:
+    """逐条做单本还书时的检查，返回不能归还的记录和原因"""
+    errors = {}
+    for borrow_id in borrow_ids:
+        borrow = borrows.get(borrow_id)
+        if borrow is None:
+            errors[borrow_id] = BorrowRecordNotFoundError(borrow_id)
+        elif borrow.borrower_id != current_user_id:
+            errors[borrow_id] = PermissionError(current_user_id, borrow.borrower_id)
+        elif borrow.is_returned:
+            errors[borrow_id] = BookAlreadyReturnError(borrow_id)
+    return errors
+
+
+def build_return_results(
+    borrow_ids: list[int],
+    borrows: dict[int, BorrowRecord],
+    errors: dict[int, BusinessException],
+    returned: set[int],
+    overdue_ids: set[int],
+) -> CirculationResultDto:
+    items = []
+    for borrow_id in borrow_ids:
+        borrow = borrows.get(borrow_id)
+        # 别人的借阅记录不返回书号
+        isbn = borrow.book_isbn if borrow and not isinstance(errors.get(borrow_id), PermissionError) else None
+        if borrow_id in returned:
+            items.append(CirculationItemDto(
+                ok=True, book_isbn=isbn, borrow_id=borrow_id, is_overdue=borrow_id in overdue_ids
+            ))
+            continue
+        # 检查时还没归还、UPDATE 时却没更新到：刚好被另一个请求还掉了
+        error = errors.get(borrow_id) or BookAlreadyReturnError(borrow_id)
+        items.append(CirculationItemDto(
+            ok=False, book_isbn=isbn, borrow_id=borrow_id, error_code=error.code, error=error.message
+        ))
+    return CirculationResultDto(items=items, succeeded=len(returned), failed=len(items) - len(returned))
+
+
+def normalize_page_args(page: int, size: int) -> tuple[int, int]:
+    if page < 1:
+        page = 1
+    if size < 1:
+        size = 10
+    if size > 100:  # 防止恶意请求
+        size = 100
+    return page, size
+
+
+def build_my_borrows(
+    borrows: list, total: int | None, page: int | None, size: int, has_more: bool
+) -> MyBorrowDto:
+    """组装分页结果；page 为 None 表示游标分页（没有“第几页”的概念）"""
+    next_cursor = None
+    if has_more and borrows:
+        last = borrows[-1]
+        next_cursor = encode_cursor(last.borrowed_at, last.id)
+
+    # 客户想在查询的时候直接看到是否已经归还和是否逾期，而数据库中的is_overdue是在还书之后才更新的，所以需要在这里计算
+    for borrow in borrows:
+        borrow.is_returned = borrow.is_book_returned
+        borrow.is_overdue = borrow.is_book_overdue
+    pages = (total + size - 1) // size if total is not None else None  # 总页数 向上取整
+
+    return MyBorrowDto(
+        items=borrows,
+        total=total,
+        page=page,
+        size=size,
+        pages=pages,
+        next_cursor=next_cursor,
+    )
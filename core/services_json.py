@@ -55,6 +55,9 @@ class LibraryService:
     def get_all_books(self) -> list[Book]:  # 获取所有图书
         return self._book_repo.list_all()
 
+    def search_books(self, query: str, size: int = 20, offset: int = 0) -> list[Book]:  # 全文搜索书名和作者
+        return self._book_repo.search(query, size, offset)
+
 
 # ✅ **关键点**：
 
@@ -0,0 +1,99 @@
+# 已验证 token 的缓存（get_current_user 用）
+# 每个需要登录的请求都要：校验 JWT 签名+ 按用户名查一次数据库。
+# 同一个 token 一分钟内可能来几百次，结果都一样，所以把“token → 用户”的结果缓存起来：
+# - 键是 token 的 SHA-256（内存里不存 token 原文）
+# - 过期时间 = min(token 的 exp, 现在 + TOKEN_CACHE_MAX_TTL_SECONDS)：token 过期后不可能再命中；
+#   用户信息最多旧 TOKEN_CACHE_MAX_TTL_SECONDS 秒（多 worker 部署时，其他进程的失效靠这个上限兜底）
+# - 用户被停用（is_active 变化）时调用 invalidate_user(username)，这个用户的所有 token 立即失效
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+
+from core.models import User
+from settings import settings
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """有界 LRU；线程安全（同步依赖项跑在线程池里）"""
+
+    def __init__(self, max_size: int = 10000, max_ttl_seconds: float = 300, clock=time.time):
+        self.max_size = max_size
+        self.max_ttl_seconds = max_ttl_seconds
+        self._clock = clock  # 要和 JWT 的 exp（Unix 时间戳）比较，所以用墙上时间
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()  # key -> (过期时间, 用户)
+        self._keys_by_username: dict[str, set[str]] = {}  # 反向索引，按用户失效时用
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> User | None:
+        key = _token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return replace(entry[1])  # 返回副本，调用方改了也不影响缓存
+
+    def put(self, token: str, user: User, token_expires_at: float) -> None:
+        expires_at = min(token_expires_at, self._clock() + self.max_ttl_seconds)
+        key = _token_key(token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, replace(user))
+            self._keys_by_username.setdefault(user.username, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, username: str) -> None:
+        """用户状态变了（停用、改信息）：这个用户所有已缓存的 token 都失效"""
+        with self._lock:
+            for key in list(self._keys_by_username.get(username, ())):
+                self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_username.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "max_ttl_seconds": self.max_ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str) -> None:
+        """调用方必须持有 self._lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_username.get(entry[1].username)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_username[entry[1].username]
+
+
+# 进程内共享（每个 worker 进程一份）
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    max_ttl_seconds=settings.TOKEN_CACHE_MAX_TTL_SECONDS,
+)
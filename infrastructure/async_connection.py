@@ -0,0 +1,33 @@
+# 异步数据库连接（settings.DB_ASYNC=True 时使用）
+# 同步的 SessionLocal 每个请求要占用一个线程池线程，高并发时请求会在线程上排队而不是在数据库上排队；
+# 异步引擎在事件循环里等待数据库 I/O，一个 worker 进程就能同时挂起几百个查询。
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from settings import settings
+from .connection import build_engine_kwargs, enable_sqlite_performance_mode
+
+# 同步驱动 → 异步驱动
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把同步连接地址换成对应的异步驱动，例如 sqlite:///data/library.db → sqlite+aiosqlite:///data/library.db"""
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **build_engine_kwargs(ASYNC_DATABASE_URL, is_async=True))
+if settings.SQLITE_PERFORMANCE_MODE and async_engine.dialect.name == "sqlite":
+    enable_sqlite_performance_mode(async_engine.sync_engine)
+
+# expire_on_commit=False：commit 之后还要读对象属性时，不会在 async 环境里触发隐式的懒加载 I/O
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
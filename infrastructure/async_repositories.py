@@ -0,0 +1,151 @@
+# 异步仓储：SqlAlchemyBookRepository / SqlAlchemyUserRepository / SqlAlchemyBorrowRepository / SqlAlchemyOutboxRepository 的 async 版本
+# ✅ 查询和 ORM ↔ 领域模型的转换逻辑不重复写一遍：直接复用同步仓储，
+#    通过 `AsyncSession.run_sync()` 在 SQLAlchemy 的 greenlet 里执行。
+#    同步代码里的每一次数据库 I/O 都会交还给事件循环去 await，不占用任何线程。
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dtos import BookFilter, OutboxEventDto, UserCreateDto
+from core.interfaces import AsyncBookRepository, AsyncBorrowRepository, AsyncOutboxRepository, AsyncUserRepository
+from core.models import Book, BorrowRecord, User
+from .book_cache import BookCache, CachedBookRepository
+from .book_repository import SqlAlchemyBookRepository
+from .borrow_repository import SqlAlchemyBorrowRepository
+from .outbox_repository import SqlAlchemyOutboxRepository
+from .user_repository import SqlAlchemyUserRepository
+
+
+class _RunSyncRepository:
+    """把同步仓储的方法放到 AsyncSession 的 greenlet 里执行"""
+
+    def __init__(self, session: AsyncSession, sync_repo):
+        self._session = session
+        # 同步仓储绑定的是 AsyncSession 内部的那个同步 Session，两者共享同一个事务
+        self._sync_repo = sync_repo
+
+    async def _run(self, method_name: str, *args, **kwargs):
+        method = getattr(self._sync_repo, method_name)
+        return await self._session.run_sync(lambda _sync_session: method(*args, **kwargs))
+
+
+class AsyncSqlAlchemyBookRepository(_RunSyncRepository, AsyncBookRepository):
+    def __init__(self, session: AsyncSession, cache: BookCache | None = None):
+        sync_repo = SqlAlchemyBookRepository(session.sync_session)
+        if cache is not None:
+            if cache.has_redis:
+                # 缓存在 run_sync 里同步调用，同步的 Redis 客户端会阻塞事件循环
+                raise ValueError("异步仓储不能使用带 Redis 二级缓存的 BookCache")
+            sync_repo = CachedBookRepository(sync_repo, cache, session=session.sync_session)
+        super().__init__(session, sync_repo)
+
+    async def get_by_isbn(self, isbn: str) -> Book | None:
+        return await self._run("get_by_isbn", isbn)
+
+    async def get_all(self) -> list[Book]:
+        return await self._run("get_all")
+
+    async def save(self, book: Book) -> None:
+        return await self._run("save", book)
+
+    async def delete(self, isbn: str) -> bool:
+        return await self._run("delete", isbn)
+
+    async def get_borrows_by_user(self, user_id: str) -> list[Book]:
+        return await self._run("get_borrows_by_user", user_id)
+
+    async def get_all_available(self) -> list[Book]:
+        return await self._run("get_all_available")
+
+    async def mark_borrowed(self, isbn: str, borrower_id: str) -> Book | None:
+        return await self._run("mark_borrowed", isbn, borrower_id)
+
+    async def get_page(self, filters: BookFilter, limit: int, after_isbn: str | None = None) -> list[Book]:
+        return await self._run("get_page", filters, limit, after_isbn)
+
+    async def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        return await self._run("search", query, limit, offset)
+
+    async def bulk_upsert(self, books: list[Book], update_existing: bool = False) -> set[str]:
+        return await self._run("bulk_upsert", books, update_existing)
+
+    async def get_many_by_isbns(self, isbns: list[str]) -> list[Book]:
+        return await self._run("get_many_by_isbns", isbns)
+
+    async def mark_many_borrowed(self, isbns: list[str], borrower_id: str) -> list[Book]:
+        return await self._run("mark_many_borrowed", isbns, borrower_id)
+
+    async def release_many(self, isbns: list[str]) -> None:
+        return await self._run("release_many", isbns)
+
+
+class AsyncSqlAlchemyUserRepository(_RunSyncRepository, AsyncUserRepository):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, SqlAlchemyUserRepository(session.sync_session))
+
+    async def add(self, user: UserCreateDto) -> User:
+        return await self._run("add", user)
+
+    async def get_by_id(self, user_id: str) -> User | None:
+        return await self._run("get_by_id", user_id)
+
+    async def get_all(self) -> list[User]:
+        return await self._run("get_all")
+
+    async def get_by_username(self, username: str) -> User | None:
+        return await self._run("get_by_username", username)
+
+    async def get_many_by_ids(self, user_ids: list[str]) -> list[User]:
+        return await self._run("get_many_by_ids", user_ids)
+
+    async def get_many_by_usernames(self, usernames: list[str]) -> list[User]:
+        return await self._run("get_many_by_usernames", usernames)
+
+    async def get_page(self, limit: int, after_username: str | None = None) -> list[User]:
+        return await self._run("get_page", limit, after_username)
+
+    async def update_password_hash(self, user_id: str, hashed_password: str) -> None:
+        return await self._run("update_password_hash", user_id, hashed_password)
+
+
+class AsyncSqlAlchemyBorrowRepository(_RunSyncRepository, AsyncBorrowRepository):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, SqlAlchemyBorrowRepository(session.sync_session))
+
+    async def create(self, borrow: BorrowRecord) -> BorrowRecord:
+        return await self._run("create", borrow)
+
+    async def get_by_id(self, borrow_id: int) -> BorrowRecord | None:
+        return await self._run("get_by_id", borrow_id)
+
+    async def save(self, borrow: BorrowRecord) -> None:
+        return await self._run("save", borrow)
+
+    async def get_borrows_by_user(
+        self, user_id: str, page: int = 1, size: int = 10, include_total: bool = True
+    ) -> tuple[list[BorrowRecord], int | None]:
+        return await self._run("get_borrows_by_user", user_id, page, size, include_total=include_total)
+
+    async def get_borrows_by_user_after(
+        self, user_id: str, limit: int, after: tuple[datetime, int] | None = None
+    ) -> list[BorrowRecord]:
+        return await self._run("get_borrows_by_user_after", user_id, limit, after)
+
+    async def count_by_user(self, user_id: str) -> int:
+        return await self._run("count_by_user", user_id)
+
+    async def create_many(self, borrows: list[BorrowRecord]) -> list[BorrowRecord]:
+        return await self._run("create_many", borrows)
+
+    async def get_many_by_ids(self, borrow_ids: list[int]) -> list[BorrowRecord]:
+        return await self._run("get_many_by_ids", borrow_ids)
+
+    async def mark_many_returned(self, borrow_ids: list[int], returned_at: datetime, overdue_ids: set[int]) -> set[int]:
+        return await self._run("mark_many_returned", borrow_ids, returned_at, overdue_ids)
+
+
+class AsyncSqlAlchemyOutboxRepository(_RunSyncRepository, AsyncOutboxRepository):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, SqlAlchemyOutboxRepository(session.sync_session))
+
+    async def add_many(self, events: list[OutboxEventDto]) -> None:
+        return await self._run("add_many", events)
@@ -0,0 +1,312 @@
+# 图书目录的读穿透缓存（read-through cache）
+# 图书目录读多写少：GET /books/{isbn}、GET /books/ 每次都查数据库没有必要
+# - 一级：进程内 LRU + TTL（每个 worker 一份，最快）
+# - 二级（可选）：Redis（多个 worker 共享，一个 worker 写入后其他 worker 的二级缓存也会失效）
+# - 写入（save / delete / mark_borrowed）时先写数据库，再让对应的缓存失效；事务提交后再失效一次，
+#   防止“提交前有别的请求读到旧数据又放回缓存”
+# 注意：一级缓存只在本进程内失效，其他 worker 的一级缓存最多会旧 BOOK_CACHE_TTL_SECONDS 秒
+# 注意：异步模式（DB_ASYNC=True）不启用 Redis 二级缓存：缓存在 AsyncSession.run_sync 里同步调用，
+#      同步的 redis 客户端每次 get/set/delete 都会卡住整个事件循环
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import replace
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.dtos import BookFilter
+from core.interfaces import BookRepository
+from core.logger import get_logger
+from core.models import Book
+from core.serialization import serializer
+from settings import settings
+
+# 列表类查询（全部、可借、分页）的缓存键前缀；任何一本书有写入，这些列表都要失效
+_LIST_PREFIX = "list:"
+
+logger = get_logger(__name__)
+
+
+def _book_key(isbn: str) -> str:
+    return f"book:{isbn}"
+
+
+class BookCache:
+    """进程内 LRU + TTL 缓存，可选 Redis 二级缓存；线程安全（同步路由跑在线程池里）"""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 30,
+        redis_client=None,
+        redis_ttl_seconds: int = 300,
+        key_prefix: str = "library:",
+        clock=time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._redis = redis_client
+        self._redis_ttl_seconds = redis_ttl_seconds
+        self._key_prefix = key_prefix
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()  # key -> (过期时间, 值)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    @property
+    def has_redis(self) -> bool:
+        return self._redis is not None
+
+    # ───────────────────────────────
+    # 单本书：一级 + 二级
+    # ───────────────────────────────
+    def get_book(self, isbn: str) -> Book | None:
+        key = _book_key(isbn)
+        book = self._get_local(key)
+        if book is not None:
+            return replace(book)  # 返回副本：业务代码会修改 Book（比如还书），不能改到缓存里的对象
+        book = self._get_redis(key)
+        if book is not None:
+            self._set_local(key, book)
+            return replace(book)
+        return None
+
+    def set_book(self, book: Book) -> None:
+        key = _book_key(book.isbn)
+        self._set_local(key, replace(book))
+        self._set_redis(key, book)
+
+    # ───────────────────────────────
+    # 列表：只放一级缓存（整张表放 Redis 里反序列化的开销不比查数据库小多少）
+    # key 必须以 _LIST_PREFIX 开头，写入时才会被一起失效
+    # ───────────────────────────────
+    def get_list(self, key: str) -> list[Book] | None:
+        books = self._get_local(key)
+        return None if books is None else [replace(book) for book in books]
+
+    def set_list(self, key: str, books: list[Book]) -> None:
+        self._set_local(key, tuple(replace(book) for book in books))
+
+    # ───────────────────────────────
+    # 失效
+    # ───────────────────────────────
+    def invalidate_book(self, isbn: str) -> None:
+        """一本书变了：这本书自己和所有列表都失效"""
+        key = _book_key(isbn)
+        with self._lock:
+            self._entries.pop(key, None)
+            for k in [k for k in self._entries if k.startswith(_LIST_PREFIX)]:
+                del self._entries[k]
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._key_prefix + key)
+            except Exception:
+                self.redis_errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "redis": None,
+        }
+        if self._redis is not None:
+            stats["redis"] = {"hits": self.redis_hits, "misses": self.redis_misses, "errors": self.redis_errors}
+        return stats
+
+    # ───────────────────────────────
+    # 内部：一级缓存（OrderedDict 做 LRU：命中时移到末尾，满了从头部淘汰）
+    # ───────────────────────────────
+    def _get_local(self, key: str):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _set_local(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # ───────────────────────────────
+    # 内部：二级缓存（Redis 出错只记数，不影响请求，退回查数据库）
+    # ───────────────────────────────
+    def _get_redis(self, key: str) -> Book | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(self._key_prefix + key)
+        except Exception:
+            self.redis_errors += 1
+            return None
+        if raw is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        return Book(**serializer.loads(raw))
+
+    def _set_redis(self, key: str, book: Book) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(self._key_prefix + key, serializer.dumps(book), ex=self._redis_ttl_seconds)
+        except Exception:
+            self.redis_errors += 1
+
+
+class CachedBookRepository(BookRepository):
+    """
+    包在任意 BookRepository 外面的读穿透缓存
+    读：get_by_isbn / get_all / get_all_available 先查缓存，没有再查数据库并放进缓存
+    写：save / delete / mark_borrowed / bulk_upsert 等直接交给内层仓库，然后让缓存失效
+    """
+
+    def __init__(self, inner: BookRepository, cache: BookCache, session: Session | None = None):
+        self._inner = inner
+        self._cache = cache
+        # 传了会话的话，事务提交后再失效一次（见文件开头的说明）
+        self._session = session
+        self._pending: set[str] = set()
+        self._pending_clear = False
+        self._listening = False
+
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        book = self._cache.get_book(isbn)
+        if book is None:
+            book = self._inner.get_by_isbn(isbn)
+            if book is not None:
+                self._cache.set_book(book)
+        return book
+
+    def get_all(self) -> list[Book]:
+        return self._cached_list(f"{_LIST_PREFIX}all", self._inner.get_all)
+
+    def get_all_available(self) -> list[Book]:
+        return self._cached_list(f"{_LIST_PREFIX}available", self._inner.get_all_available)
+
+    def get_borrows_by_user(self, user_id: str) -> list[Book]:
+        return self._inner.get_borrows_by_user(user_id)  # 每个用户不同，而且借还时都会变，不缓存
+
+    def get_page(self, filters: BookFilter, limit: int, after_isbn: str | None = None) -> list[Book]:
+        # 热点主要是第一页；缓存键包含筛选条件和游标，写入时和其他列表一起失效
+        key = f"{_LIST_PREFIX}page:{filters}:{limit}:{after_isbn}"
+        return self._cached_list(key, lambda: self._inner.get_page(filters, limit, after_isbn))
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        return self._inner.search(query, limit, offset)  # 查询词千变万化，缓存命中率低，不缓存
+
+    def iter_books(self, filters: BookFilter, batch_size: int = 500) -> Iterator[Book]:
+        return self._inner.iter_books(filters, batch_size)  # 导出是一次性的全量扫描，不缓存
+
+    def save(self, book: Book) -> None:
+        self._inner.save(book)
+        self._invalidate(book.isbn)
+
+    def delete(self, isbn: str) -> bool:
+        deleted = self._inner.delete(isbn)
+        self._invalidate(isbn)
+        return deleted
+
+    def mark_borrowed(self, isbn: str, borrower_id: str) -> Book | None:
+        book = self._inner.mark_borrowed(isbn, borrower_id)
+        if book is not None:
+            self._invalidate(isbn)
+        return book
+
+    def bulk_upsert(self, books: list[Book], update_existing: bool = False) -> set[str]:
+        existing = self._inner.bulk_upsert(books, update_existing)
+        if update_existing or len(existing) < len(books):
+            self._invalidate_all()  # 一次改了一批：直接清空，比逐本失效简单
+        return existing
+
+    def get_many_by_isbns(self, isbns: list[str]) -> list[Book]:
+        return self._inner.get_many_by_isbns(isbns)  # 批量借还出错时才用，直接查数据库
+
+    def mark_many_borrowed(self, isbns: list[str], borrower_id: str) -> list[Book]:
+        books = self._inner.mark_many_borrowed(isbns, borrower_id)
+        for book in books:
+            self._invalidate(book.isbn)
+        return books
+
+    def release_many(self, isbns: list[str]) -> None:
+        self._inner.release_many(isbns)
+        for isbn in isbns:
+            self._invalidate(isbn)
+
+    def _cached_list(self, key: str, load) -> list[Book]:
+        books = self._cache.get_list(key)
+        if books is None:
+            books = load()
+            self._cache.set_list(key, books)
+        return books
+
+    def _invalidate(self, isbn: str) -> None:
+        self._cache.invalidate_book(isbn)
+        if self._session is not None:
+            self._pending.add(isbn)
+        self._listen_for_commit()
+
+    def _invalidate_all(self) -> None:
+        self._cache.clear()
+        self._pending_clear = True
+        self._listen_for_commit()
+
+    def _listen_for_commit(self) -> None:
+        if self._session is not None and not self._listening:
+            event.listen(self._session, "after_commit", self._after_commit, once=True)
+            self._listening = True
+
+    def _after_commit(self, session: Session) -> None:
+        if self._pending_clear:
+            self._cache.clear()
+        else:
+            for isbn in self._pending:
+                self._cache.invalidate_book(isbn)
+        self._pending.clear()
+        self._pending_clear = False
+        self._listening = False
+
+
+def create_book_cache() -> BookCache:
+    """按 settings 创建缓存；配置了 BOOK_CACHE_REDIS_URL 且不是异步模式才启用 Redis 二级缓存"""
+    redis_client = None
+    if settings.BOOK_CACHE_REDIS_URL and settings.DB_ASYNC:
+        logger.warning("异步模式下不启用图书缓存的 Redis 二级缓存（同步客户端会阻塞事件循环），只用进程内缓存")
+    elif settings.BOOK_CACHE_REDIS_URL:
+        import redis  # Celery 的 Redis broker 已经依赖了 redis 包
+        redis_client = redis.Redis.from_url(
+            settings.BOOK_CACHE_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2
+        )
+    return BookCache(
+        max_size=settings.BOOK_CACHE_MAX_SIZE,
+        ttl_seconds=settings.BOOK_CACHE_TTL_SECONDS,
+        redis_client=redis_client,
+        redis_ttl_seconds=settings.BOOK_CACHE_REDIS_TTL_SECONDS,
+    )
+
+
+# 进程内共享的缓存实例（和 infrastructure/connection.py 里的 engine 一样，每个 worker 进程一份）
+book_cache = create_book_cache()
@@ -1,5 +1,12 @@
-from sqlalchemy.orm import Session  # SQLAlchemy 的数据库会话
+from collections.abc import Iterator
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query, Session  # SQLAlchemy 的数据库会话
 from .models import BookDB  # ORM 模型（对应数据库表）
+from . import book_search_index
+from core.book_search import query_terms
+from settings import settings
+from core.dtos import BookFilter
 from core.models import Book  # 业务模型（纯 Python 对象，不含数据库细节）
 from core.interfaces import BookRepository
 
@@ -9,6 +16,10 @@ from core.interfaces import BookRepository
 class SqlAlchemyBookRepository(BookRepository):
     def __init__(self, session: Session):
         self._session = session  # 把数据库会话保存到实例变量中，后面 CRUD 都要用它
+        # 本仓库加载过的 ORM 对象（isbn -> BookDB）
+        # 会话的身份映射（identity map）只保存弱引用：_to_domain 之后 ORM 对象没人引用就被回收了，
+        # 下次 session.get 又得查一遍数据库。这里持有强引用，同一个请求里 get_by_isbn → save 只查一次
+        self._rows: dict[str, BookDB] = {}
 
     # ───────────────────────────────
     # R: Read（根据 ISBN 查询一本书）
@@ -19,9 +30,9 @@ class SqlAlchemyBookRepository(BookRepository):
         参数：isbn - 书的 ISBN 编号（字符串）
         返回：找到的 Book 对象，或 None（如果没找到）
         """
-        # 1.  从数据库查 BookDB 对象： books 表中找 isbn 等于传入值的记录
-        #    .first() 表示只取第一条（因为 ISBN 是主键，最多只有一条）
-        db_book = self._session.query(BookDB).filter(BookDB.isbn == isbn).first()
+        # 1.  从数据库查 BookDB 对象：ISBN 是主键，用 session.get 按主键取
+        #    session.get 会先查会话的“身份映射”（identity map）：同一个会话里已经加载过的书直接返回，不再发 SELECT
+        db_book = self._get_row(isbn)
 
         # 2. 转换成领域模型 Book（核心！解耦数据库和业务）；否则返回 None
         return self._to_domain(db_book) if db_book else None
@@ -48,8 +59,8 @@ class SqlAlchemyBookRepository(BookRepository):
         参数：book - 包含最新信息的 Book 对象
         返回：更新后的 Book 对象
         """
-        # 1. 先根据 ISBN 找到数据库中的记录
-        db_book = self._session.query(BookDB).filter(BookDB.isbn == book.isbn).first()
+        # 1. 先根据 ISBN 找到数据库中的记录（前面 get_by_isbn 过的话，直接从身份映射拿，不会重复查询）
+        db_book = self._get_row(book.isbn)
         # 如果没找到，新建一条，这里是新增逻辑
         if not db_book:
             db_book = BookDB(
@@ -58,8 +69,14 @@ class SqlAlchemyBookRepository(BookRepository):
                 author=book.author
             )
             self._session.add(db_book)
+            self._rows[book.isbn] = db_book
+            book_search_index.index_books(self._session, [book])
         # 2. 更新状态（不管新旧，都同步 is_borrowed 和 borrowed_by）
         else:
+            if (db_book.title, db_book.author) != (book.title, book.author):
+                # 借书还书不改书名，不用重建索引；索引的 rowid 跟书名有关，要先按旧书名删掉
+                book_search_index.unindex_books(self._session, [(db_book.isbn, db_book.title)])
+                book_search_index.index_books(self._session, [book])
             db_book.title = book.title
             db_book.author = book.author
             db_book.is_borrowed = book.is_borrowed
@@ -77,12 +94,14 @@ class SqlAlchemyBookRepository(BookRepository):
         参数：isbn - 要删除的书的 ISBN
         返回：True 表示删除成功，False 表示书不存在
         """
-        # 1. 查找要删除的书
-        db_book = self._session.query(BookDB).filter(BookDB.isbn == isbn).first()
+        # 1. 查找要删除的书（同样走身份映射）
+        db_book = self._get_row(isbn)
         # 2. 如果找到了，就删除它
         if db_book:
             # 标记为删除
             self._session.delete(db_book)
+            self._rows.pop(isbn, None)
+            book_search_index.unindex_books(self._session, [(isbn, db_book.title)])
             # 注意：这里不 commit！由 API 层统一提交（保证事务）
             return True
         return False
@@ -103,9 +122,200 @@ class SqlAlchemyBookRepository(BookRepository):
     # 查询：获取所有可借阅的图书
     # ───────────────────────────────
     def get_all_available(self) -> list[Book]:
-        db_books = self._session.query(BookDB).filter(BookDB.is_borrowed == False).all()
+        db_books = self._filtered_query(BookFilter(available=True)).all()
         return [self._to_domain(db_book) for db_book in db_books]
 
+    # ───────────────────────────────
+    # 查询：分页 + 筛选（图书目录）
+    # ───────────────────────────────
+    def get_page(self, filters: BookFilter, limit: int, after_isbn: str | None = None) -> list[Book]:
+        """
+        功能：按 isbn 排序取一页
+        keyset 分页：`WHERE isbn > 上一页最后一个 isbn ORDER BY isbn LIMIT n`，直接走主键索引，
+        翻到多深都一样快（OFFSET 要先数过前面所有行）
+        """
+        query = self._filtered_query(filters)
+        if after_isbn is not None:
+            query = query.filter(BookDB.isbn > after_isbn)
+        db_books = query.order_by(BookDB.isbn).limit(limit).all()
+        return [self._to_domain(db_book) for db_book in db_books]
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        """
+        功能：全文搜索书名和作者，按相关度排序（SQLite FTS5 / PostgreSQL trigram，见 book_search_index）
+        相关度没法做 keyset 分页，这里用 LIMIT/OFFSET（翻页深度由 service 限制）
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        stmt = book_search_index.search_statement(
+            self._session.get_bind().dialect.name, terms, limit, offset, settings.BOOK_SEARCH_RANK_WINDOW
+        )
+        return [self._to_domain(db_book) for db_book in self._session.scalars(stmt)]
+
+    def iter_books(self, filters: BookFilter, batch_size: int = 500) -> Iterator[Book]:
+        """
+        功能：导出用，逐条产出图书
+        yield_per：用服务端游标（支持的驱动上）每次只取 batch_size 行，转换完就丢掉，
+        不会像 .all() 那样把整张表一次性读进内存
+        """
+        query = self._filtered_query(filters).order_by(BookDB.isbn).yield_per(batch_size)
+        for db_book in query:
+            yield self._to_domain(db_book)
+
+    def _filtered_query(self, filters: BookFilter) -> Query:
+        """把筛选条件翻译成 SQL 的 WHERE（在数据库里过滤，而不是查出来再用 Python 过滤）"""
+        query = self._session.query(BookDB)
+        if filters.author:
+            query = query.filter(BookDB.author.icontains(filters.author, autoescape=True))
+        if filters.title:
+            query = query.filter(BookDB.title.icontains(filters.title, autoescape=True))
+        if filters.available is not None:
+            query = query.filter(BookDB.is_borrowed == (not filters.available))
+        return query
+
+    # ───────────────────────────────
+    # 借书：条件更新（原子操作）
+    # ───────────────────────────────
+    def mark_borrowed(self, isbn: str, borrower_id: str) -> Book | None:
+        """
+        功能：把一本未借出的书标记为借出
+        一条 `UPDATE books SET is_borrowed=1, borrowed_by=? WHERE isbn=? AND is_borrowed=0 RETURNING ...`
+        “检查”和“修改”在同一条语句里完成，两个人同时借同一本书时，只有一个人能更新成功（另一个影响 0 行）
+        返回：更新后的 Book；书不存在或已被借出时返回 None
+        """
+        stmt = (
+            update(BookDB)
+            .where(BookDB.isbn == isbn, BookDB.is_borrowed == False)
+            .values(is_borrowed=True, borrowed_by=borrower_id)
+        )
+        if self._session.get_bind().dialect.update_returning:
+            # populate_existing：如果这本书已经在会话里，用 RETURNING 的结果刷新它
+            db_book = self._session.execute(
+                stmt.returning(BookDB), execution_options={"populate_existing": True}
+            ).scalar_one_or_none()
+            if db_book is None:
+                return None
+            self._rows[isbn] = db_book
+            return self._to_domain(db_book)
+        # 不支持 UPDATE ... RETURNING 的数据库（如 MySQL）：看影响行数，成功后再查一次
+        if self._session.execute(stmt).rowcount == 0:
+            return None
+        return self.get_by_isbn(isbn)
+
+    # ───────────────────────────────
+    # 批量借还：一条 UPDATE ... WHERE isbn IN (...)
+    # ───────────────────────────────
+    def get_many_by_isbns(self, isbns: list[str]) -> list[Book]:
+        db_books = self._session.query(BookDB).filter(BookDB.isbn.in_(isbns)).all()
+        self._rows.update((db_book.isbn, db_book) for db_book in db_books)
+        return [self._to_domain(db_book) for db_book in db_books]
+
+    def mark_many_borrowed(self, isbns: list[str], borrower_id: str) -> list[Book]:
+        """mark_borrowed 的批量版：条件和单本一样（is_borrowed = false），并发借同一本书只有一个人成功"""
+        if not isbns:
+            return []
+        stmt = (
+            update(BookDB)
+            .where(BookDB.isbn.in_(isbns), BookDB.is_borrowed == False)
+            .values(is_borrowed=True, borrowed_by=borrower_id)
+        )
+        if self._session.get_bind().dialect.update_returning:
+            db_books = self._session.execute(
+                stmt.returning(BookDB), execution_options={"populate_existing": True}
+            ).scalars().all()
+        else:
+            # 不支持 RETURNING：先锁住可借的行，再只更新这些行
+            available = (
+                self._session.query(BookDB)
+                .filter(BookDB.isbn.in_(isbns), BookDB.is_borrowed == False)
+                .with_for_update()
+                .all()
+            )
+            if available:
+                self._session.execute(stmt.where(BookDB.isbn.in_([b.isbn for b in available])))
+            db_books = available
+        self._rows.update((db_book.isbn, db_book) for db_book in db_books)
+        return [self._to_domain(db_book) for db_book in db_books]
+
+    def release_many(self, isbns: list[str]) -> None:
+        if isbns:
+            # ORM 批量 UPDATE 会同步更新会话里已加载的对象（synchronize_session），不用再查一遍
+            self._session.execute(
+                update(BookDB).where(BookDB.isbn.in_(isbns)).values(is_borrowed=False, borrowed_by=None)
+            )
+
+    # ───────────────────────────────
+    # 批量导入：一批一条 INSERT ... ON CONFLICT
+    # ───────────────────────────────
+    def bulk_upsert(self, books: list[Book], update_existing: bool = False) -> set[str]:
+        """
+        功能：批量写入一批书（调用方保证 isbn 不重复、每批几百到几千条）
+        - 先用一条 IN 查询找出已存在的 isbn（用来统计新增/更新/跳过）
+        - 再用一条多行 INSERT 写入（SQLAlchemy 会把参数列表合并成 insertmanyvalues 批量语句），
+          冲突交给数据库处理（ON CONFLICT DO NOTHING / DO UPDATE）：并发导入同一本书也不会报主键冲突
+        返回：写入前就已存在的 isbn（跳过模式下是没有插入的 isbn）
+        """
+        if not books:
+            return set()
+        isbns = [book.isbn for book in books]
+        # 顺便取旧书名：更新模式要按旧书名删掉旧索引
+        old_titles = dict(self._session.execute(select(BookDB.isbn, BookDB.title).where(BookDB.isbn.in_(isbns))).all())
+        existing = set(old_titles)
+        rows = [{"isbn": b.isbn, "title": b.title, "author": b.author, "is_borrowed": False} for b in books]
+
+        dialect = self._session.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(BookDB)
+            if update_existing:
+                # 只更新目录信息；借阅状态（is_borrowed / borrowed_by）保持不变
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[BookDB.isbn],
+                    set_={"title": stmt.excluded.title, "author": stmt.excluded.author},
+                )
+                self._session.execute(stmt, rows)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[BookDB.isbn])
+                if self._session.get_bind().dialect.insert_executemany_returning:
+                    # 以 RETURNING 回来的为准：上面查完之后才被并发导入插进去的书，这里 DO NOTHING 跳过了，
+                    # 不能当成新书计数，也不能再给它建一遍索引
+                    inserted = set(self._session.scalars(stmt.returning(BookDB.isbn), rows))
+                    existing = set(isbns) - inserted
+                else:
+                    self._session.execute(stmt, rows)
+        else:
+            # 其他数据库：用上面查到的 existing 区分插入和更新
+            new_rows = [row for row in rows if row["isbn"] not in existing]
+            if new_rows:
+                self._session.execute(insert(BookDB), new_rows)
+            if update_existing and existing:
+                self._session.execute(
+                    update(BookDB),
+                    [{"isbn": r["isbn"], "title": r["title"], "author": r["author"]} for r in rows if r["isbn"] in existing],
+                )
+
+        # 新书（跳过模式下是真正插进去的书）都要建索引；已存在的书只有更新模式才改了书名和作者
+        if update_existing:
+            book_search_index.unindex_books(self._session, list(old_titles.items()))
+        book_search_index.index_books(
+            self._session, [b for b in books if update_existing or b.isbn not in existing]
+        )
+        # 绕过 ORM 直接写的表：会话里已加载的这些书要过期，下次访问重新读
+        for isbn in existing:
+            row = self._rows.get(isbn)
+            if row is not None:
+                self._session.expire(row)
+        return existing
+
+    # ───────────────────────────────
+    # 辅助方法：按主键取 ORM 对象（先查身份映射）
+    # ───────────────────────────────
+    def _get_row(self, isbn: str) -> BookDB | None:
+        db_book = self._session.get(BookDB, isbn)
+        if db_book is not None:
+            self._rows[isbn] = db_book
+        return db_book
+
     # ───────────────────────────────
     # 辅助方法：ORM 模型 → 业务模型
     # ───────────────────────────────
@@ -0,0 +1,163 @@
+# 图书全文搜索（GET /books/search）的数据库实现，分词和排序规则见 core/book_search.py
+# - SQLite：FTS5 虚拟表 books_search（建表语句在 infrastructure/models.py），存分好的词，rowid 是 rank_key(isbn, 书名)，
+#   所以 FTS5 按 rowid 产出命中的顺序就是“书名短的在前”。排序只需要再知道每本书有几个词命中了书名
+#   （在 title 列存的 token 串里找子串），不用 bm25：bm25 要扫完这个词的整个倒排表算 IDF，
+#   “python”这种命中几十万本的词一次要几十毫秒。命中太多时只在前 rank_window 本（书名最短的那些）里排序，
+#   查询延迟和目录大小基本无关
+#   FTS5 调不了 Python 分词，所以不用触发器：仓库写 books 的时候同步写这张表（save / delete / bulk_upsert），
+#   rowid 跟书名有关，删旧索引时要用旧书名。绕过仓库直接改了 books 表的话，重建索引：python -m infrastructure.book_search_index
+# - PostgreSQL：pg_trgm 的 GIN 表达式索引（迁移 v2 创建），每个词一个 LIKE '%词%' 条件；
+#   排序规则相同，只是书名一样长时按 isbn 排（表里没有 rank_key）
+# - 其他数据库：同样的 LIKE 逐行匹配，只是没有索引
+from sqlalchemy import (
+    Column, Integer, MetaData, String, Table, case, delete, func, insert, literal_column, select,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, Select
+
+from core.book_search import SearchTerm, index_tokens, rank_key
+from core.models import Book
+from .models import BookDB
+
+_MAX_ROWID = 2**63 - 1
+
+# 只用来拼 SQL，不参与 create_all（建表语句见 BOOKS_SEARCH_DDL）
+_metadata = MetaData()
+books_search = Table(
+    "books_search",
+    _metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("isbn", String),
+    Column("title", String),
+    Column("author", String),
+)
+
+
+def to_fts5_query(terms: list[SearchTerm], column: str | None = None) -> str:
+    """SearchTerm → FTS5 查询：多个 token 是短语（必须相邻），前缀匹配加 *，各项之间 AND；column 限定只搜某一列"""
+    # token 只包含字母数字和中日韩文字（见 core/book_search.py），放进双引号里不用转义
+    scope = f"{column} : " if column else ""
+    return " AND ".join(
+        f'{scope}"{" ".join(term.tokens)}"' + ("*" if term.prefix else "") for term in terms
+    )
+
+
+def _dialect(executor: Session | Connection) -> str:
+    return (executor.get_bind() if isinstance(executor, Session) else executor).dialect.name
+
+
+def _row(isbn: str, title: str, author: str) -> dict:
+    return {
+        "rowid": rank_key(isbn, title),
+        "isbn": isbn,
+        "title": " ".join(index_tokens(title)),
+        "author": " ".join(index_tokens(author)),
+    }
+
+
+def index_books(executor: Session | Connection, books: list[Book]) -> None:
+    """
+    给这些书建索引（只有 SQLite 要做；PostgreSQL 的 trigram 索引由数据库自己维护）
+    书名改了的话，调用方要先用旧书名 unindex_books
+    """
+    if books and _dialect(executor) == "sqlite":
+        # OR REPLACE：同一个 rowid 已经有一行（比如绕过仓库删过书）就覆盖
+        executor.execute(insert(books_search).prefix_with("OR REPLACE"), [_row(b.isbn, b.title, b.author) for b in books])
+
+
+def unindex_books(executor: Session | Connection, books: list[tuple[str, str]]) -> None:
+    """删掉这些书的索引；books 是 (isbn, 建索引时的书名)"""
+    if books and _dialect(executor) == "sqlite":
+        rowids = [rank_key(isbn, title) for isbn, title in books]
+        executor.execute(delete(books_search).where(books_search.c.rowid.in_(rowids)))
+
+
+def rebuild(conn: Connection, batch_size: int = 5000) -> int:
+    """按 books 表整个重建 SQLite 的索引（可以重复执行），返回索引的图书数"""
+    if _dialect(conn) != "sqlite":
+        return 0
+    conn.execute(delete(books_search))
+    count = 0
+    result = conn.execute(select(BookDB.isbn, BookDB.title, BookDB.author))
+    while rows := result.fetchmany(batch_size):
+        conn.execute(insert(books_search).prefix_with("OR REPLACE"), [_row(*row) for row in rows])
+        count += len(rows)
+    return count
+
+
+def search_statement(dialect: str, terms: list[SearchTerm], limit: int, offset: int, rank_window: int) -> Select:
+    """按相关度排序的一页图书（SELECT books.*）；rank_window 只对 SQLite 有效，见文件开头"""
+    if dialect == "sqlite":
+        return _sqlite_search(terms, limit, offset, rank_window)
+
+    # 和迁移 v2 里 PostgreSQL 索引的表达式一致，才能用上索引；' ' 写成字面量，不能是绑定参数
+    haystack = func.lower(BookDB.title.concat(literal_column("' '")).concat(BookDB.author))
+    title = func.lower(BookDB.title)
+    title_hits = _count(title.contains(term.text, autoescape=True) for term in terms)
+    return (
+        select(BookDB)
+        .where(*(haystack.contains(term.text, autoescape=True) for term in terms))
+        .order_by(title_hits.desc(), func.length(BookDB.title), BookDB.isbn)
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def _sqlite_search(terms: list[SearchTerm], limit: int, offset: int, rank_window: int) -> Select:
+    def match(query: str) -> ColumnElement:
+        return literal_column("books_search").match(query)
+
+    # 第 rank_window 个命中的 rowid（FTS5 本来就按 rowid 顺序产出命中，不用打分）；命中不够这么多时不限制
+    # correlate(None)：子查询也是 FROM books_search，不能被 SQLAlchemy 当成引用外层的同一张表
+    bound = func.coalesce(
+        select(books_search.c.rowid)
+        .where(match(to_fts5_query(terms)))
+        .order_by(books_search.c.rowid)
+        .limit(1)
+        .offset(rank_window - 1)
+        .correlate(None)
+        .scalar_subquery(),
+        _MAX_ROWID,
+    )
+    # 书名命中几个词：索引里存的就是空格分隔的 token，直接在窗口内这几行的 title 列上找子串
+    # （" pyth" 是前缀匹配，" 三体 体地 " 是相邻的短语），不用再对每个词查一遍 FTS5（热门词的倒排表很长）
+    padded = literal_column("' '").concat(books_search.c.title).concat(literal_column("' '"))
+    title_hits = _count(
+        func.instr(padded, " " + " ".join(term.tokens) + ("" if term.prefix else " ")) > 0 for term in terms
+    )
+    title_hits = title_hits.label("title_hits")
+    # LIMIT 在子查询里：先排出这一页（只有 rowid、isbn），再 JOIN 回 books
+    page = (
+        select(books_search.c.rowid, books_search.c.isbn, title_hits)
+        .where(match(to_fts5_query(terms)), books_search.c.rowid <= bound)
+        .order_by(title_hits.desc(), books_search.c.rowid)
+        .limit(limit)
+        .offset(offset)
+        .subquery("page")
+    )
+    return (
+        select(BookDB)
+        .select_from(page)
+        .join(BookDB, BookDB.isbn == page.c.isbn)
+        .order_by(page.c.title_hits.desc(), page.c.rowid)
+    )
+
+
+def _count(conditions) -> ColumnElement:
+    """成立的条件有几个"""
+    total = None
+    for condition in conditions:
+        value = case((condition, 1), else_=0)
+        total = value if total is None else total + value
+    return total
+
+
+if __name__ == "__main__":
+    from infrastructure.connection import engine
+
+    with engine.begin() as conn:
+        if _dialect(conn) == "sqlite":
+            print(f"重建了 {rebuild(conn)} 本书的搜索索引")
+        else:
+            print(f"{_dialect(conn)} 不需要重建（索引由数据库维护）")
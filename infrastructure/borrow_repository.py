@@ -1,3 +1,4 @@
+from sqlalchemy import and_, case, func, insert, or_, select, update
 from sqlalchemy.orm import Session
 from core.interfaces import BorrowRepository
 from core.models import BorrowRecord
@@ -9,6 +10,9 @@ from datetime import datetime, timezone
 class SqlAlchemyBorrowRepository(BorrowRepository):
     def __init__(self, session: Session):
         self._session = session
+        # 本仓库加载过的 ORM 对象（id -> BorrowRecordDB），持有强引用让 get_by_id → save 命中身份映射
+        # （原因见 SqlAlchemyBookRepository._rows）
+        self._rows: dict[int, BorrowRecordDB] = {}
 
 
     def create(self, borrow: BorrowRecord) -> BorrowRecord:
@@ -23,18 +27,18 @@ class SqlAlchemyBorrowRepository(BorrowRepository):
         )
         self._session.add(db_borrow)
         self._session.flush()   # 立即获取生成的 ID，但不 commit
+        self._rows[db_borrow.id] = db_borrow
         return self._to_domain(db_borrow)
 
     def get_by_id(self, borrow_id: int) -> BorrowRecord | None:
-        db_borrow = (
-            self._session.query(BorrowRecordDB)
-            .filter(BorrowRecordDB.id == borrow_id)
-            .first()
-        )
-        return self._to_domain(db_borrow) if db_borrow else None
+        db_borrow = self._session.get(BorrowRecordDB, borrow_id)  # 按主键取，会话里已加载过的不再查询
+        if db_borrow is None:
+            return None
+        self._rows[borrow_id] = db_borrow
+        return self._to_domain(db_borrow)
     
     def save(self, borrow: BorrowRecord) -> None: 
-        db_borrow= self._session.query(BorrowRecordDB).filter(BorrowRecordDB.id == borrow.id).one() # 必须存在
+        db_borrow = self._session.get_one(BorrowRecordDB, borrow.id)  # 必须存在；get_by_id 过的直接从身份映射拿
 
         db_borrow.returned_at = borrow.returned_at
         db_borrow.is_returned = borrow.is_returned
@@ -45,32 +49,136 @@ class SqlAlchemyBorrowRepository(BorrowRepository):
     def get_borrows_by_user(self, 
                             user_id: str,
                             page: int = 1,
-                            size: int = 10
-) -> tuple[list[BorrowRecordDto], int]: # 返回借阅记录和总数量
+                            size: int = 10,
+                            include_total: bool = True
+) -> tuple[list[BorrowRecordDto], int | None]: # 返回借阅记录和总数量
         """
         分页查询用户的借阅记录（含书名）
-        返回: (记录列表, 总数量)
+        返回: (记录列表, 总数量)，include_total=False 时总数量为 None（省掉一次 COUNT 查询）
         """
         offset = (page - 1) * size
 
-        # 查询该用户借阅记录的总数量，用于分页
-        total = self._session.query(BorrowRecordDB).filter(BorrowRecordDB.borrower_id == user_id).count()
+        # 查询该用户借阅记录的总数量，用于分页（只有需要时才查）
+        total = self.count_by_user(user_id) if include_total else None
 
         # 查询借阅激励，并关联join图书表查询出书名
         # ✅ 使用 `JOIN` 一次查出借阅记录 + 书名，避免 N+1 查询。
-        query=(
+        query = self._user_borrows_query(user_id).offset(offset).limit(size)
+        result = []
+        for db_borrow, book_title in query.all():
+            result.append(self._to_domain_with_title(db_borrow, book_title))
+        return result, total
+
+    def get_borrows_by_user_after(self,
+                                  user_id: str,
+                                  limit: int,
+                                  after: tuple[datetime, int] | None = None
+) -> list[BorrowRecordDto]:
+        """
+        游标（keyset）分页查询用户的借阅记录（含书名）
+        after: 上一页最后一条记录的 (borrowed_at, id)，为 None 表示第一页
+        ✅ 用 WHERE 条件直接定位到上一页末尾，不管翻到第几页都只扫描 limit 条，不会像 OFFSET 那样越翻越慢
+        """
+        query = self._user_borrows_query(user_id)
+        if after is not None:
+            after_borrowed_at, after_id = after
+            # 排序是 (borrowed_at DESC, id DESC)，所以“排在后面”= 时间更早，或者时间相同但 id 更小
+            # 单独的 borrowed_at <= ? 让数据库能在索引上直接定位（range seek），而不是从头逐条过滤 OR 条件
+            query = query.filter(
+                BorrowRecordDB.borrowed_at <= after_borrowed_at,
+                or_(
+                    BorrowRecordDB.borrowed_at < after_borrowed_at,
+                    and_(
+                        BorrowRecordDB.borrowed_at == after_borrowed_at,
+                        BorrowRecordDB.id < after_id,
+                    ),
+                )
+            )
+        return [
+            self._to_domain_with_title(db_borrow, book_title)
+            for db_borrow, book_title in query.limit(limit).all()
+        ]
+
+    def count_by_user(self, user_id: str) -> int:
+        # 直接 SELECT count(*)，不像 Query.count() 那样再包一层子查询
+        return self._session.execute(
+            select(func.count()).select_from(BorrowRecordDB).where(BorrowRecordDB.borrower_id == user_id)
+        ).scalar_one()
+
+    # ───────────────────────────────
+    # 批量借还
+    # ───────────────────────────────
+    def create_many(self, borrows: list[BorrowRecord]) -> list[BorrowRecord]:
+        """
+        一条多行 INSERT ... RETURNING 插入多条借阅记录
+        （add_all + flush 在 SQLite 上会退化成一行一条 INSERT，因为要保证 RETURNING 的顺序）
+        RETURNING 的顺序不保证和参数一致，所以按 book_isbn 对回去：同一批里一本书只会借一次
+        """
+        if not borrows:
+            return []
+        rows = [
+            {
+                "book_isbn": borrow.book_isbn,
+                "borrower_id": borrow.borrower_id,
+                "borrowed_at": borrow.borrowed_at,
+                "due_date": borrow.due_date,
+                "is_returned": False,
+                "is_overdue": False,
+            }
+            for borrow in borrows
+        ]
+        if self._session.get_bind().dialect.insert_executemany_returning:
+            db_borrows = self._session.scalars(insert(BorrowRecordDB).returning(BorrowRecordDB), rows).all()
+            by_isbn = {db_borrow.book_isbn: db_borrow for db_borrow in db_borrows}
+            db_borrows = [by_isbn[borrow.book_isbn] for borrow in borrows]
+        else:  # 不支持 RETURNING 的数据库（如 MySQL）：逐行 INSERT
+            db_borrows = [BorrowRecordDB(**row) for row in rows]
+            self._session.add_all(db_borrows)
+            self._session.flush()
+        self._rows.update((db_borrow.id, db_borrow) for db_borrow in db_borrows)
+        return [self._to_domain(db_borrow) for db_borrow in db_borrows]
+
+    def get_many_by_ids(self, borrow_ids: list[int]) -> list[BorrowRecord]:
+        db_borrows = self._session.query(BorrowRecordDB).filter(BorrowRecordDB.id.in_(borrow_ids)).all()
+        self._rows.update((db_borrow.id, db_borrow) for db_borrow in db_borrows)
+        return [self._to_domain(db_borrow) for db_borrow in db_borrows]
+
+    def mark_many_returned(self, borrow_ids: list[int], returned_at: datetime, overdue_ids: set[int]) -> set[int]:
+        """
+        一条 UPDATE 归还多条记录；WHERE is_returned = false 保证同一条记录并发归还时只有一次成功
+        是否逾期由调用方算好传进来（和单本还书用同一套时间判断），这里用 CASE 一次写进去
+        """
+        if not borrow_ids:
+            return set()
+        stmt = (
+            update(BorrowRecordDB)
+            .where(BorrowRecordDB.id.in_(borrow_ids), BorrowRecordDB.is_returned == False)
+            .values(
+                is_returned=True,
+                returned_at=returned_at,
+                is_overdue=case((BorrowRecordDB.id.in_(list(overdue_ids)), True), else_=False),
+            )
+        )
+        if self._session.get_bind().dialect.update_returning:
+            return set(self._session.execute(stmt.returning(BorrowRecordDB.id)).scalars())
+        self._session.execute(stmt)
+        return set(
+            self._session.execute(
+                select(BorrowRecordDB.id).where(
+                    BorrowRecordDB.id.in_(borrow_ids), BorrowRecordDB.returned_at == returned_at
+                )
+            ).scalars()
+        )
+
+    def _user_borrows_query(self, user_id: str):
+        """用户借阅记录 + 书名的基础查询，按 (borrowed_at, id) 倒序；id 保证同一时间的记录顺序稳定"""
+        return (
             self._session
             .query(BorrowRecordDB, BookDB.title)
             .join(BookDB, BorrowRecordDB.book_isbn == BookDB.isbn)
             .filter(BorrowRecordDB.borrower_id == user_id)
-            .order_by(BorrowRecordDB.borrowed_at.desc()) # 按借阅时间降序排序
-            .offset(offset)
-            .limit(size)
+            .order_by(BorrowRecordDB.borrowed_at.desc(), BorrowRecordDB.id.desc()) # 按借阅时间降序排序
         )
-        result = []
-        for db_borrow, book_title in query.all():
-            result.append(self._to_domain_with_title(db_borrow, book_title))
-        return result, total
     
     
     def _to_domain_with_title(self, db_borrow: BorrowRecordDB, book_title: str) -> BorrowRecordDto:
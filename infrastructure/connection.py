@@ -1,10 +1,13 @@
 ## ✅ 第三步：创建数据库连接（`database/connection.py`）
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
 import os
 from settings import settings
+from .pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
 
 load_dotenv() # 读取 .env 文件
 # 1. 配置数据库 URL（开发用 SQLite，生产可换 PostgreSQL/MySQL）
@@ -12,12 +15,69 @@ load_dotenv() # 读取 .env 文件
 # DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/library.db") # 从环境变量中获取数据库 URL
 DATABASE_URL = settings.DATABASE_URL # 从 settings.py 中获取
 
+
+def build_engine_kwargs(url: str, is_async: bool = False) -> dict:
+    """
+    根据数据库类型生成 create_engine / create_async_engine 的参数
+    - SQLite：`check_same_thread=False`（只有 SQLite 认识这个参数，传给 PostgreSQL 会直接报错）；
+      内存库用 StaticPool（所有会话共用一个连接，否则每个连接都是一个新的空库）
+    - 其他数据库：可配置的 QueuePool（大小、溢出、超时、回收、pre-ping），并带等待时间/超时统计
+    """
+    url = make_url(url)
+    kwargs = {"echo": settings.DB_ECHO}
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            # 🔒 `check_same_thread=False` 是 SQLite 在 Web 环境下的常见设置（允许跨线程使用）
+            kwargs["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            kwargs["poolclass"] = StaticPool
+            return kwargs
+    kwargs.update(
+        poolclass=InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return kwargs
+
+
+def sqlite_performance_pragmas() -> list[str]:
+    """SQLite 性能模式要执行的 PRAGMA（顺序有关系：journal_mode 要最先设置）"""
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+    ]
+
+
+def enable_sqlite_performance_mode(engine: Engine) -> None:
+    """
+    给 SQLite 引擎的每一个新连接执行性能 PRAGMA
+    PRAGMA 大多是“连接级”设置（journal_mode=WAL 例外，它会写进数据库文件），所以要在 connect 事件里设置，
+    连接池里新建的每个连接都会执行一次；异步引擎传 async_engine.sync_engine
+    """
+    pragmas = sqlite_performance_pragmas()
+    if make_url(str(engine.url)).database in (None, "", ":memory:"):
+        pragmas = pragmas[1:]  # 内存库没有 WAL
+
+    @event.listens_for(engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
 # 2. 创建数据库引擎
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={
-        "check_same_thread": False
-    },  # 🔒 `check_same_thread=False` 是 SQLite 在 Web 环境下的常见设置（允许跨线程使用）
-)
+engine = create_engine(DATABASE_URL, **build_engine_kwargs(DATABASE_URL))
+if settings.SQLITE_PERFORMANCE_MODE and engine.dialect.name == "sqlite":
+    enable_sqlite_performance_mode(engine)
 # 3. 创建会话工厂（SessionLocal 是一个“类”，不是实例！）
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
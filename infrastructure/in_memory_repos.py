@@ -1,5 +1,6 @@
 # 💾 第四步：实现内存存储（`infrastructure/in_memory_repos.py`）
 from core.models import Book, User
+from core.book_search import BookSearchIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class InMemoryBookRepo:
     # 实现 BookRepository 协议
     def __init__(self):
         self._books = {}  # 属性的字典格式是{isbn: Book}
+        self._search_index = BookSearchIndex()
 
     def get_by_isbn(self, isbn: str) -> Book | None:
         return self._books.get(isbn)
@@ -19,10 +21,14 @@ class InMemoryBookRepo:
         self._books[book.isbn] = (
             book  # 借书还书都要保存，放到_books里，key是isbn，不会重复
         )
+        self._search_index.add(book)
 
     def list_all(self) -> list[Book]:
         return list(self._books.values())
 
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        return self._search_index.search(query, limit, offset)
+
 
 class InMemoryUserRepo:
     # 实现 UserRepository 协议
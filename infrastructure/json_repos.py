@@ -1,9 +1,15 @@
 # ✅ 新增：JSON 持久化实现
-import json
+import os
+import threading
 
-# import os
 from pathlib import Path
+from core.logger import get_logger
 from core.models import User, Book
+from core.book_search import BookSearchIndex
+from core.serialization import serializer
+from settings import settings
+
+logger = get_logger(__name__)
 
 # E:\Projects\vscode\python-demo\library_system\data
 # 将数据文件放在项目根目录library_system\data
@@ -21,32 +27,141 @@ DATA_DIR.mkdir(exist_ok=True)
 def _load_json(file_path: Path, default: dict) -> dict:
     if not file_path.exists():
         return default
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return serializer.loads(file_path.read_bytes())
 
 
-# 保存数据
+# 保存数据：先写临时文件再改名（os.replace 是原子的），写到一半崩溃，原文件也还是完整的
 def _save_json(file_path: Path, data: dict) -> None:
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(serializer.dumps(data, indent=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+class JsonJournal:
+    """
+    一个 JSON 文件的增量持久化：快照 + 只追加的日志
+    - 快照（如 books.json）：格式和以前一样（key -> 记录），只在压缩时整体重写（_save_json，原子替换）
+    - 日志（books.json.journal）：每次保存只追加一行 {"k": key, "v": 记录}，一次写入 O(1)，不再重写整个文件
+    - 启动时读快照，再按顺序重放日志；崩溃时最后一行可能只写了一半，丢掉这一行即可
+    - 日志攒够 compact_every 行，后台线程把当前数据写成新快照：先把日志改名成 .compacting、新日志接着写，
+      快照写完再删掉 .compacting。任何一步崩溃，重放“快照 → .compacting → 日志”都能得到完整数据
+    """
+
+    def __init__(self, path: Path, compact_every: int | None = None, fsync: bool | None = None):
+        self._path = path
+        self._journal_path = path.with_name(path.name + ".journal")
+        self._compacting_path = path.with_name(path.name + ".journal.compacting")
+        self._compact_every = compact_every if compact_every is not None else settings.JSON_JOURNAL_COMPACT_EVERY
+        self._fsync = fsync if fsync is not None else settings.JSON_JOURNAL_FSYNC
+        self._records: dict[str, dict] = {}
+        self._entries = 0  # 当前日志里的行数
+        self._journal = None
+        self._lock = threading.Lock()  # 保护 _records、日志文件和改名
+        self._compaction_lock = threading.Lock()  # 同一时间只有一个压缩
+        self._compactor: threading.Thread | None = None
+
+    def load(self) -> dict[str, dict]:
+        """读快照并重放日志，返回 key -> 记录"""
+        self._records = _load_json(self._path, {})
+        leftover = self._compacting_path.exists()  # 上次压缩没做完（进程在中途退出了）
+        if leftover:
+            self._replay(self._compacting_path)
+        self._entries = self._replay(self._journal_path)
+        self._journal = open(self._journal_path, "ab", buffering=0)
+        if leftover or self._entries >= self._compact_every:
+            self.compact()
+        return dict(self._records)
+
+    def append(self, key: str, record: dict) -> None:
+        """追加一条记录（同一个 key 以最后一条为准）"""
+        line = serializer.dumps({"k": key, "v": record}) + b"\n"
+        with self._lock:
+            self._records[key] = dict(record)  # 复制一份：调用方之后还会改这个对象
+            self._journal.write(line)  # 无缓冲文件：一次 write 系统调用，进程崩溃也不会丢
+            if self._fsync:
+                os.fsync(self._journal.fileno())  # 断电也不丢，但每次写都要等磁盘
+            self._entries += 1
+            start = self._entries >= self._compact_every and not (self._compactor and self._compactor.is_alive())
+            if start:
+                self._compactor = threading.Thread(target=self._compact_in_background, name="json-compaction", daemon=True)
+                self._compactor.start()
+
+    def compact(self) -> None:
+        """把当前数据写成新快照、清空日志（同步执行；后台压缩也是调用它）"""
+        with self._compaction_lock:
+            with self._lock:
+                snapshot = dict(self._records)
+                self._rotate()
+            _save_json(self._path, snapshot)
+            self._compacting_path.unlink()
+
+    def join(self) -> None:
+        """等后台压缩结束（测试、关闭时用）"""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception:
+            # .compacting 会留着，数据不会丢：下次压缩或下次启动时会重放它
+            logger.exception("JSON 快照压缩失败：%s", self._path)
+
+    def _rotate(self) -> None:
+        """持有 _lock 时调用：当前日志交给压缩（改名成 .compacting），之后的写入进新日志"""
+        self._journal.close()
+        if self._compacting_path.exists():
+            # 上一次压缩失败留下的：接到它后面，保持“旧日志在前”的顺序
+            with open(self._compacting_path, "ab") as f:
+                f.write(self._journal_path.read_bytes())
+            self._journal_path.unlink()
+        else:
+            os.replace(self._journal_path, self._compacting_path)
+        self._journal = open(self._journal_path, "ab", buffering=0)
+        self._entries = 0
+
+    def _replay(self, path: Path) -> int:
+        """按顺序重放一个日志文件，返回有效行数；最后一行不完整时把它截掉"""
+        if not path.exists():
+            return 0
+        data = path.read_bytes()
+        count, offset = 0, 0
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            try:
+                if end == -1:
+                    raise ValueError("没有换行，写到一半")
+                entry = serializer.loads(data[offset:end])
+                if not isinstance(entry, dict) or "k" not in entry or "v" not in entry:
+                    raise ValueError(f"不是日志记录：{data[offset:end][:80]!r}")
+            except ValueError:
+                if end != -1 and data.find(b"\n", end + 1) != -1:
+                    raise  # 中间的行坏了不是崩溃造成的，不能悄悄跳过
+                logger.warning("%s 最后一行不完整（上次写入时崩溃），已丢弃", path)
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+                break
+            self._records[entry["k"]] = entry["v"]
+            count += 1
+            offset = end + 1
+        return count
 
 
 # JSON 持久化实现
 class JsonBookRepo:
-    def __init__(self):
+    def __init__(self, path: Path = BOOKS_FILE):
+        self._journal = JsonJournal(path)
         self._load_books()
 
     def _load_books(self):
-        raw_books = _load_json(BOOKS_FILE, {})  # 从本地文件加载json数据
+        raw_books = self._journal.load()  # 从本地文件加载json数据（快照 + 日志）
         self._books = {
             isbn: Book(**book) for isbn, book in raw_books.items()
         }  # 将本地的json数据转换成Book对象
-
-    def _save_books(self):
-        raw_books = {
-            isbn: book.__dict__ for isbn, book in self._books.items()
-        }  # 将Book对象转换成json数据
-        _save_json(BOOKS_FILE, raw_books)  # 将json数据保存到本地文件
+        self._search_index = BookSearchIndex(self._books.values())  # 全文搜索用的倒排索引，启动时建一次
 
     # 下面三个方法：BookRepository的实现：鸭子类型 + Protocol
     def get_by_isbn(self, isbn: str) -> Book | None:
@@ -56,31 +171,32 @@ class JsonBookRepo:
         self._books[book.isbn] = (
             book  # 借书还书都要保存，放到_books里，key是isbn，不会重复
         )
-        self._save_books()  # 每次保存都要将最新的数据保存到本地文件
+        self._search_index.add(book)  # 书名作者没变时什么都不做
+        self._journal.append(book.isbn, book.__dict__)  # 只追加这一本，不再重写整个文件
 
     def list_all(self) -> list[Book]:
         return list(self._books.values())  # 获取所有图书
 
+    def search(self, query: str, limit: int, offset: int = 0) -> list[Book]:
+        return self._search_index.search(query, limit, offset)
+
 
 class JsonUserRepo:
-    def __init__(self):
+    def __init__(self, path: Path = USERS_FILE):
+        self._journal = JsonJournal(path)
         self._load_users()
 
     def _load_users(self):
-        raw_users = _load_json(USERS_FILE, {})
+        raw_users = self._journal.load()
         self._users = {user_id: User(**user) for user_id, user in raw_users.items()}
 
-    def _save_users(self):
-        raw_users = {user_id: user.__dict__ for user_id, user in self._users.items()}
-        _save_json(USERS_FILE, raw_users)
-
     # 下面两个方法：UserRepository的实现：鸭子类型 + Protocol
     def get_by_id(self, user_id: str) -> User | None:
         return self._users.get(user_id)
 
     def save(self, user: User) -> None:
         self._users[user.user_id] = user  # key是user_id，不会重复
-        self._save_users()  # 每次保存都要将最新的数据保存到本地文件
+        self._journal.append(user.user_id, user.__dict__)  # 只追加这一个用户
 
 
 # ✅ 这个实现 **完全满足 `BookRepository` 和 `UserRepository` 协议**，但数据存在 JSON 文件中！
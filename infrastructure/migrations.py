@@ -0,0 +1,145 @@
+# 数据库结构迁移（schema migration）
+# `Base.metadata.create_all()` 只会创建不存在的表，已有的表（索引、字段）完全不动。
+# 所以模型里新加的索引/字段，需要在这里写一个带版本号的迁移，启动时补到已有的 SQLite / PostgreSQL 数据库上。
+#
+# 规则：
+# - 每个迁移有一个递增的 version，执行过的版本记录在 schema_migrations 表里，不会重复执行
+# - 迁移写成“可重复执行”的（IF NOT EXISTS / 先检查再加），中途失败重跑也安全
+# - 已经发布的迁移不要再改，要改结构就追加一个新版本
+#
+# 手动执行：python -m infrastructure.migrations
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from core.logger import get_logger
+from infrastructure import book_search_index
+from infrastructure.models import BOOKS_SEARCH_DDL
+
+logger = get_logger(__name__)
+
+# 记录已执行版本的表；用单独的 MetaData，不和业务表混在一起
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+# PostgreSQL 下多个 worker 同时启动时，用咨询锁保证只有一个在跑迁移
+_PG_ADVISORY_LOCK_ID = 20250101
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# ───────────────────────────────
+# 迁移辅助函数（都可以重复执行）
+# ───────────────────────────────
+def create_index(conn: Connection, name: str, table: str, columns: list[str]) -> None:
+    """创建索引，已存在则跳过（SQLite 和 PostgreSQL 都支持 IF NOT EXISTS）"""
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """给已有的表加字段，字段已存在则跳过；ddl 是类型和约束部分，例如 "BOOLEAN NOT NULL DEFAULT false" """
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# ───────────────────────────────
+# 迁移列表（按版本号追加）
+# ───────────────────────────────
+def _v1_borrows_hot_query_indexes(conn: Connection) -> None:
+    create_index(conn, "ix_borrows_borrower_borrowed_at", "borrows", ["borrower_id", "borrowed_at", "id"])
+    create_index(conn, "ix_borrows_book_isbn", "borrows", ["book_isbn"])
+    create_index(conn, "ix_borrows_is_returned_due_date", "borrows", ["is_returned", "due_date"])
+
+
+def _v2_book_search_index(conn: Connection) -> None:
+    """图书全文搜索（见 infrastructure/book_search_index.py）"""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text(BOOKS_SEARCH_DDL))
+        book_search_index.rebuild(conn)  # 已有的书建索引
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_books_search_trgm ON books "
+                "USING gin (lower(title || ' ' || author) gin_trgm_ops)"
+            )
+        )
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "borrows 表热点查询索引", _v1_borrows_hot_query_indexes),
+    Migration(2, "图书全文搜索索引", _v2_book_search_index),
+]
+
+
+def _is_applied(conn: Connection, version: int) -> bool:
+    return conn.execute(
+        select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+    ).first() is not None
+
+
+def run_migrations(engine: Engine, migrations: list[Migration] | None = None) -> list[int]:
+    """
+    执行所有还没执行过的迁移，返回本次执行的版本号列表
+    需要在 Base.metadata.create_all() 之后调用（迁移只负责改已有的表）
+    """
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+    applied_now = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # 事务级咨询锁，事务结束自动释放
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PG_ADVISORY_LOCK_ID})
+        _metadata.create_all(bind=conn, checkfirst=True)
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        # 每个迁移一个事务：PostgreSQL 的 DDL 可以回滚；SQLite 的 DDL 可能已经生效，但迁移是可重复执行的，重跑即可
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PG_ADVISORY_LOCK_ID})
+                    # 拿到锁之后再确认一次，可能别的 worker 刚执行完
+                    if _is_applied(conn, migration.version):
+                        continue
+                migration.upgrade(conn)
+                conn.execute(
+                    schema_migrations.insert().values(
+                        version=migration.version,
+                        description=migration.description,
+                        applied_at=datetime.now(timezone.utc),
+                    )
+                )
+        except IntegrityError:
+            # 另一个进程刚好同时执行完了同一个版本
+            logger.info(f"数据库迁移 v{migration.version} 已由其他进程执行")
+            continue
+        applied_now.append(migration.version)
+        logger.info(f"数据库迁移 v{migration.version} 执行完成：{migration.description}")
+    return applied_now
+
+
+if __name__ == "__main__":
+    from infrastructure.connection import engine
+    from infrastructure.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    versions = run_migrations(engine)
+    print(f"执行了 {len(versions)} 个迁移: {versions}" if versions else "数据库已是最新版本")
@@ -1,6 +1,6 @@
 #  第四步：定义 ORM 模型（`database/models.py`）
 # SQLAlchemy 模型
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Integer, JSON, Text
+from sqlalchemy import DDL, Column, String, Boolean, ForeignKey, DateTime, Integer, JSON, Text, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
@@ -22,6 +22,17 @@ class BookDB(Base):
     )  # 借书人 user_id
 
 
+# 图书全文搜索索引（SQLite FTS5 虚拟表，内容由仓库维护，见 infrastructure/book_search_index.py）
+# 存的是 core/book_search.py 分好的词（空格分隔），所以用 unicode61 按空格/标点切开即可
+# prefix：1~4 个字符的前缀单独建索引，前缀查询（"pyth*"）不用遍历词表
+BOOKS_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_search "
+    "USING fts5(isbn UNINDEXED, title, author, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3 4')"
+)
+# 新建的 SQLite 数据库（包括测试）随 books 表一起创建；已有的数据库由迁移 v2 补上
+event.listen(BookDB.__table__, "after_create", DDL(BOOKS_SEARCH_DDL).execute_if(dialect="sqlite"))
+
+
 class UserDB(Base):
     __tablename__ = "users"
     user_id = Column(String, primary_key=True, index=True)
@@ -62,6 +73,17 @@ class BorrowRecordDB(Base):
 
     # ✅ 图书表 `BookDB` 已有 `is_borrowed` 和 `borrowed_by` 字段。
 
+    # 热点查询的索引（已有数据库不会被 create_all 更新，由 infrastructure/migrations.py 补上）
+    # - /borrows/me：WHERE borrower_id=? ORDER BY borrowed_at DESC, id DESC，三列复合索引既能定位又能直接按顺序取，不用额外排序；
+    #   按用户 COUNT 也只扫这个索引（所以不需要单独的 borrower_id / borrowed_at 索引）
+    # - 按图书查借阅记录、和 books 表 JOIN：book_isbn
+    # - 逾期扫描：WHERE is_returned = false AND due_date < now
+    __table_args__ = (
+        Index("ix_borrows_borrower_borrowed_at", "borrower_id", "borrowed_at", "id"),
+        Index("ix_borrows_book_isbn", "book_isbn"),
+        Index("ix_borrows_is_returned_due_date", "is_returned", "due_date"),
+    )
+
 # 日志表
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -77,3 +99,20 @@ class AuditLog(Base):
     # 🔸 使用 `JSON` 类型（PostgreSQL/MySQL 5.7+ 支持）可以灵活存储结构化日志内容
     # 🔸 如果用 SQLite，可以用 `Text` 存 JSON 字符串，并在应用层 `json.loads/dumps`
 
+
+
+# 事务性发件箱（transactional outbox）：借书 / 还书的副作用（借阅日志、audit_logs、通知邮件）
+# 和 borrows 表的写入在同一个事务里插入，事务回滚就没有事件；提交后由 relay（infrastructure/outbox_relay.py）批量投递，投递完删除
+# 新表由 create_all 创建（已有的数据库也会补上，create_all 只是不改已有的表）
+class OutboxDB(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True)  # 自增，relay 按它的顺序投递
+    topic = Column(String(50), nullable=False)  # 事件类型，如 "borrow_created"
+    dedup_key = Column(String, nullable=False, unique=True)  # 去重键，下游用它识别重复投递
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)  # 被 relay 领取过几次
+    # relay 领取时写入：领取批次和租约到期时间；租约过期还没删掉（relay 崩溃、投递失败）的事件会被重新领取
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,207 @@
+# 发件箱 relay：把 outbox 表里已经提交的事件批量投递出去（借阅日志文件、audit_logs 表、通知汇总 → Celery）
+# 借书 / 还书接口只在自己的事务里写 outbox（见 core/outbox.py），请求路径上没有 Redis、没有文件 I/O；
+# 事务回滚时事件跟着回滚，不会再出现“借书失败却收到了借书邮件”
+#
+# relay 同时就是 audit_logs 的批量写入器：以前每次借书都在后台任务里新开一个会话、INSERT 一行、commit 一次
+# 每一批：
+# 1. 领取（一个短事务）：最多 OUTBOX_RELAY_BATCH_SIZE 条事件写上租约，多个 relay 同时跑也不会领到同一条
+#    积压时满批马上领下一批，没有积压时每 OUTBOX_RELAY_INTERVAL_SECONDS 看一次 —— 即“每 N 条或每 T 秒写一次”
+# 2. 投递：按事件类型分组交给处理函数（写事件日志文件、进通知汇总），处理函数返回要写的 audit_logs 行
+# 3. 提交（一个事务）：整批的 audit_logs 行一条多行 INSERT，和“删除已投递的事件”一起提交，不会重复写
+# 4. 投递失败：事件留在表里，租约（OUTBOX_RELAY_LEASE_SECONDS）过期后重新领取 —— “至少一次”投递
+#    文件和通知可能因此重复，下游按事件的去重键识别（日志行的 event_key、汇总器的去重）
+# 缓冲区就是 outbox 表：事件和借阅记录在同一个事务里提交，写不动时在表里排队（pending），不会在请求路径上丢
+# 只有没有处理函数的事件会被丢弃（dropped）；两个数都在 /internal/metrics/outbox
+#
+# 默认在 API 进程里跑一个后台线程（OUTBOX_RELAY_ENABLED=true）；也可以单独起一个进程：
+#   python -m infrastructure.outbox_relay
+# 这时 API 进程设 OUTBOX_RELAY_ENABLED=false
+import atexit
+import os
+import socket
+import threading
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy import insert
+
+from core.dtos import OutboxEventDto
+from core.logger import get_logger
+from core.outbox import BORROW_CREATED, BORROW_RETURNED
+from settings import settings
+# 先导入汇总器和事件日志：它们的 atexit 先注册、后执行，进程退出时 relay 最后投递的事件还能进汇总邮件、写进日志文件
+from utils.log_borrow_utils import borrow_audit_rows, write_borrow_events
+from utils.notification_digest import BORROW, RETURN, notify_events
+from .models import AuditLog
+from .outbox_repository import SqlAlchemyOutboxRepository
+
+logger = get_logger(__name__)
+
+# 一批最多领取多少条：领取用 IN (...)，audit_logs 一条 INSERT 最多这么多行；太大会超过数据库的参数上限、事务也太长
+MAX_BATCH_SIZE = 5000
+
+# 处理函数：同一类型的一批事件 → 要写进 audit_logs 的行（没有就返回空列表）；抛异常表示这一批投递失败
+OutboxHandler = Callable[[list[OutboxEventDto]], list[dict]]
+
+
+def _handle_borrow_created(events: list[OutboxEventDto]) -> list[dict]:
+    write_borrow_events(events)
+    notify_events(BORROW, events)
+    return borrow_audit_rows(events)
+
+
+def _handle_borrow_returned(events: list[OutboxEventDto]) -> list[dict]:
+    notify_events(RETURN, events)
+    return []
+
+
+def default_handlers() -> dict[str, OutboxHandler]:
+    return {BORROW_CREATED: _handle_borrow_created, BORROW_RETURNED: _handle_borrow_returned}
+
+
+class OutboxRelay:
+    def __init__(
+        self,
+        session_factory,
+        handlers: dict[str, OutboxHandler] | None = None,
+        *,
+        batch_size: int | None = None,
+        interval_seconds: float | None = None,
+        lease_seconds: float | None = None,
+    ):
+        self._session_factory = session_factory
+        self._handlers = handlers if handlers is not None else default_handlers()
+        self.batch_size = min(batch_size or settings.OUTBOX_RELAY_BATCH_SIZE, MAX_BATCH_SIZE)
+        self.interval_seconds = interval_seconds or settings.OUTBOX_RELAY_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or settings.OUTBOX_RELAY_LEASE_SECONDS
+        self._name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        # 监控、测试用的计数（当前进程启动以来）
+        self.delivered = 0  # 投递成功的事件数
+        self.dropped = 0  # 没有处理函数、被丢弃的事件数
+        self.audit_rows = 0  # 写进 audit_logs 的行数
+        self.failed_batches = 0
+
+    def drain_once(self) -> int:
+        """领取并投递一批，返回这一批的事件数（0 表示没有待投递的事件）"""
+        claim_id = f"{self._name}:{uuid.uuid4().hex[:12]}"
+        with self._session_factory() as session:
+            events = SqlAlchemyOutboxRepository(session).claim(claim_id, self.batch_size, self.lease_seconds)
+            session.commit()
+        if not events:
+            return 0
+
+        by_topic: dict[str, list[OutboxEventDto]] = {}
+        for event in events:
+            by_topic.setdefault(event.topic, []).append(event)
+        try:
+            audit_rows: list[dict] = []
+            dropped = 0
+            for topic, topic_events in by_topic.items():
+                handler = self._handlers.get(topic)
+                if handler is None:
+                    logger.error(f"发件箱事件没有处理函数，丢弃：{topic} × {len(topic_events)}")
+                    dropped += len(topic_events)
+                    continue
+                audit_rows.extend(handler(topic_events))
+            with self._session_factory() as session:
+                if audit_rows:
+                    session.execute(insert(AuditLog), audit_rows)  # 整批一条多行 INSERT
+                SqlAlchemyOutboxRepository(session).complete([event.id for event in events])
+                session.commit()
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(
+                f"发件箱投递失败（{e}），{len(events)} 条事件 {self.lease_seconds:g} 秒后重试"
+                f"（最多已尝试 {max(event.attempts for event in events)} 次）"
+            )
+            return len(events)
+        self.delivered += len(events) - dropped
+        self.dropped += dropped
+        self.audit_rows += len(audit_rows)
+        return len(events)
+
+    def drain(self) -> int:
+        """一直投递到没有可领取的事件，返回投递的事件数"""
+        total = 0
+        while (count := self.drain_once()) > 0:
+            total += count
+            if count < self.batch_size:
+                break
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "audit_rows": self.audit_rows,
+            "failed_batches": self.failed_batches,
+        }
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="outbox-relay", daemon=True)
+            self._thread.start()
+
+    def run_forever(self) -> None:
+        # 满批就马上领下一批；不满（已经追上了）就等 interval_seconds 再看
+        while not self._stopped.is_set():
+            try:
+                if self.drain_once() >= self.batch_size:
+                    continue
+            except Exception as e:  # 数据库暂时不可用之类：下一轮再试，线程不能退出
+                logger.error(f"发件箱 relay 出错：{e}")
+            self._stopped.wait(self.interval_seconds)
+
+    def close(self) -> None:
+        """停掉后台线程，再把剩下的投递一遍（进程退出时调用）"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.drain()
+        except Exception as e:
+            logger.error(f"退出前投递发件箱失败：{e}")
+
+
+_relay: OutboxRelay | None = None
+_relay_lock = threading.Lock()
+
+
+def start_relay() -> OutboxRelay:
+    """在当前进程里启动 relay 线程（API 进程启动时调用，重复调用只启动一个）"""
+    global _relay
+    from infrastructure.connection import SessionLocal
+
+    with _relay_lock:
+        if _relay is None:
+            _relay = OutboxRelay(SessionLocal)
+            _relay.start()
+        return _relay
+
+
+def current_relay() -> OutboxRelay | None:
+    """当前进程里运行的 relay（没有启动时为 None）"""
+    return _relay
+
+
+@atexit.register
+def stop_relay() -> None:
+    with _relay_lock:
+        relay = _relay
+    if relay is not None:
+        relay.close()
+
+
+if __name__ == "__main__":
+    from infrastructure.connection import SessionLocal
+
+    relay = OutboxRelay(SessionLocal)
+    logger.info(f"发件箱 relay 已启动：每批 {relay.batch_size} 条，空闲时每 {relay.interval_seconds:g} 秒检查一次")
+    try:
+        relay.run_forever()
+    except KeyboardInterrupt:
+        relay.close()
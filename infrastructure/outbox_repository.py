@@ -0,0 +1,70 @@
+# 事务性发件箱的仓储
+# - 请求路径上只有 add_many：一条多行 INSERT，和业务写入共用同一个会话，随 DBSessionMiddleware 一起提交
+# - claim / complete 给 relay 用：先“领取”（写租约）再投递，投递成功后删除
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.dtos import OutboxEventDto
+from core.interfaces import OutboxRepository
+from .models import OutboxDB
+
+
+class SqlAlchemyOutboxRepository(OutboxRepository):
+    def __init__(self, session: Session):
+        self._session = session
+
+    def add_many(self, events: list[OutboxEventDto]) -> None:
+        if not events:
+            return
+        now = datetime.now(timezone.utc)
+        self._session.execute(
+            insert(OutboxDB),
+            [
+                {"topic": e.topic, "dedup_key": e.key, "payload": e.payload, "created_at": now, "attempts": 0}
+                for e in events
+            ],
+        )
+
+    def claim(self, claim_id: str, limit: int, lease_seconds: float) -> list[OutboxEventDto]:
+        """
+        领取最多 limit 条没人领取（或租约已过期）的事件，按 id 顺序返回
+        UPDATE 里再判断一次“没人领取”：多个 relay 同时领取时，一条事件只会被其中一个领到
+        调用方领取后要马上提交，租约才对其他 relay 可见
+        """
+        now = datetime.now(timezone.utc)
+        free = or_(OutboxDB.claimed_until.is_(None), OutboxDB.claimed_until < now)
+        ids = list(self._session.scalars(select(OutboxDB.id).where(free).order_by(OutboxDB.id).limit(limit)))
+        if not ids:
+            return []
+        self._session.execute(
+            update(OutboxDB)
+            .where(OutboxDB.id.in_(ids), free)
+            .values(
+                claimed_by=claim_id,
+                claimed_until=now + timedelta(seconds=lease_seconds),
+                attempts=OutboxDB.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = self._session.execute(
+            select(OutboxDB.id, OutboxDB.topic, OutboxDB.dedup_key, OutboxDB.payload, OutboxDB.attempts)
+            .where(OutboxDB.id.in_(ids), OutboxDB.claimed_by == claim_id)
+            .order_by(OutboxDB.id)
+        ).all()
+        return [
+            OutboxEventDto(topic=topic, key=key, payload=payload, id=event_id, attempts=attempts)
+            for event_id, topic, key, payload, attempts in rows
+        ]
+
+    def complete(self, event_ids: list[int]) -> None:
+        """投递成功：删除事件"""
+        if event_ids:
+            self._session.execute(
+                delete(OutboxDB).where(OutboxDB.id.in_(event_ids)).execution_options(synchronize_session=False)
+            )
+
+    def count(self) -> int:
+        """还没投递的事件数（监控用）"""
+        return self._session.scalar(select(func.count()).select_from(OutboxDB))
@@ -0,0 +1,83 @@
+# 连接池监控：在 SQLAlchemy 的 QueuePool 上统计取连接的等待时间和超时次数，
+# 再加上连接池本身的实时状态（已借出、溢出连接数等），用来按 worker 数量调整连接池大小
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """累计指标（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0  # 成功取到连接的次数
+        self.timeouts = 0  # 等待超时（连接池耗尽）的次数
+        self.total_wait = 0.0  # 取连接累计等待时间（秒）
+        self.max_wait = 0.0  # 单次最长等待时间（秒）
+
+    def record(self, wait: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class _InstrumentedPoolMixin:
+    """覆盖 _do_get（连接池真正取连接的地方），记录等待时间和超时"""
+
+    @property
+    def metrics(self) -> PoolMetrics:
+        # 连接池 dispose()/recreate() 之后是一个新对象，指标也随之重新开始
+        if "_metrics" not in self.__dict__:
+            self.__dict__["_metrics"] = PoolMetrics()
+        return self.__dict__["_metrics"]
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(pool: Pool) -> dict:
+    """连接池的实时状态 + 累计指标；不是 QueuePool（比如 SQLite 内存库用的 StaticPool）时只返回类型"""
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),  # 配置的常驻连接数
+            checked_in=pool.checkedin(),  # 空闲在池里的连接
+            checked_out=pool.checkedout(),  # 正在被请求使用的连接
+            overflow=pool.overflow(),  # 当前溢出连接数（可能为负：常驻连接还没全部建立）
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, _InstrumentedPoolMixin):
+        stats.update(pool.metrics.snapshot())
+    return stats
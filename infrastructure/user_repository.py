@@ -1,9 +1,14 @@
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from .models import UserDB
+from core.token_cache import token_cache
 from core.models import User
 from core.interfaces import UserRepository
 from core.dtos import UserCreateDto
 
+# IN (...) 里的参数个数上限：老版本 SQLite 一条语句最多 999 个绑定参数，超过就分几次查
+IN_CHUNK_SIZE = 500
+
 
 class SqlAlchemyUserRepository(UserRepository):
     def __init__(self, session: Session):
@@ -23,7 +28,7 @@ class SqlAlchemyUserRepository(UserRepository):
         return self._to_domain(db_user)
 
     def get_by_id(self, user_id: str) -> User | None:
-        db_user = self._session.query(UserDB).filter(UserDB.user_id == user_id).first()
+        db_user = self._session.get(UserDB, user_id)  # 按主键取，会话里已加载过的不再查询
         return self._to_domain(db_user) if db_user else None
 
     def get_all(self) -> list[User]:
@@ -36,6 +41,33 @@ class SqlAlchemyUserRepository(UserRepository):
         )
         return self._to_domain(db_user) if db_user else None
 
+    def get_many_by_ids(self, user_ids: list[str]) -> list[User]:
+        return self._get_many(UserDB.user_id, user_ids)
+
+    def get_many_by_usernames(self, usernames: list[str]) -> list[User]:
+        return self._get_many(UserDB.username, usernames)
+
+    def get_page(self, limit: int, after_username: str | None = None) -> list[User]:
+        query = self._session.query(UserDB)
+        if after_username is not None:
+            query = query.filter(UserDB.username > after_username)
+        db_users = query.order_by(UserDB.username).limit(limit).all()
+        return [self._to_domain(db_user) for db_user in db_users]
+
+    def _get_many(self, column, values: list[str]) -> list[User]:
+        values = list(dict.fromkeys(values))  # 去重，保持顺序
+        users = []
+        for start in range(0, len(values), IN_CHUNK_SIZE):
+            chunk = values[start:start + IN_CHUNK_SIZE]
+            db_users = self._session.query(UserDB).filter(column.in_(chunk)).all()
+            users += [self._to_domain(db_user) for db_user in db_users]
+        return users
+
+    def update_password_hash(self, user_id: str, hashed_password: str) -> None:
+        db_user = self._session.get(UserDB, user_id)
+        if db_user is not None:
+            db_user.hashed_password = hashed_password  # 由 DBSessionMiddleware 在请求结束时提交
+
     def _to_domain(self, db_user: UserDB) -> User:
         return User(
             user_id=db_user.user_id,
@@ -47,3 +79,30 @@ class SqlAlchemyUserRepository(UserRepository):
         )
 
     # 💡 User 暂时不实现 update/delete（按需添加）
+
+
+# 用户行被更新（停用、改名……）时，让这个用户已缓存的 token 失效（见 core/token_cache.py）
+# 挂在 ORM 事件上，不管是哪段代码、通过哪个仓库改的用户，都不会漏掉
+# after_update 在 flush 时触发，这时事务还没提交：别的请求还能读到旧的用户行并重新放回缓存，
+# 所以这里只记下用户名，等会话提交后（after_commit）再失效，和 CachedBookRepository 一样；回滚就丢掉
+_PENDING_KEY = "token_cache_pending_usernames"
+
+
+@event.listens_for(UserDB, "after_update")
+def _invalidate_cached_tokens(mapper, connection, target: UserDB) -> None:
+    session = inspect(target).session
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    pending.add(target.username)
+    pending.update(inspect(target).attrs.username.history.deleted or ())
+    if not event.contains(session, "after_commit", _after_commit):
+        event.listen(session, "after_commit", _after_commit)
+        event.listen(session, "after_rollback", _after_rollback)
+
+
+def _after_commit(session: Session) -> None:
+    for username in session.info.pop(_PENDING_KEY, ()):
+        token_cache.invalidate_user(username)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,20 +1,93 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-# ✅ SessionLocal 是你在 database/connection.py 里用 sessionmaker() 创建的，它不是 session 本身，而是一个能生成 session 的“工厂”。
-from infrastructure.connection import SessionLocal
-class DBSessionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # 调用“会话工厂” SessionLocal()，真正创建一个数据库会话实例，
-        # 此时，它已经连接到你的 library.db 数据库了！
-        db = SessionLocal()
-        request.state.db = db
+# 请求级数据库会话管理（纯 ASGI 中间件）
+# 以前的版本继承 BaseHTTPMiddleware：每个请求（包括 /docs、/tasks/task_status 这种不碰数据库的）都会
+# 打开一个 SessionLocal() 并 commit，而且 BaseHTTPMiddleware 本身每个请求都有额外开销、会包一层流式响应。
+# 现在的做法：
+# - 纯 ASGI：不包装 Request/Response，响应消息原样转发，流式响应不受影响
+# - 懒加载：只有依赖项（get_db）第一次要会话时才创建；不碰数据库的请求完全没有会话
+# - 只读请求（GET/HEAD/OPTIONS）不 commit；出错（4xx/5xx 或异常）回滚
+# - commit 放在“响应头发出去之前”：commit 失败时客户端收到的是 500，而不是一个假的成功
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 这些方法按约定不修改数据，不需要 commit
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class LazyDBSession:
+    """请求级的“会话占位符”：第一次调用 get() 时才真正创建会话"""
+
+    def __init__(self, session_factory):
+        # ✅ session_factory 是 SessionLocal（同步）或 AsyncSessionLocal（异步），它不是 session 本身，而是一个能生成 session 的“工厂”
+        self._session_factory = session_factory
+        self._session = None
+
+    def get(self):
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    @property
+    def session(self):
+        """已经创建的会话；没人用过时为 None"""
+        return self._session
+
+
+class DBSessionMiddleware:
+    def __init__(self, app: ASGIApp, session_factory=None):
+        self.app = app
+        if session_factory is None:
+            from infrastructure.connection import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lazy = LazyDBSession(self.session_factory)
+        # Starlette 的 request.state 就是 scope["state"]，依赖项里用 request.state.db_session 取
+        scope.setdefault("state", {})["db_session"] = lazy
+        read_only = scope["method"] in READ_ONLY_METHODS
+
+        async def send_with_commit(message: Message) -> None:
+            # 在响应头发出之前决定事务的结果；后面的 body 消息原样转发
+            if message["type"] == "http.response.start":
+                session = lazy.session
+                if session is not None and not read_only and message["status"] < 400:
+                    await _commit(session)
+            await send(message)
+
         try:
-            response = await call_next(request)
-            db.commit()
-            return response
+            await self.app(scope, receive, send_with_commit)
         except Exception:
-            db.rollback()
+            if lazy.session is not None:
+                await _rollback(lazy.session)
             raise
         finally:
-            db.close()
+            # close() 会回滚没有 commit 的事务（只读请求、出错的请求）并把连接还给连接池
+            if lazy.session is not None:
+                await _close(lazy.session)
+
+
+# 同步会话的 commit/rollback/close 都是阻塞 I/O，放到线程池里执行，不卡住事件循环
+async def _commit(session) -> None:
+    if isinstance(session, AsyncSession):
+        await session.commit()
+    else:
+        await run_in_threadpool(session.commit)
+
+
+async def _rollback(session) -> None:
+    if isinstance(session, AsyncSession):
+        await session.rollback()
+    else:
+        await run_in_threadpool(session.rollback)
 
 
+async def _close(session) -> None:
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        await run_in_threadpool(session.close)
@@ -1,21 +1,63 @@
+import logging
+import random
 import time
-from fastapi import Request
+from starlette.datastructures import URL
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core.logger import get_logger
+from settings import settings
 
 logger = get_logger("api")  #创建一个专门叫 `"api"` 的日志记录器,这样日志里会显示 `name: "api"`，知道是接口日志，不是业务日志
 
-# 定义一个**异步函数**（因为 FastAPI 是异步的）
-# `request`：用户的请求对象（包含 URL、方法、headers 等）
-# `call_next`：**一个函数**，调用它就会继续执行后面的代码（比如你的 `@app.get("/books")`）
-# `call_next(request)` = “把请求交给下一个环节（你的业务代码）处理”
-async def logging_middleware(request: Request, call_next):
-    start_time = time.time() # 记录请求开始时间
-    # - ⏳ **等待业务代码执行完**
-    # - 比如用户访问 `/borrow`，这里会等 `borrow_book()` 函数跑完
-    # - `response` 是业务代码返回的结果（比如 JSON 数据、404 错误等）
-    response = await call_next(request)
-    process_time = time.time() - start_time # 计算请求处理时间
 
+# 请求日志（纯 ASGI 中间件，和 DBSessionMiddleware 一样）
+# 以前是 `app.middleware("http")` 注册的函数，底层是 BaseHTTPMiddleware：它在最外层，每个请求（包括 /books/export 这种流式响应）
+# 都要多包一层 Request/Response、把响应体转到另一个任务里再转发回来
+# 现在只包一层 send：看到 `http.response.start`（响应头）就记下状态码和耗时，响应消息原样转发，流式响应不受影响
+# 耗时算到响应头发出为止（流式响应后面的 body 不算在内）
+# 每个请求都会经过这里，所以尽量少做事：
+# - 级别不到 INFO（logger.isEnabledFor）或者没被采样中（LOG_HTTP_SAMPLE_RATE）时，连 extra 字典和 URL 字符串都不构造
+# - 5xx 和慢请求（LOG_SLOW_REQUEST_MS）不参与采样，总是记录
+class LoggingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()  # 记录请求开始时间
+        responded = False
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal responded
+            if message["type"] != "http.response.start":
+                await send(message)
+                return
+            responded = True
+            process_time = time.perf_counter() - start_time  # 计算请求处理时间
+            await send(message)
+            _log_request(scope, message["status"], process_time)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            # 响应头还没发出去就抛异常：外层的 ServerErrorMiddleware 会返回 500，这里按 500 记一条
+            if not responded:
+                _log_request(scope, 500, time.perf_counter() - start_time)
+            raise
+
+
+def _log_request(scope: Scope, status_code: int, process_time: float) -> None:
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if (
+        status_code < 500
+        and process_time * 1000 < settings.LOG_SLOW_REQUEST_MS
+        and settings.LOG_HTTP_SAMPLE_RATE < 1
+        and random.random() >= settings.LOG_HTTP_SAMPLE_RATE
+    ):
+        return
 
     # 记录一条结构化日志！
     # `extra` 里的每个字段都会变成 JSON 的一个 key
@@ -23,13 +65,9 @@ async def logging_middleware(request: Request, call_next):
         "请求处理完成", # 日志标题
         extra={
             "event": "HTTP_REQUEST",
-            "method": request.method,
-            "url": str(request.url),
-            "status_code": response.status_code,
+            "method": scope["method"],
+            "url": str(URL(scope=scope)),
+            "status_code": status_code,
             "process_time": round(process_time, 3)
-
         }
     )
-    # 把业务代码的返回结果**原样返回给用户**
-    # 中间件不能“吃掉”响应！
-    return response
\ No newline at end of file
@@ -8,15 +8,98 @@ class Settings(BaseSettings):
 
     # 数据库
     DATABASE_URL: str
+    # 是否使用异步数据库引擎（AsyncEngine/AsyncSession + async 路由）
+    DB_ASYNC: bool = False
+    # 异步引擎的连接地址，不填则根据 DATABASE_URL 自动换成异步驱动（sqlite+aiosqlite / postgresql+asyncpg）
+    ASYNC_DATABASE_URL: str | None = None
+    # 连接池（SQLite 内存库除外）；注意每个 gunicorn/uvicorn worker 进程各有一个连接池，
+    # 数据库端最多会有 workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) 个连接
+    DB_POOL_SIZE: int = 5  # 常驻连接数
+    DB_MAX_OVERFLOW: int = 10  # 高峰时允许临时多开的连接数
+    DB_POOL_TIMEOUT: float = 30  # 连接池耗尽时最多等待多少秒，超时抛错
+    DB_POOL_RECYCLE: int = 1800  # 连接最多复用多少秒，防止被数据库/防火墙静默断开（-1 不回收）
+    DB_POOL_PRE_PING: bool = True  # 取连接前先 ping 一下，自动丢掉已断开的连接
+    DB_ECHO: bool = False  # 打印所有 SQL（调试用）
+    # 内部监控接口（/internal/metrics/*）的共享密钥，请求头 X-Metrics-Token 要等于它；不配置时这些接口关闭（404）
+    METRICS_TOKEN: str | None = None
+    # SQLite 性能模式（只对 SQLite 生效，默认关闭）：每个新连接执行下面这些 PRAGMA
+    SQLITE_PERFORMANCE_MODE: bool = False
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL：读写互不阻塞，写只追加日志
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 下用 NORMAL 就不会损坏数据库，只是断电可能丢最后几个事务
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取的大小（字节）
+    SQLITE_CACHE_SIZE: int = -64 * 1024  # 页缓存；负数表示 KiB，即 64 MiB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 遇到锁时最多等待多少毫秒，而不是立刻报 "database is locked"
+    SQLITE_TEMP_STORE: str = "MEMORY"  # 临时表/排序放内存
+    # 图书目录缓存（infrastructure/book_cache.py）
+    BOOK_CACHE_ENABLED: bool = True
+    BOOK_CACHE_MAX_SIZE: int = 1024  # 一级（进程内）缓存最多多少条
+    BOOK_CACHE_TTL_SECONDS: float = 30  # 一级缓存过期时间；多 worker 时其他 worker 最多看到这么久的旧数据
+    BOOK_CACHE_REDIS_URL: str | None = None  # 二级缓存，可以和 Celery 共用一个 Redis，如 redis://localhost:6379/1；异步模式（DB_ASYNC）下不启用
+    BOOK_CACHE_REDIS_TTL_SECONDS: int = 300
+    # 批量导入图书（POST /books/bulk、python -m core.book_import）
+    BOOK_IMPORT_CHUNK_SIZE: int = 1000  # 每批写入并提交的行数
+    BOOK_IMPORT_MAX_ERRORS: int = 1000  # 报告里最多列出多少条错误（failed 仍是总数）
+    # 图书全文搜索（GET /books/search）：按相关度排序只能偏移分页，越往后越慢，最多翻到第几条
+    BOOK_SEARCH_MAX_RESULTS: int = 1000
+    # SQLite 上命中太多的宽泛查询，只在这么多本命中里按相关度排序（越大排序越准，越慢；不要小于 BOOK_SEARCH_MAX_RESULTS）
+    BOOK_SEARCH_RANK_WINDOW: int = 1000
+    # JSON 序列化后端（core/serialization.py）：auto（装了 orjson 就用）/ orjson / json
+    JSON_BACKEND: str = "auto"
+    # JSON 文件存储（infrastructure/json_repos.py，api/main_json.py 用）：每次保存追加一行日志，攒够多少行后台压缩成快照
+    JSON_JOURNAL_COMPACT_EVERY: int = 1000
+    JSON_JOURNAL_FSYNC: bool = False  # 每次追加都 fsync：断电也不丢最后几次写入，但每次写要等磁盘
+    # argon2 参数，不填用 passlib 默认值（time_cost=3, memory_cost=65536 KiB, parallelism=4）
+    # 用 `python -m core.argon2_calibration --target-ms 250` 在部署机器上测出合适的值；
+    # 改了之后，老用户下次登录时会自动用新参数重新哈希（不需要让所有人重置密码）
+    ARGON2_TIME_COST: int | None = None
+    ARGON2_MEMORY_COST_KIB: int | None = None
+    ARGON2_PARALLELISM: int | None = None
+    # 密码哈希线程池（core/password_hashing.py）
+    PASSWORD_HASH_WORKERS: int | None = None  # 同时计算的哈希数；不填则按内存预算和 CPU 核数自动算
+    PASSWORD_HASH_MEMORY_BUDGET_MB: int = 256  # 给 argon2 的内存预算（每次哈希约 64 MiB）
+    PASSWORD_HASH_MAX_QUEUE: int = 16  # 排队上限，超过直接返回 503（同步路由里排队的请求也占着 FastAPI 线程池的线程，不宜太大）
+    # 已验证 token 的缓存（core/token_cache.py）
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_MAX_TTL_SECONDS: float = 300  # 缓存的用户信息最多旧这么久（其他 worker 停用用户后的生效延迟）
 
     #JWT
     SECRET_KEY: str
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"  # HS256 / HS384 / HS512 用 SECRET_KEY；EdDSA / ES256 用下面的 PEM 文件
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_BACKEND: str = "auto"  # auto（PyJWT 优先）/ pyjwt / jose
+    JWT_PRIVATE_KEY_PATH: str | None = None  # 签发方配置；只校验 token 的服务可以不配
+    JWT_PUBLIC_KEY_PATH: str | None = None  # 不配时从私钥推出
 
     # 邮件
     EMAIL_163_FROM: str # 默认用环境变量中的发件人邮箱，一般是公司邮箱
     EMAIL_163_PASSWORD: str # 默认用环境变量中的授权码
+    EMAIL_163_SMTP_HOST: str = "smtp.163.com"
+    EMAIL_163_SMTP_PORT: int = 25
+    EMAIL_163_SMTP_SSL: bool = False  # 465 端口要设成 true
+    # SMTP 连接池（utils/smtp_pool.py）：连接数、单连接发信数都按邮箱服务商的限制调
+    SMTP_POOL_MAX_CONNECTIONS: int = 4  # 同一个服务器 + 账号最多同时几条连接（每个进程）
+    SMTP_POOL_MAX_MESSAGES_PER_CONNECTION: int = 50  # 一条连接发这么多封后断开重连
+    SMTP_POOL_NOOP_AFTER_SECONDS: float = 10  # 连接空闲超过这么久，再用之前先发 NOOP 确认还活着
+    SMTP_POOL_MAX_IDLE_SECONDS: float = 60  # 空闲超过这么久直接关掉（服务器多半已经断开了）
+    SMTP_TIMEOUT_SECONDS: float = 30  # 连接、收发和排队等连接的超时
+    # 借还通知汇总（utils/notification_digest.py）：同一个读者一个窗口内的借还合并成一封邮件
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: float = 60  # 第一条事件之后等多久再发（也是通知的最大延迟）
+    NOTIFICATION_DIGEST_MAX_EVENTS: int = 50  # 攒够这么多本书就提前发
+    # 事务性发件箱 relay（infrastructure/outbox_relay.py）：投递借还的副作用（借阅日志、audit_logs、通知）
+    OUTBOX_RELAY_ENABLED: bool = True  # API 进程里跑 relay 线程；单独起 `python -m infrastructure.outbox_relay` 时设成 false
+    OUTBOX_RELAY_BATCH_SIZE: int = 500  # 每批领取的事件数，也是 audit_logs 一条 INSERT 的最大行数（上限 5000）
+    OUTBOX_RELAY_INTERVAL_SECONDS: float = 1.0  # 没有积压时多久检查一次（也是副作用的大致延迟）
+    OUTBOX_RELAY_LEASE_SECONDS: float = 60  # 领取后多久没投递完就允许重新领取（投递失败的重试间隔）
+    # 借阅事件日志（utils/event_log.py）：relay 写入，进程里只打开一次，按大小轮转
+    EVENT_LOG_PATH: str = "data/borrow_events.log"  # 借阅事件日志（JSON Lines）
+    EVENT_LOG_MAX_BYTES: int = 50 * 1024 * 1024  # 超过这个大小就轮转成 .1、.2 ……
+    EVENT_LOG_BACKUP_COUNT: int = 5  # 最多保留几个轮转出来的旧文件
+    # 日志（core/logger.py、middleware/logging_middleware.py）
+    LOG_ASYNC: bool = True  # 日志先进内存队列，由后台线程格式化、输出；false 时在调用方线程里直接写 stdout
+    LOG_LEVEL: str = "INFO"  # 第三方库（uvicorn、SQLAlchemy、Celery……）的日志级别
+    LOG_HTTP_SAMPLE_RATE: float = 1.0  # 请求日志（HTTP_REQUEST）的采样比例；5xx 和慢请求总是记录
+    LOG_SLOW_REQUEST_MS: float = 1000  # 超过这么多毫秒的请求算慢请求
 
     # 其他
     API_V1_STR: str = "/api/v1"
@@ -21,9 +21,11 @@ logger = get_logger(__name__)
     retry_jitter=True,   # 添加随机抖动，避免雪崩
     bind=True      # 必须加 bind=True 才能访问 self
 )
-def send_email_task(self, to_email: str, subject: str, body: str):
+def send_email_task(self, to_email: str, subject: str, body: str, alias_task_ids: list[str] | None = None):
     """
     模拟发送邮件的异步任务
+    alias_task_ids：合并进这封汇总邮件的其他借还请求的任务 ID（见 utils/notification_digest.py），
+    结果也记到它们名下，客户端用接口返回的任何一个 ID 都能查到这封邮件的状态
     """
     task_id = send_email_task.request.id
     # 重试次数
@@ -42,8 +44,17 @@ def send_email_task(self, to_email: str, subject: str, body: str):
     #     raise Exception("网络超时")
 
     # 这里可以调用真实的邮件服务，比如 SMTP 或第三方 API
-    send_email_163(to_email=to_email, subject=subject, body=body)
-    
+    try:
+        send_email_163(to_email=to_email, subject=subject, body=body)
+    except Exception as e:
+        if retry_count >= max_retries:  # 最后一次也失败了：别名也记成失败
+            for alias in alias_task_ids or ():
+                self.backend.mark_as_failure(alias, e)
+        raise
+
     print(f"借书邮件已经发送到 {to_email}")
     logger.info(f"借书邮件已经发送到 {to_email}")
-    return f"借书邮件已经发送到 {to_email}"
+    result = f"借书邮件已经发送到 {to_email}"
+    for alias in alias_task_ids or ():
+        self.backend.mark_as_done(alias, result)
+    return result
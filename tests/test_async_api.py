@@ -0,0 +1,134 @@
+# DB_ASYNC=True 时挂载的异步路由：aiosqlite + httpx ASGITransport，走真实的依赖项、服务、仓储和 DBSessionMiddleware
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from api.async_routes import borrows
+from api.exception_handlers import register_exception_handlers
+from core.outbox import BORROW_CREATED, BORROW_RETURNED
+from core.security import create_access_token
+from infrastructure.models import Base, BookDB, BorrowRecordDB, OutboxDB, UserDB
+from middleware.dbsession_middleware import DBSessionMiddleware
+from utils.notification_digest import digest_task_id
+
+EMAIL = "async@example.com"
+ISBNS = [f"async-{i}" for i in range(6)]
+
+
+def _run(scenario) -> None:
+    """建好异步引擎和应用，在同一个事件循环里跑 scenario(client, session_factory)"""
+
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            session.add(UserDB(user_id="au1", name="异步", email=EMAIL, username="async_user", hashed_password="x"))
+            session.add_all(BookDB(isbn=isbn, title=f"书 {isbn}", author="某作者") for isbn in ISBNS)
+            await session.commit()
+
+        app = FastAPI()
+        register_exception_handlers(app)
+        app.add_middleware(DBSessionMiddleware, session_factory=factory)
+        app.include_router(borrows.router, prefix="/borrows")
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'async_user'})}"}
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+                await scenario(client, factory)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _outbox(factory) -> list[OutboxDB]:
+    async with factory() as session:
+        return list(await session.scalars(select(OutboxDB).order_by(OutboxDB.id)))
+
+
+def test_borrow_and_return_write_outbox_events():
+    async def scenario(client, factory):
+        response = await client.post(f"/borrows/books/{ISBNS[0]}/borrow")
+        assert response.status_code == 200
+        borrow = response.json()
+        assert borrow["borrower_id"] == "au1"
+        assert borrow["task_id"] == digest_task_id(EMAIL, f"{BORROW_CREATED}:{borrow['borrow_id']}")
+        assert (await client.post(f"/borrows/books/{ISBNS[0]}/borrow")).status_code == 400  # 已借出：回滚
+
+        response = await client.patch(f"/borrows/{borrow['borrow_id']}/return")
+        assert response.status_code == 200
+        assert (await client.patch(f"/borrows/{borrow['borrow_id']}/return")).status_code == 400
+
+        rows = await _outbox(factory)
+        assert [(row.topic, row.payload["borrow_id"]) for row in rows] == [
+            (BORROW_CREATED, borrow["borrow_id"]), (BORROW_RETURNED, borrow["borrow_id"]),
+        ]
+        assert rows[0].payload["task_id"] == borrow["task_id"] and rows[0].payload["email"] == EMAIL
+        async with factory() as session:
+            record = await session.get(BorrowRecordDB, borrow["borrow_id"])
+            assert record.returned_at is not None
+
+    _run(scenario)
+
+
+def test_bulk_borrow_and_return():
+    async def scenario(client, factory):
+        response = await client.post("/borrows/bulk/borrow", json={"isbns": [ISBNS[1], ISBNS[2], "missing"]})
+        assert response.status_code == 200
+        result = response.json()
+        assert (result["succeeded"], result["failed"]) == (2, 1)
+        borrow_ids = [item["borrow_id"] for item in result["items"] if item["ok"]]
+        assert result["task_id"] == digest_task_id(EMAIL, f"{BORROW_CREATED}:{borrow_ids[0]}")
+
+        response = await client.post("/borrows/bulk/return", json={"borrow_ids": [*borrow_ids, 999]})
+        assert response.status_code == 200
+        assert (response.json()["succeeded"], response.json()["failed"]) == (2, 1)
+        assert response.json()["task_id"] is None
+
+        rows = await _outbox(factory)
+        assert [(row.topic, row.payload["borrow_id"]) for row in rows] == [
+            (BORROW_CREATED, borrow_ids[0]), (BORROW_CREATED, borrow_ids[1]),
+            (BORROW_RETURNED, borrow_ids[0]), (BORROW_RETURNED, borrow_ids[1]),
+        ]
+        # 一次请求的事件共用一个任务 ID
+        assert {row.payload["task_id"] for row in rows[:2]} == {result["task_id"]}
+
+    _run(scenario)
+
+
+def test_my_borrows_cursor_pages_match_offset_pages():
+    async def scenario(client, factory):
+        response = await client.post("/borrows/bulk/borrow", json={"isbns": ISBNS})
+        assert response.json()["succeeded"] == len(ISBNS)
+
+        offset = (await client.get("/borrows/me", params={"size": 100})).json()
+        assert offset["total"] == len(ISBNS)
+        cursor_ids, cursor = [], None
+        while True:
+            params = {"size": 4} if cursor is None else {"size": 4, "cursor": cursor}
+            page = (await client.get("/borrows/me", params=params)).json()
+            cursor_ids.extend(item["id"] for item in page["items"])
+            if cursor is not None:
+                assert page["total"] is None and page["page"] is None  # 游标分页默认不查总数
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert cursor_ids == [item["id"] for item in offset["items"]]
+        assert (await client.get("/borrows/me", params={"cursor": "not-a-cursor"})).status_code == 400
+
+    _run(scenario)
+
+
+def test_requests_without_a_valid_token_are_rejected():
+    async def scenario(client, factory):
+        response = await client.post(f"/borrows/books/{ISBNS[0]}/borrow", headers={"Authorization": "Bearer nope"})
+        assert response.status_code == 401
+        assert await _outbox(factory) == []
+
+    _run(scenario)
@@ -0,0 +1,162 @@
+import pytest
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.interfaces import BookRepository
+from core.models import Book
+from infrastructure.book_cache import BookCache, CachedBookRepository
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, BookDB
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_ttl_expiry():
+    clock = FakeClock()
+    cache = BookCache(max_size=2, ttl_seconds=10, clock=clock)
+    for isbn in ("a", "b"):
+        cache.set_book(Book(isbn=isbn, title=isbn, author="x"))
+    cache.get_book("a")  # a 最近用过，b 变成最久没用的
+    cache.set_book(Book(isbn="c", title="c", author="x"))
+
+    assert cache.get_book("b") is None
+    assert cache.get_book("a").title == "a"
+
+    clock.now = 11
+    assert cache.get_book("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_cached_book_is_a_copy():
+    cache = BookCache()
+    cache.set_book(Book(isbn="a", title="a", author="x"))
+    cache.get_book("a").is_borrowed = True  # 业务代码修改拿到的对象
+    assert cache.get_book("a").is_borrowed is False
+
+
+def test_reads_are_served_from_cache_and_writes_invalidate():
+    inner = MagicMock(spec=BookRepository)
+    inner.get_by_isbn.return_value = Book(isbn="a", title="old", author="x")
+    inner.get_all.return_value = [Book(isbn="a", title="old", author="x")]
+    repo = CachedBookRepository(inner, BookCache())
+
+    repo.get_by_isbn("a")
+    repo.get_by_isbn("a")
+    repo.get_all()
+    repo.get_all()
+    assert inner.get_by_isbn.call_count == 1
+    assert inner.get_all.call_count == 1
+
+    repo.save(Book(isbn="a", title="new", author="x"))
+    inner.get_by_isbn.return_value = Book(isbn="a", title="new", author="x")
+    assert repo.get_by_isbn("a").title == "new"
+    repo.get_all()
+    assert inner.get_all.call_count == 2
+
+
+def test_invalidates_again_after_commit():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(BookDB(isbn="a", title="old", author="x"))
+    session.commit()
+
+    cache = BookCache()
+    repo = CachedBookRepository(SqlAlchemyBookRepository(session), cache, session=session)
+    repo.save(Book(isbn="a", title="new", author="x"))
+    # 提交之前，别的请求读到旧数据又放回了缓存
+    cache.set_book(Book(isbn="a", title="old", author="x"))
+    session.commit()
+
+    assert cache.get_book("a") is None
+
+
+class DictRedis:
+    """只实现 BookCache 用到的 get/set/delete"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_redis_tier_is_shared_between_processes():
+    redis = DictRedis()
+    worker_a, worker_b = BookCache(redis_client=redis), BookCache(redis_client=redis)
+    worker_a.set_book(Book(isbn="a", title="t", author="x"))
+
+    assert worker_b.get_book("a") == Book(isbn="a", title="t", author="x")
+    worker_a.invalidate_book("a")
+    worker_b.clear()
+    assert worker_b.get_book("a") is None
+    assert worker_b.stats()["redis"] == {"hits": 1, "misses": 1, "errors": 0}
+
+
+def test_return_book_does_not_write_back_a_stale_cached_copy():
+    from core.services import BorrowService
+    from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
+
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(BookDB(isbn="a", title="old", author="x"))
+        session.commit()
+
+    cache = BookCache()  # 进程内共享，每个请求一个会话
+
+    def borrow_service(session):
+        repo = CachedBookRepository(SqlAlchemyBookRepository(session), cache, session=session)
+        return repo, BorrowService(book_repo=repo, borrow_repo=SqlAlchemyBorrowRepository(session))
+
+    with Session() as session:
+        repo, service = borrow_service(session)
+        borrow = service.borrow_book("a", "alice")
+        session.commit()
+        repo.get_by_isbn("a")  # 缓存里放进一份书名还是 old 的副本
+
+    # 另一个请求绕过缓存改了书名
+    with Session() as session:
+        SqlAlchemyBookRepository(session).save(
+            Book(isbn="a", title="new", author="x", is_borrowed=True, borrowed_by="alice")
+        )
+        session.commit()
+
+    with Session() as session:
+        _, service = borrow_service(session)
+        service.return_book(borrow.borrow_id, "alice")
+        session.commit()
+
+    with Session() as session:
+        db_book = session.get(BookDB, "a")
+        assert (db_book.title, db_book.is_borrowed, db_book.borrowed_by) == ("new", False, None)
+
+
+def test_async_mode_never_uses_the_blocking_redis_tier(monkeypatch):
+    from infrastructure import book_cache as book_cache_module
+    from infrastructure.async_repositories import AsyncSqlAlchemyBookRepository
+    from settings import settings
+
+    monkeypatch.setattr(settings, "BOOK_CACHE_REDIS_URL", "redis://localhost:6379/1")
+    monkeypatch.setattr(settings, "DB_ASYNC", True)
+    assert not book_cache_module.create_book_cache().has_redis
+
+    session = MagicMock()
+    with pytest.raises(ValueError):
+        AsyncSqlAlchemyBookRepository(session, cache=BookCache(redis_client=DictRedis()))
+    AsyncSqlAlchemyBookRepository(session, cache=BookCache())
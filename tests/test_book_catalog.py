@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.dependencies import get_library_service
+from api.routes import books
+from core.dtos import BookFilter
+from core.services import LibraryService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, BookDB
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+
+@pytest.fixture
+def service():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        BookDB(
+            isbn=f"isbn-{i:02d}",
+            title=f"Python 第{i}卷" if i % 2 else f"Go 第{i}卷",
+            author="Guido" if i % 2 else "Rob",
+            is_borrowed=i % 5 == 0,
+        )
+        for i in range(25)
+    )
+    session.commit()
+    yield LibraryService(
+        user_repo=SqlAlchemyUserRepository(session),
+        book_repo=SqlAlchemyBookRepository(session),
+    )
+    session.close()
+
+
+def test_cursor_pages_cover_the_catalog_once(service):
+    seen, cursor = [], None
+    while True:
+        page = service.list_books(BookFilter(), size=10, cursor=cursor)
+        seen += [book.isbn for book in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [f"isbn-{i:02d}" for i in range(25)]
+
+
+def test_filters_are_applied_in_sql(service):
+    page = service.list_books(BookFilter(author="guido", title="python", available=True), size=100)
+    isbns = [book.isbn for book in page.items]
+    assert isbns == [f"isbn-{i:02d}" for i in range(25) if i % 2 and i % 5]
+
+
+def test_export_streams_ndjson(service):
+    app = FastAPI()
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_library_service] = lambda: service
+
+    response = TestClient(app).get("/books/export", params={"available": "false"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["isbn"] for row in rows] == ["isbn-00", "isbn-05", "isbn-10", "isbn-15", "isbn-20"]
+    assert all(row["is_borrowed"] for row in rows)
@@ -0,0 +1,130 @@
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.dependencies import get_db, get_library_service
+from api.exception_handlers import register_exception_handlers
+from api.routes import books
+from core.book_import import read_book_rows
+from core.services import LibraryService
+from infrastructure.book_cache import BookCache, CachedBookRepository
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, BookDB
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+
+@pytest.fixture
+def session():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(BookDB(isbn="old", title="旧书名", author="旧作者", is_borrowed=True, borrowed_by="u1"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _service(session, cache=None) -> LibraryService:
+    book_repo = SqlAlchemyBookRepository(session)
+    if cache is not None:
+        book_repo = CachedBookRepository(book_repo, cache, session=session)
+    return LibraryService(user_repo=SqlAlchemyUserRepository(session), book_repo=book_repo)
+
+
+def _jsonl(*records) -> io.BytesIO:
+    lines = [r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in records]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def test_import_reports_each_row_and_commits_per_chunk(session):
+    commits = []
+    stream = _jsonl(
+        {"isbn": "b1", "title": "书一", "author": "甲"},
+        "{broken",
+        {"isbn": "b2", "title": "书二"},
+        {"isbn": "old", "title": "新书名", "author": "新作者"},
+        {"isbn": "b1", "title": "书一（重复）", "author": "甲"},
+        {"isbn": "b3", "title": "书三", "author": "乙"},
+    )
+    report = _service(session).import_books(
+        read_book_rows(stream, "jsonl"), chunk_size=2, commit=lambda: commits.append(session.commit())
+    )
+
+    assert (report.total, report.inserted, report.skipped, report.failed) == (6, 2, 2, 2)
+    assert [(e.line, e.isbn) for e in report.errors] == [(2, None), (3, "b2")]
+    assert len(commits) == 2  # 4 行有效数据，每批 2 行
+    assert session.get(BookDB, "b1").title == "书一"
+    assert session.get(BookDB, "old").title == "旧书名"
+
+
+def test_update_mode_keeps_borrow_state_and_clears_the_cache(session):
+    cache = BookCache()
+    service = _service(session, cache)
+    assert service.get_book_by_isbn("old").title == "旧书名"  # 放进缓存
+
+    report = service.import_books(
+        read_book_rows(_jsonl({"isbn": "old", "title": "新书名", "author": "新作者"}), "jsonl"),
+        update_existing=True,
+        commit=session.commit,
+    )
+
+    assert (report.inserted, report.updated) == (0, 1)
+    book = service.get_book_by_isbn("old")
+    assert (book.title, book.is_borrowed, book.borrowed_by) == ("新书名", True, "u1")
+
+
+def test_bulk_endpoint_accepts_csv(session):
+    app = FastAPI()
+    register_exception_handlers(app)
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_library_service] = lambda: _service(session)
+    app.dependency_overrides[get_db] = lambda: session
+    client = TestClient(app)
+
+    csv_body = "﻿isbn,title,author\nc1,Python,Guido\nc2,,Rob\n".encode("utf-8")
+    response = client.post("/books/bulk", files={"file": ("books.csv", csv_body, "text/csv")})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (1, 1)
+    assert body["errors"] == [{"line": 3, "isbn": "c2", "error": "缺少字段 title"}]
+
+    response = client.post("/books/bulk", files={"file": ("books.csv", b"isbn,name\nx,y\n", "text/csv")})
+    assert response.status_code == 400
+    assert response.json()["code"] == "INVALID_IMPORT_FILE"
+
+
+def test_stream_errors_midway_return_the_partial_report(session):
+    # 坏字节放在 TextIOWrapper 第一次读取的块之后：表头读得出来，读到后面才出错
+    good_rows = "".join(f"c{i},书{i},作者\n" for i in range(1000)).encode("utf-8")
+    stream = io.BytesIO(b"isbn,title,author\n" + good_rows + b"bad,\xff\xfe,x\nc-last,t,a\n")
+    commits = []
+    report = _service(session).import_books(
+        read_book_rows(stream, "csv"), chunk_size=300, commit=lambda: commits.append(session.commit())
+    )
+
+    assert report.inserted == report.total
+    assert 0 < report.total <= 1000
+    assert len(commits) == -(-report.total // 300)  # 出错前攒好的最后半批也写入了
+    assert report.fatal_error.line > report.total
+    assert "UTF-8" in report.fatal_error.error
+    assert session.get(BookDB, "c-last") is None
+
+    app = FastAPI()
+    register_exception_handlers(app)
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_library_service] = lambda: _service(session)
+    app.dependency_overrides[get_db] = lambda: session
+    body = b"isbn,title,author\n" + good_rows + b'"unterminated\n' + b"x" * 200_000 + b"\n"
+    response = TestClient(app).post("/books/bulk", files={"file": ("books.csv", body, "text/csv")})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["fatal_error"]["line"] > 1000  # 没闭合的引号把后面的内容都读成一个超长字段
+    assert (report["inserted"] + report["skipped"], report["failed"]) == (1000, 0)
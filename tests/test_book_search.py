@@ -0,0 +1,131 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.dependencies import get_library_service
+from api.exception_handlers import register_exception_handlers
+from api.routes import books
+from core.book_search import BookSearchIndex
+from core.models import Book
+from core.services import LibraryService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.migrations import run_migrations
+from infrastructure.models import Base
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+BOOKS = [
+    Book("b1", "三体：地球往事", "刘慈欣"),
+    Book("b2", "三体Ⅱ：黑暗森林", "刘慈欣"),
+    Book("b3", "球状闪电", "刘慈欣"),
+    Book("b4", "Python编程：从入门到实践", "Eric Matthes"),
+    Book("b5", "流畅的Python", "Luciano Ramalho"),
+    Book("b6", "地球简史", "三体协会"),
+]
+
+# (查询, 期望的 isbn 顺序)：SQLite FTS5 和纯 Python 索引必须给出一样的结果
+CASES = [
+    ("三体", ["b1", "b2", "b6"]),  # 书名命中排在作者命中前面
+    ("地球", ["b6", "b1"]),  # 同分时书名短的在前
+    ("球", ["b6", "b3", "b1"]),  # 单字：开头、结尾、中间都能命中；b6、b3 书名一样长，按 rank_key
+    ("体地", []),  # 标点隔开的两段不算相邻
+    ("pyth 入门", ["b4"]),  # 英文前缀 + 中文，都要命中
+    ("ＰＹＴＨＯＮ", ["b5", "b4"]),  # 全角、大小写
+    ("刘慈欣 闪电", ["b3"]),
+    ("？！", []),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def service(engine):
+    session = sessionmaker(bind=engine)()
+    repo = SqlAlchemyBookRepository(session)
+    for book in BOOKS:
+        repo.save(book)
+    session.commit()
+    yield LibraryService(user_repo=SqlAlchemyUserRepository(session), book_repo=repo)
+    session.close()
+
+
+@pytest.mark.parametrize("query, expected", CASES)
+def test_sqlite_and_python_index_agree(service, query, expected):
+    assert [book.isbn for book in service.book_repo.search(query, 10)] == expected
+    assert [book.isbn for book in BookSearchIndex(BOOKS).search(query, 10)] == expected
+
+
+def test_index_follows_writes(engine, service):
+    repo = service.book_repo
+    repo.save(Book("b3", "球状闪电（典藏版）", "刘慈欣"))
+    repo.delete("b1")
+    repo.bulk_upsert([Book("b7", "三体III：死神永生", "刘慈欣"), Book("b2", "黑暗森林", "刘慈欣")], update_existing=True)
+    assert [book.isbn for book in repo.search("三体", 10)] == ["b7", "b6"]
+    assert [book.isbn for book in repo.search("典藏", 10)] == ["b3"]
+
+    # 绕过仓库写进去的旧数据：迁移 v2 会补建索引
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM books_search"))
+    assert repo.search("三体", 10) == []
+    assert run_migrations(engine) == [1, 2]
+    assert [book.isbn for book in repo.search("三体", 10)] == ["b7", "b6"]
+
+
+def test_search_route_paginates_with_offset_cursor(service):
+    app = FastAPI()
+    register_exception_handlers(app)
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_library_service] = lambda: service
+    client = TestClient(app)
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "刘慈欣", "size": 2} if cursor is None else {"q": "刘慈欣", "size": 2, "cursor": cursor}
+        page = client.get("/books/search", params=params).json()
+        seen += [book["isbn"] for book in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["b3", "b1", "b2"]
+    assert client.get("/books/search", params={"q": ""}).status_code == 422
+    assert client.get("/books/search", params={"q": "x", "cursor": "bad"}).status_code == 400
+
+
+def test_broad_queries_only_rank_within_the_window(service, monkeypatch):
+    monkeypatch.setattr("infrastructure.book_repository.settings.BOOK_SEARCH_RANK_WINDOW", 2)
+    assert len(service.book_repo.search("刘慈欣", 10)) == 2
+
+
+def test_skip_mode_only_indexes_rows_that_were_actually_inserted(engine):
+    session = sessionmaker(bind=engine)()
+    repo = SqlAlchemyBookRepository(session)
+    raced = False
+
+    # 模拟并发导入：bulk_upsert 查完“已存在的 isbn”之后、INSERT 之前，另一个导入抢先写入了 c1
+    @event.listens_for(session, "do_orm_execute")
+    def concurrent_import(orm_execute_state):
+        nonlocal raced
+        if raced or not orm_execute_state.is_select:
+            return None
+        raced = True
+        result = orm_execute_state.invoke_statement()
+        SqlAlchemyBookRepository(session).bulk_upsert([Book("c1", "并发写入的书名", "作者")])
+        return result
+
+    existing = repo.bulk_upsert([Book("c1", "导入文件里的书名", "作者"), Book("c2", "另一本书", "作者")])
+    session.commit()
+
+    assert existing == {"c1"}  # c1 被 ON CONFLICT DO NOTHING 跳过，算作已存在
+    assert repo.search("导入", 10) == []
+    assert [book.title for book in repo.search("并发", 10)] == ["并发写入的书名"]
+    assert session.execute(text("SELECT count(*) FROM books_search WHERE isbn = 'c1'")).scalar() == 1
+    session.close()
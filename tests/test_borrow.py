@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import MagicMock
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.dml import Update
 
 # 被测对象
 from core.services import BorrowService
@@ -8,7 +11,8 @@ from core.services import BorrowService
 # 依赖项
 from infrastructure.book_repository import SqlAlchemyBookRepository
 from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
-from infrastructure.models import BookDB
+from infrastructure.models import Base, BookDB
+from core.exceptions import BookNotAvailableError, BookNotFoundError
 
 @pytest.fixture
 def mock_session():
@@ -29,17 +33,17 @@ def test_borrow_book_success(borrow_service, mock_session):
     user_id = "user123"
     isbn = "978-0134685991"
 
-    # 这是数据库中已存在的书（由 repo 查询返回）
+    # 这是条件 UPDATE ... RETURNING 返回的书（已经被标记为借出）
     db_book = BookDB(
         isbn=isbn,
         title="Effective Python",
         author="Brett Slatkin",
-        is_borrowed=False,      # 初始未借出
-        borrowed_by=None
+        is_borrowed=True,
+        borrowed_by=user_id
     )
 
-    # 模拟 book_repo.get_by_isbn 返回这本书
-    mock_session.query.return_value.filter.return_value.first.return_value = db_book
+    # 模拟 book_repo.mark_borrowed 的 UPDATE 更新成功
+    mock_session.execute.return_value.scalar_one_or_none.return_value = db_book
 
     # 模拟 borrow_repo.create 返回借阅记录
     from core.models import BorrowRecord
@@ -58,9 +62,10 @@ def test_borrow_book_success(borrow_service, mock_session):
     result = borrow_service.borrow_book(isbn, user_id)
 
     # Assert
-    # ✅ 1. 数据库中的书被更新（注意：是 db_book，不是你传入的 mock_book）
-    assert db_book.is_borrowed is True
-    assert db_book.borrowed_by == user_id
+    # ✅ 1. 图书状态由一条条件 UPDATE 完成，没有先 SELECT 再改
+    stmt = mock_session.execute.call_args[0][0]
+    assert isinstance(stmt, Update)
+    mock_session.query.assert_not_called()
 
     # ✅ 2. 借阅记录被创建
     borrow_service.borrow_repo.create.assert_called_once()
@@ -78,6 +83,89 @@ def test_borrow_book_success(borrow_service, mock_session):
 
     # ❌ 不要断言 add/merge/commit！
     # 因为：
-    # - 书已存在 → 走更新分支，不 add
-    # - save() 不 commit（由上层控制事务）
+    # - mark_borrowed() 不 commit（由上层控制事务）
 
+
+@pytest.fixture
+def sqlite_session():
+    """真实的内存 SQLite（条件 UPDATE 的行为要靠数据库本身来验证）"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(BookDB(isbn="isbn-1", title="Effective Python", author="Brett Slatkin"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_book_can_only_be_borrowed_once(sqlite_session):
+    service = BorrowService(
+        book_repo=SqlAlchemyBookRepository(sqlite_session),
+        borrow_repo=SqlAlchemyBorrowRepository(sqlite_session),
+    )
+    service.borrow_book("isbn-1", "alice")
+
+    with pytest.raises(BookNotAvailableError):
+        service.borrow_book("isbn-1", "bob")
+    with pytest.raises(BookNotFoundError):
+        service.borrow_book("missing", "bob")
+
+    db_book = sqlite_session.get(BookDB, "isbn-1")
+    assert (db_book.is_borrowed, db_book.borrowed_by) == (True, "alice")
+
+
+def test_return_book_loads_each_row_only_once(sqlite_session):
+    service = BorrowService(
+        book_repo=SqlAlchemyBookRepository(sqlite_session),
+        borrow_repo=SqlAlchemyBorrowRepository(sqlite_session),
+    )
+    borrow = service.borrow_book("isbn-1", "alice")
+    sqlite_session.commit()
+
+    statements = []
+    engine = sqlite_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        service.return_book(borrow.borrow_id, "alice")
+        sqlite_session.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    # 只有 get_by_id 查一次借阅记录；图书用一条 UPDATE 释放，不用先查出来
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 1
+
+
+def test_bulk_borrow_and_return_use_a_fixed_number_of_statements(sqlite_session):
+    sqlite_session.add_all(BookDB(isbn=f"isbn-{i}", title=f"书{i}", author="作者") for i in range(2, 6))
+    sqlite_session.commit()
+    service = BorrowService(
+        book_repo=SqlAlchemyBookRepository(sqlite_session),
+        borrow_repo=SqlAlchemyBorrowRepository(sqlite_session),
+    )
+    service.borrow_book("isbn-5", "bob")
+
+    statements = []
+    engine = sqlite_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = service.borrow_books(["isbn-1", "isbn-2", "isbn-5", "missing", "isbn-3", "isbn-4"], "alice")
+        borrow_count = len(statements)
+        borrow_ids = [item.borrow_id for item in result.items if item.ok]
+        statements.clear()
+        returned = service.return_books(borrow_ids[:3] + [borrow_ids[0], 12345], "alice")
+        sqlite_session.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert (result.succeeded, result.failed) == (4, 2)
+    assert [item.error_code for item in result.items if not item.ok] == ["BOOK_NOT_AVAILABLE", "BOOK_NOT_FOUND"]
+    assert borrow_count == 3  # UPDATE ... RETURNING、批量 INSERT、区分失败原因的 SELECT
+
+    assert (returned.succeeded, returned.failed) == (3, 1)
+    assert returned.items[-1].error_code == "BORROW_RECORD_NOT_FOUND"
+    assert len(statements) == 3  # SELECT 借阅记录、UPDATE 借阅记录、UPDATE 图书
+    books = {b.isbn: b.is_borrowed for b in sqlite_session.query(BookDB)}
+    assert books == {"isbn-1": False, "isbn-2": False, "isbn-3": False, "isbn-4": True, "isbn-5": True}
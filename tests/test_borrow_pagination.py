@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.services import BorrowService
+from core.exceptions import InvalidCursorError
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
+from infrastructure.models import Base, BookDB, BorrowRecordDB
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    # 25 条借阅记录，其中有几条借阅时间相同，用来验证 (borrowed_at, id) 的稳定排序
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        session.add(BookDB(isbn=f"isbn-{i}", title=f"书{i}", author="作者"))
+    for i in range(25):
+        session.add(
+            BorrowRecordDB(
+                book_isbn=f"isbn-{i % 5}",
+                borrower_id="u1",
+                borrowed_at=base + timedelta(hours=i // 3),
+                due_date=base + timedelta(days=7),
+            )
+        )
+    session.add(
+        BorrowRecordDB(
+            book_isbn="isbn-0",
+            borrower_id="u2",
+            borrowed_at=base,
+            due_date=base + timedelta(days=7),
+        )
+    )
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def borrow_service(session):
+    return BorrowService(
+        book_repo=SqlAlchemyBookRepository(session),
+        borrow_repo=SqlAlchemyBorrowRepository(session),
+    )
+
+
+def _capture_statements(engine):
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return statements
+
+
+def test_cursor_pages_match_offset_pages(borrow_service):
+    offset_ids = [
+        item.id
+        for page in range(1, 4)
+        for item in borrow_service.get_my_borrows("u1", page=page, size=10).items
+    ]
+
+    cursor_ids = []
+    cursor = None
+    while True:
+        # 第一次不传 cursor（偏移分页第一页），之后一直用 next_cursor 翻页
+        result = borrow_service.get_my_borrows("u1", size=10, cursor=cursor)
+        cursor_ids.extend(item.id for item in result.items)
+        cursor = result.next_cursor
+        if cursor is None:
+            break
+
+    assert cursor_ids == offset_ids
+    assert len(cursor_ids) == 25
+    assert len(set(cursor_ids)) == 25
+
+
+def test_cursor_mode_skips_count_unless_requested(borrow_service, engine):
+    first = borrow_service.get_my_borrows("u1", size=10)
+    assert first.total == 25 and first.pages == 3
+
+    statements = _capture_statements(engine)
+    second = borrow_service.get_my_borrows("u1", size=10, cursor=first.next_cursor)
+    assert second.total is None and second.page is None
+    assert len(statements) == 1
+    assert "count" not in statements[0].lower()
+
+    with_total = borrow_service.get_my_borrows(
+        "u1", size=10, cursor=first.next_cursor, include_total=True
+    )
+    assert with_total.total == 25
+
+
+def test_invalid_cursor(borrow_service):
+    with pytest.raises(InvalidCursorError):
+        borrow_service.get_my_borrows("u1", cursor="not-a-cursor")
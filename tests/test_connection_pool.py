@@ -0,0 +1,66 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import StaticPool
+
+from api.routes import metrics
+from infrastructure.connection import build_engine_kwargs, enable_sqlite_performance_mode
+from infrastructure.pool_metrics import InstrumentedQueuePool, pool_stats
+
+
+def test_engine_kwargs_are_dialect_aware():
+    postgres = build_engine_kwargs("postgresql://u:p@db/library")
+    assert "connect_args" not in postgres  # check_same_thread 只有 SQLite 认识
+    assert postgres["poolclass"] is InstrumentedQueuePool
+    assert postgres["pool_pre_ping"] is True
+
+    memory = build_engine_kwargs("sqlite:///:memory:")
+    assert memory["poolclass"] is StaticPool
+    assert memory["connect_args"] == {"check_same_thread": False}
+
+
+def test_pool_metrics_record_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    stats = pool_stats(engine.pool)
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["max_wait_ms"] >= 50
+    held.close()
+
+
+def test_sqlite_performance_mode_applies_pragmas_to_every_connection(tmp_path):
+    url = f"sqlite:///{tmp_path / 'perf.db'}"
+    engine = create_engine(url, **build_engine_kwargs(url))
+    enable_sqlite_performance_mode(engine)
+    with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_metrics_endpoints_require_the_shared_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(metrics.router, prefix="/internal/metrics")
+    client = TestClient(app)
+
+    monkeypatch.setattr(metrics.settings, "METRICS_TOKEN", None)
+    assert client.get("/internal/metrics/db-pool").status_code == 404  # 没配置密钥：整组接口关闭
+
+    monkeypatch.setattr(metrics.settings, "METRICS_TOKEN", "s3cret")
+    assert client.get("/internal/metrics/db-pool").status_code == 401
+    assert client.get("/internal/metrics/token-cache", headers={"X-Metrics-Token": "wrong"}).status_code == 401
+    response = client.get("/internal/metrics/db-pool", headers={"X-Metrics-Token": "s3cret"})
+    assert response.status_code == 200 and "pool_class" in response.json()["sync"]
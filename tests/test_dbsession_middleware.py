@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from api.dependencies import get_db
+from middleware.dbsession_middleware import DBSessionMiddleware
+
+
+def _make_app():
+    sessions = []
+
+    def session_factory():
+        session = MagicMock()
+        sessions.append(session)
+        return session
+
+    app = FastAPI()
+    app.add_middleware(DBSessionMiddleware, session_factory=session_factory)
+
+    @app.get("/no-db")
+    def no_db():
+        return {"ok": True}
+
+    @app.get("/read")
+    def read(db=Depends(get_db)):
+        return {"ok": True}
+
+    @app.post("/write")
+    def write(db=Depends(get_db)):
+        return {"ok": True}
+
+    @app.post("/write-fails")
+    def write_fails(db=Depends(get_db)):
+        raise HTTPException(status_code=400, detail="bad")
+
+    @app.get("/stream")
+    def stream(db=Depends(get_db)):
+        return StreamingResponse((f"{i}\n" for i in range(3)), media_type="text/plain")
+
+    return app, sessions
+
+
+def test_session_is_only_opened_when_requested():
+    app, sessions = _make_app()
+    client = TestClient(app)
+    assert client.get("/no-db").status_code == 200
+    assert client.get("/docs").status_code == 200
+    assert sessions == []
+
+
+def test_read_only_request_is_not_committed():
+    app, sessions = _make_app()
+    TestClient(app).get("/read")
+    assert len(sessions) == 1
+    sessions[0].commit.assert_not_called()
+    sessions[0].close.assert_called_once()
+
+
+def test_write_request_commits_and_failed_write_does_not():
+    app, sessions = _make_app()
+    client = TestClient(app)
+    client.post("/write")
+    client.post("/write-fails")
+    sessions[0].commit.assert_called_once()
+    sessions[1].commit.assert_not_called()
+    assert all(s.close.call_count == 1 for s in sessions)
+
+
+def test_streaming_response_passes_through():
+    app, sessions = _make_app()
+    response = TestClient(app).get("/stream")
+    assert response.text == "0\n1\n2\n"
+    sessions[0].close.assert_called_once()
@@ -0,0 +1,39 @@
+import json
+
+from utils.event_log import EventLog
+
+
+def _read_lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text("utf-8").splitlines()]
+
+
+def test_lines_are_buffered_until_flush(tmp_path):
+    path = tmp_path / "data" / "borrow_events.log"
+    event_log = EventLog(str(path), max_bytes=1024 * 1024, backup_count=2)
+    event_log.write([{"event": "borrow_created", "borrow_id": i, "user": "张三"} for i in range(3)])
+    assert path.read_bytes() == b""  # 还在缓冲区里
+    event_log.flush()
+    lines = _read_lines(path)
+    assert [line["borrow_id"] for line in lines] == [0, 1, 2]
+    assert lines[0]["user"] == "张三"
+    event_log.close()
+
+
+def test_event_log_rotates_by_size(tmp_path):
+    path = tmp_path / "borrow_events.log"
+    event_log = EventLog(str(path), max_bytes=200, backup_count=2)
+    for i in range(30):
+        event_log.write([{"event": "borrow_created", "borrow_id": i}])
+    event_log.close()
+
+    assert not (tmp_path / "borrow_events.log.3").exists()  # 最多保留 2 个旧文件
+    current, first, second = (_read_lines(tmp_path / name) for name in ("borrow_events.log", "borrow_events.log.1", "borrow_events.log.2"))
+    assert all(p.stat().st_size <= 200 for p in tmp_path.iterdir())
+    assert [line["borrow_id"] for line in second + first + current] == list(range(30 - len(second + first + current), 30))
+
+    # 重新打开（进程重启）：接着已有的大小算，不会马上超过上限
+    event_log = EventLog(str(path), max_bytes=200, backup_count=2)
+    event_log.write([{"borrow_id": 30}])
+    event_log.close()
+    assert _read_lines(path)[-1] == {"borrow_id": 30}
+    assert path.stat().st_size <= 200
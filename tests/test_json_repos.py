@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from core.models import Book, User
+from infrastructure.json_repos import JsonBookRepo, JsonJournal, JsonUserRepo
+
+
+def test_save_appends_one_line_and_restart_replays_it(tmp_path):
+    path = tmp_path / "books.json"
+    path.write_text(json.dumps({"b1": Book("b1", "三体", "刘慈欣").__dict__}), encoding="utf-8")
+    repo = JsonBookRepo(path)
+
+    book = repo.get_by_isbn("b1")
+    book.borrow("u1")
+    repo.save(book)
+    repo.save(Book("b2", "活着", "余华"))
+
+    assert json.loads(path.read_text(encoding="utf-8"))["b1"]["is_borrowed"] is False  # 快照没动
+    assert len((tmp_path / "books.json.journal").read_bytes().splitlines()) == 2
+    reloaded = JsonBookRepo(path)
+    assert reloaded.get_by_isbn("b1").borrowed_by == "u1"
+    assert [b.isbn for b in reloaded.search("活着", 10)] == ["b2"]
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / "users.json"
+    repo = JsonUserRepo(path)
+    repo.save(User("u1", "zhangsan", "张三", "zs@example.com", "hash"))
+    journal = tmp_path / "users.json.journal"
+    with open(journal, "ab") as f:
+        f.write(b'{"k": "u2", "v": {"user_id": "u2", "na')  # 写到一半进程崩溃
+
+    reloaded = JsonUserRepo(path)
+    assert reloaded.get_by_id("u1").name == "张三"
+    assert reloaded.get_by_id("u2") is None
+    reloaded.save(User("u3", "lisi", "李四", "ls@example.com", "hash"))  # 坏的半行已截掉，新行不会接在它后面
+    assert JsonUserRepo(path).get_by_id("u3").name == "李四"
+
+
+def test_background_compaction_rewrites_the_snapshot(tmp_path):
+    path = tmp_path / "books.json"
+    journal = JsonJournal(path, compact_every=3)
+    journal.load()
+    for i in range(7):
+        journal.append(f"b{i % 2}", {"isbn": f"b{i % 2}", "n": i})
+        journal.join()
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"b0": {"isbn": "b0", "n": 4}, "b1": {"isbn": "b1", "n": 5}}
+    assert len((tmp_path / "books.json.journal").read_bytes().splitlines()) == 1
+    assert not (tmp_path / "books.json.journal.compacting").exists()
+    assert JsonJournal(path, compact_every=3).load()["b0"] == {"isbn": "b0", "n": 6}
+
+
+def test_interrupted_compaction_is_finished_on_startup(tmp_path):
+    path = tmp_path / "books.json"
+    journal = JsonJournal(path, compact_every=100)
+    journal.load()
+    journal.append("b1", {"n": 1})
+    journal.append("b1", {"n": 2})
+    # 模拟压缩做到一半：日志已改名成 .compacting，新快照还没写
+    journal._journal.close()
+    (tmp_path / "books.json.journal").rename(tmp_path / "books.json.journal.compacting")
+    (tmp_path / "books.json.journal").write_bytes(b'{"k": "b2", "v": {"n": 3}}\n')
+
+    assert JsonJournal(path, compact_every=100).load() == {"b1": {"n": 2}, "b2": {"n": 3}}
+    assert json.loads(path.read_text(encoding="utf-8")) == {"b1": {"n": 2}, "b2": {"n": 3}}
+    assert not (tmp_path / "books.json.journal.compacting").exists()
+
+
+def test_malformed_entries_go_through_the_corrupt_line_handling(tmp_path):
+    path = tmp_path / "books.json"
+    journal = tmp_path / "books.json.journal"
+    journal.write_bytes(b'{"k": "b1", "v": {"n": 1}}\n[1, 2]\n{"k": "b1", "v": {"n": 2}}\n')
+    with pytest.raises(ValueError):  # 中间的行坏了：报错，不悄悄跳过
+        JsonJournal(path).load()
+
+    journal.write_bytes(b'{"k": "b1", "v": {"n": 1}}\n{"v": {"n": 2}}\n')
+    assert JsonJournal(path).load() == {"b1": {"n": 1}}  # 最后一行：当成写到一半，截掉
+    assert journal.read_bytes() == b'{"k": "b1", "v": {"n": 1}}\n'
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from core.jwt_codec import InvalidTokenError, JoseCodec, PyJWTCodec, create_codec
+
+
+def _pem_pair(private_key) -> tuple[str, str]:
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+def _claims(minutes: int = 5) -> dict:
+    return {"sub": "alice", "exp": datetime.now(timezone.utc) + timedelta(minutes=minutes)}
+
+
+@pytest.mark.parametrize(
+    "codec_class, algorithm",
+    [(PyJWTCodec, "HS256"), (PyJWTCodec, "ES256"), (PyJWTCodec, "EdDSA"), (JoseCodec, "HS256"), (JoseCodec, "ES256")],
+)
+def test_round_trip_and_verify_only_codec(codec_class, algorithm):
+    if algorithm == "HS256":
+        signer = codec_class(algorithm, signing_key="secret")
+        verifier = codec_class(algorithm, verification_key="secret")
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+        private_pem, public_pem = _pem_pair(private_key)
+        signer = codec_class(algorithm, signing_key=private_pem)
+        verifier = codec_class(algorithm, verification_key=public_pem)
+
+    token = signer.encode(_claims())
+    assert verifier.decode(token)["sub"] == "alice"
+    assert signer.decode(token)["sub"] == "alice"
+    with pytest.raises(InvalidTokenError):
+        verifier.decode(token[:-4] + "AAAA")
+    with pytest.raises(InvalidTokenError):
+        verifier.decode(signer.encode(_claims(minutes=-1)))
+    if algorithm != "HS256":
+        with pytest.raises(RuntimeError):
+            verifier.encode(_claims())  # 只有公钥，不能签发
+
+
+def test_backends_are_interchangeable_and_auto_prefers_pyjwt():
+    codec = create_codec("auto", "HS256", signing_key="secret")
+    assert codec.name == "pyjwt"
+    token = JoseCodec("HS256", signing_key="secret").encode(_claims())
+    assert codec.decode(token)["sub"] == "alice"
+    with pytest.raises(InvalidTokenError):
+        create_codec("auto", "HS256", signing_key="other").decode(token)
+    with pytest.raises(ValueError):
+        JoseCodec("EdDSA", signing_key="unused")
+
+
+@pytest.mark.parametrize("codec_class", [PyJWTCodec, JoseCodec])
+def test_tokens_without_exp_or_sub_are_rejected(codec_class):
+    codec = codec_class("HS256", signing_key="secret")
+    with pytest.raises(InvalidTokenError):
+        codec.decode(codec.encode({"sub": "alice"}))  # 永不过期的 token 不接受
+    with pytest.raises(InvalidTokenError):
+        codec.decode(codec.encode({"exp": _claims()["exp"]}))
@@ -0,0 +1,142 @@
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueListener
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from core.logger import JsonLineFormatter, TextFormatter, _EnqueueHandler
+from middleware import logging_middleware as middleware
+from settings import settings
+
+
+def _record(msg="借书成功：%s", args=("978-1",), created=1_700_000_000.25, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("api", logging.INFO, __file__, 1, msg, args, None)
+    record.created = created
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_line_formatter_writes_one_compact_line():
+    line = JsonLineFormatter().format(_record(event="HTTP_REQUEST", status_code=200, user=object()))
+    assert "\n" not in line and ", " not in line
+    log_dict = json.loads(line)
+    assert log_dict["timestamp"] == "2023-11-14T22:13:20.250000Z"
+    assert log_dict["level"] == "INFO" and log_dict["name"] == "api"
+    assert log_dict["message"] == "借书成功：978-1"  # 中文不转义
+    assert log_dict["event"] == "HTTP_REQUEST" and log_dict["status_code"] == 200
+    assert log_dict["user"].startswith("<object object")  # 不认识的对象转成字符串
+    assert log_dict["env"] == settings.APP_ENV
+    assert "args" not in log_dict and "msg" not in log_dict
+
+
+def test_timestamps_are_cached_per_second():
+    formatter = JsonLineFormatter()
+    first = json.loads(formatter.format(_record(created=1_700_000_000.5)))["timestamp"]
+    formatter._cached_text = "cached"  # 同一秒：不再重新格式化
+    second = json.loads(formatter.format(_record(created=1_700_000_000.75)))["timestamp"]
+    third = json.loads(formatter.format(_record(created=1_700_000_001.0)))["timestamp"]
+    assert first == "2023-11-14T22:13:20.500000Z"
+    assert second == "cached.750000Z"
+    assert third == "2023-11-14T22:13:21.000000Z"
+    text = TextFormatter(fmt="%(asctime)s — %(message)s").format(_record(created=1_700_000_000.5))
+    assert text == time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(1_700_000_000)) + " — 借书成功：978-1"
+
+
+def test_records_are_formatted_on_the_listener_thread():
+    formatted_on = []
+
+    class RecordingFormatter(JsonLineFormatter):
+        def format(self, record):
+            formatted_on.append(threading.get_ident())
+            return super().format(record)
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    lines = []
+    output.emit = lambda record: lines.append(output.format(record))
+    output.setFormatter(RecordingFormatter())
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    logger = logging.getLogger("test_logger.queue")
+    logger.addHandler(_EnqueueHandler(log_queue))
+    logger.propagate = False
+    try:
+        book = {"isbn": "978-1"}
+        logger.warning("借书：%s", book, extra={"event": "BORROW"})
+        book["isbn"] = "changed"  # 放进队列之后再改参数：日志内容不变
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+    [line] = lines
+    assert json.loads(line)["message"] == "借书：{'isbn': '978-1'}"
+    assert formatted_on != [threading.get_ident()]  # 格式化在后台线程里做
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    calls = []
+    monkeypatch.setattr(middleware.logger, "info", lambda msg, extra: calls.append(extra))
+    app = FastAPI()
+    app.add_middleware(middleware.LoggingMiddleware)
+
+    @app.get("/ok")
+    def ok():
+        return {"ok": True}
+
+    @app.get("/boom")
+    def boom():
+        from fastapi.responses import JSONResponse
+        return JSONResponse({"ok": False}, status_code=503)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a\n", b"b\n", b"c\n"]), media_type="application/x-ndjson")
+
+    @app.get("/crash")
+    def crash():
+        raise RuntimeError("boom")
+
+    return TestClient(app, raise_server_exceptions=False), calls
+
+
+def test_http_requests_are_sampled_but_errors_are_always_logged(logged, monkeypatch):
+    client, calls = logged
+    monkeypatch.setattr(settings, "LOG_HTTP_SAMPLE_RATE", 0.0)
+    for _ in range(5):
+        client.get("/ok")
+    client.get("/boom")
+    assert [extra["status_code"] for extra in calls] == [503]
+
+    monkeypatch.setattr(settings, "LOG_SLOW_REQUEST_MS", 0)  # 慢请求也不参与采样
+    client.get("/ok")
+    assert calls[-1]["url"] == "http://testserver/ok"
+
+    monkeypatch.setattr(settings, "LOG_SLOW_REQUEST_MS", 1000)
+    monkeypatch.setattr(settings, "LOG_HTTP_SAMPLE_RATE", 1.0)
+    client.get("/ok")
+    assert len(calls) == 3 and calls[-1]["event"] == "HTTP_REQUEST"
+
+
+def test_disabled_level_skips_building_extra(logged, monkeypatch):
+    client, calls = logged
+    monkeypatch.setattr(middleware.logger, "isEnabledFor", lambda level: level >= logging.WARNING)
+    client.get("/ok")
+    client.get("/boom")
+    assert calls == []
+
+
+def test_streaming_responses_pass_through_and_unhandled_errors_are_logged(logged):
+    client, calls = logged
+    with client.stream("GET", "/stream") as response:
+        assert list(response.iter_lines()) == ["a", "b", "c"]
+    assert calls[-1]["status_code"] == 200 and calls[-1]["url"] == "http://testserver/stream"
+
+    assert client.get("/crash").status_code == 500
+    assert calls[-1]["status_code"] == 500  # 响应头还没发出去就抛异常：按 500 记
@@ -0,0 +1,169 @@
+import time
+
+import pytest
+
+from utils.notification_digest import BORROW, RETURN, NotificationAggregator, digest_task_id, render_digest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def published():
+    return []
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def aggregator(published, clock):
+    aggregator = NotificationAggregator(published.append, window_seconds=60, max_events=50, clock=clock)
+    aggregator._stopped.set()  # 测试里手动 flush，不启动后台线程
+    return aggregator
+
+
+def test_borrows_in_one_window_become_one_digest(aggregator, published, clock):
+    task_ids = [aggregator.add("zs@example.com", "张三", BORROW, [f"978-{i}"]) for i in range(10)]
+    assert aggregator.flush() == 0  # 窗口还没结束
+    clock.now = 60
+    assert aggregator.flush() == 1
+    [[digest]] = published
+    assert [digest.task_id, *digest.alias_task_ids] == task_ids  # 十次借书的任务 ID 都能查到这一封
+    assert digest.to_email == "zs@example.com"
+    assert digest.subject == "图书借阅通知"
+    assert digest.body.startswith("你好 张三，你已成功借阅以下 10 本图书：\n- ISBN: 978-0\n")
+    assert aggregator.pending == 0
+
+
+def test_due_digests_are_published_together(aggregator, published, clock):
+    aggregator.add("zs@example.com", "张三", BORROW, ["978-1", "978-2"])
+    aggregator.add("ls@example.com", "李四", RETURN, ["978-3"])
+    aggregator.add("zs@example.com", "张三", RETURN, ["978-4"])
+    clock.now = 61
+    aggregator.add("ww@example.com", "王五", BORROW, ["978-5"])  # 新窗口，还没到期
+    assert aggregator.flush() == 2
+    [batch] = published
+    digests = {digest.to_email: digest for digest in batch}
+    assert digests["zs@example.com"].subject == "图书借还通知"
+    assert digests["zs@example.com"].body == (
+        "你好 张三，你已成功借阅以下 2 本图书：\n- ISBN: 978-1\n- ISBN: 978-2"
+        "\n\n你已成功归还以下 1 本图书：\n- ISBN: 978-4"
+    )
+    assert digests["ls@example.com"].body == "你好 李四，你已成功归还 ISBN: 978-3 的图书。"
+    assert aggregator.pending == 1
+
+
+def test_full_buffer_is_published_before_the_window_ends(aggregator, published):
+    aggregator.add("zs@example.com", "张三", BORROW, [f"978-{i}" for i in range(50)])
+    assert aggregator.flush() == 1
+    assert len(published) == 1
+
+
+def test_failed_publish_keeps_the_events_and_task_id(clock):
+    batches = []
+
+    def publish(digests):
+        if not batches:
+            batches.append(None)
+            raise ConnectionError("redis down")
+        batches.append(digests)
+
+    aggregator = NotificationAggregator(publish, window_seconds=60, clock=clock)
+    aggregator._stopped.set()
+    task_id = aggregator.add("zs@example.com", "张三", BORROW, ["978-1"])
+    clock.now = 60
+    assert aggregator.flush() == 0
+    # 同一窗口里迟到的事件（relay 落后）：合并回同一封
+    late = aggregator.add("zs@example.com", "张三", RETURN, ["978-1"], at=30)
+    assert aggregator.flush() == 1
+    [digest] = batches[1]
+    assert (digest.task_id, digest.alias_task_ids) == (task_id, [late])
+    assert digest.subject == "图书借还通知"
+
+
+def test_background_thread_flushes_and_close_drains():
+    published = []
+    aggregator = NotificationAggregator(published.append, window_seconds=0.1)
+    aggregator.add("zs@example.com", "张三", BORROW, ["978-1"])
+    deadline = time.monotonic() + 5
+    while not published and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(published) == 1
+    aggregator.add("ls@example.com", "李四", BORROW, ["978-2"])
+    aggregator.close()  # 窗口没到也要全部提交
+    assert [digest.to_email for batch in published for digest in batch] == ["zs@example.com", "ls@example.com"]
+
+
+def test_single_event_keeps_the_old_wording():
+    assert render_digest("张三", [(BORROW, "978-1")]) == ("图书借阅通知", "你好 张三，你已成功借阅 ISBN: 978-1 的图书。")
+
+
+def _digest_for(published, task_id):
+    """用接口返回的任务 ID 查到的那封汇总邮件（任务 ID 或别名）"""
+    [digest] = [d for batch in published for d in batch if task_id in (d.task_id, *d.alias_task_ids)]
+    return digest
+
+
+def test_task_id_after_an_overflow_finds_the_digest_that_contains_the_book(published, clock):
+    aggregator = NotificationAggregator(published.append, window_seconds=60, max_events=3, clock=clock)
+    aggregator._stopped.set()
+    # 借书接口按借阅记录算任务 ID，跟着事件送进来
+    for i in range(4):
+        task_id = digest_task_id("zs@example.com", f"borrow_created:{i}")
+        key = f"borrow_created:{i}"
+        assert aggregator.add("zs@example.com", "张三", BORROW, [f"978-{i}"], at=10, key=key, task_id=task_id) == task_id
+        aggregator.flush()  # 第三本时攒满，提前提交；第四本进同一窗口的下一封
+    clock.now = 60
+    aggregator.flush()
+    assert len(published) == 2
+    for i in range(4):
+        digest = _digest_for(published, digest_task_id("zs@example.com", f"borrow_created:{i}"))
+        assert f"978-{i}" in digest.body
+
+
+def test_task_id_of_a_late_event_finds_the_digest_that_contains_it(aggregator, published, clock):
+    first = aggregator.add("zs@example.com", "张三", BORROW, ["978-1"], at=10, key="borrow_created:1")
+    clock.now = 60
+    aggregator.flush()
+    # 窗口已经提交过了，relay 才送来同一窗口的事件：进下一封，任务 ID 仍然能查到它
+    late = aggregator.add("zs@example.com", "张三", RETURN, ["978-2"], at=20, key="borrow_returned:2")
+    assert late == digest_task_id("zs@example.com", "borrow_returned:2")
+    clock.now = 120
+    aggregator.flush()
+    assert "978-1" in _digest_for(published, first).body
+    assert "978-2" in _digest_for(published, late).body
+    assert _digest_for(published, first) is not _digest_for(published, late)
+
+
+def test_redelivered_events_are_ignored(aggregator, published, clock):
+    aggregator.add("zs@example.com", "张三", BORROW, ["978-1"], key="borrow_created:1")
+    aggregator.add("zs@example.com", "张三", BORROW, ["978-1"], key="borrow_created:1")
+    clock.now = 60
+    aggregator.flush()
+    assert published[0][0].body == "你好 张三，你已成功借阅 ISBN: 978-1 的图书。"
+    assert aggregator.duplicates == 1
+
+
+def test_email_task_records_its_result_under_the_alias_task_ids(monkeypatch):
+    from tasks import tasks
+
+    class FakeBackend:
+        def __init__(self):
+            self.done = {}
+
+        def mark_as_done(self, task_id, result, *args, **kwargs):
+            self.done[task_id] = result
+
+    backend = FakeBackend()
+    monkeypatch.setattr(type(tasks.send_email_task), "backend", backend)
+    monkeypatch.setattr(tasks, "send_email_163", lambda **kwargs: None)
+    result = tasks.send_email_task("zs@example.com", "图书借阅通知", "正文", alias_task_ids=["id-2", "id-3"])
+    assert backend.done == {"id-2": result, "id-3": result}
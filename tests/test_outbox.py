@@ -0,0 +1,137 @@
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.dependencies import get_current_user
+from api.exception_handlers import register_exception_handlers
+from api.routes import borrows
+from core.models import User
+from core.outbox import BORROW_CREATED, BORROW_RETURNED, circulation_events
+from infrastructure import outbox_relay
+from infrastructure.models import AuditLog, Base, BookDB, OutboxDB
+from infrastructure.outbox_relay import OutboxRelay
+from infrastructure.outbox_repository import SqlAlchemyOutboxRepository
+from middleware.dbsession_middleware import DBSessionMiddleware
+from utils.notification_digest import digest_task_id
+
+USER = User("u1", "zhangsan", "张三", "zs@example.com", "hash")
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add_all(BookDB(isbn=f"isbn-{i}", title=f"书 {i}", author="某作者") for i in range(3))
+        session.commit()
+    return factory
+
+
+def _outbox_rows(session_factory) -> list[OutboxDB]:
+    with session_factory() as session:
+        return list(session.scalars(select(OutboxDB).order_by(OutboxDB.id)))
+
+
+def _add_events(session_factory, topic: str, borrows: list[tuple[str, int]]) -> None:
+    with session_factory() as session:
+        SqlAlchemyOutboxRepository(session).add_many(circulation_events(topic, USER, borrows, time.time()))
+        session.commit()
+
+
+def test_events_commit_and_roll_back_with_the_borrow(session_factory):
+    app = FastAPI()
+    register_exception_handlers(app)
+    app.add_middleware(DBSessionMiddleware, session_factory=session_factory)
+    app.include_router(borrows.router, prefix="/borrows")
+    app.dependency_overrides[get_current_user] = lambda: USER
+    client = TestClient(app)
+
+    response = client.post("/borrows/books/isbn-1/borrow")
+    assert response.status_code == 200
+    task_id = response.json()["task_id"]
+    assert task_id == digest_task_id(USER.email, f"{BORROW_CREATED}:{response.json()['borrow_id']}")
+    assert client.post("/borrows/books/isbn-1/borrow").status_code == 400  # 已借出：事务回滚，不产生事件
+
+    [row] = _outbox_rows(session_factory)
+    assert (row.topic, row.dedup_key) == (BORROW_CREATED, f"{BORROW_CREATED}:{response.json()['borrow_id']}")
+    assert row.payload["book_id"] == "isbn-1" and row.payload["email"] == USER.email
+    assert row.payload["task_id"] == task_id  # 跟着事件进汇总器，汇总邮件发出后用它能查到
+
+
+def test_relay_delivers_in_batches_and_writes_audit_rows_in_its_transaction(session_factory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    notified = []
+    monkeypatch.setattr(outbox_relay, "notify_events", lambda action, events: notified.append((action, len(events))))
+    _add_events(session_factory, BORROW_CREATED, [(f"isbn-{i}", i) for i in range(5)])
+    _add_events(session_factory, BORROW_RETURNED, [("isbn-0", 0)])
+
+    relay = OutboxRelay(session_factory, batch_size=4)
+    assert relay.drain() == 6
+    assert relay.delivered == 6 and _outbox_rows(session_factory) == []
+    assert notified == [("借阅", 4), ("借阅", 1), ("归还", 1)]
+    with session_factory() as session:
+        audit = list(session.scalars(select(AuditLog).order_by(AuditLog.id)))
+    assert [row.details["event_key"] for row in audit] == [f"{BORROW_CREATED}:{i}" for i in range(5)]
+    lines = [json.loads(line) for line in (tmp_path / "data" / "borrow_events.log").read_text("utf-8").splitlines()]
+    assert [line["borrow_id"] for line in lines] == list(range(5))
+
+
+def test_relay_writes_one_audit_insert_per_batch_and_counts_dropped_events(session_factory, monkeypatch):
+    monkeypatch.setattr(outbox_relay, "write_borrow_events", lambda events: None)
+    monkeypatch.setattr(outbox_relay, "notify_events", lambda action, events: None)
+    _add_events(session_factory, BORROW_CREATED, [(f"isbn-{i}", i) for i in range(7)])
+    _add_events(session_factory, "unknown_topic", [("isbn-0", 0)])
+    inserts = []
+    engine = session_factory.kw["bind"]
+
+    def count_audit_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO audit_logs"):
+            inserts.append(len(parameters) if executemany else 1)
+
+    event.listen(engine, "before_cursor_execute", count_audit_inserts)
+    relay = OutboxRelay(session_factory, batch_size=4)
+    assert relay.drain() == 8
+    assert inserts == [4, 3]  # 每批一条多行 INSERT，而不是每个事件一个会话
+    assert relay.stats() == {"batch_size": 4, "delivered": 7, "dropped": 1, "audit_rows": 7, "failed_batches": 0}
+    with session_factory() as session:
+        assert SqlAlchemyOutboxRepository(session).count() == 0
+    assert OutboxRelay(session_factory, batch_size=10 ** 6).batch_size == outbox_relay.MAX_BATCH_SIZE
+
+
+def test_failed_batch_is_redelivered_after_the_lease(session_factory):
+    calls = []
+
+    def flaky(events):
+        calls.append([event.key for event in events])
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return []
+
+    _add_events(session_factory, BORROW_RETURNED, [("isbn-1", 1), ("isbn-2", 2)])
+    relay = OutboxRelay(session_factory, {BORROW_RETURNED: flaky}, lease_seconds=0.2)
+    assert relay.drain_once() == 2 and relay.failed_batches == 1
+    assert relay.drain_once() == 0  # 租约还没过期，别的 relay 也领不到
+    time.sleep(0.25)
+    assert relay.drain_once() == 2
+    assert calls[0] == calls[1] == [f"{BORROW_RETURNED}:1", f"{BORROW_RETURNED}:2"]
+    assert relay.delivered == 2 and _outbox_rows(session_factory) == []
+
+
+def test_concurrent_claims_do_not_overlap(session_factory):
+    _add_events(session_factory, BORROW_RETURNED, [(f"isbn-{i}", i) for i in range(10)])
+    with session_factory() as first, session_factory() as second:
+        a = SqlAlchemyOutboxRepository(first).claim("a", 6, 60)
+        first.commit()
+        b = SqlAlchemyOutboxRepository(second).claim("b", 6, 60)
+        second.commit()
+    assert len(a) == 6 and len(b) == 4
+    assert not {event.id for event in a} & {event.id for event in b}
+    assert {event.attempts for event in a + b} == {1}
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.hash import argon2
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.exceptions import ServiceOverloadedException
+from core.password_hashing import PasswordHashingPool
+from core.security import pwd_context
+from core.services import LibraryService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, UserDB
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+
+def test_pool_sheds_load_when_queue_is_full():
+    pool = PasswordHashingPool(workers=1, max_queue=1)
+    release = threading.Event()
+    running = pool._submit(release.wait)
+    queued = pool._submit(release.wait)
+
+    with pytest.raises(ServiceOverloadedException) as exc_info:
+        pool.hash("secret")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "1"
+
+    release.set()
+    running.result(), queued.result()
+    assert pool.stats()["rejected"] == 1
+    assert pool.verify("secret", pool.hash("secret"))  # 队列空出来之后恢复正常
+    pool.shutdown()
+
+
+def test_async_api_hashes_off_the_event_loop():
+    pool = PasswordHashingPool(workers=2, max_queue=4)
+
+    async def main():
+        hashed = await pool.hash_async("secret")
+        return await asyncio.gather(pool.verify_async("secret", hashed), pool.verify_async("wrong", hashed))
+
+    assert asyncio.run(main()) == [True, False]
+    pool.shutdown()
+
+
+def test_login_rehashes_passwords_created_with_old_parameters():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    # 用比当前配置弱的参数生成的旧哈希
+    old_hash = argon2.using(rounds=1, memory_cost=1024, parallelism=1).hash("secret")
+    session.add(UserDB(user_id="u1", username="alice", name="Alice", email="a@example.com", hashed_password=old_hash))
+    session.commit()
+    service = LibraryService(
+        user_repo=SqlAlchemyUserRepository(session), book_repo=SqlAlchemyBookRepository(session)
+    )
+
+    assert service.authenticate_user("alice", "wrong") is None
+    assert session.get(UserDB, "u1").hashed_password == old_hash  # 密码错误不动哈希
+
+    user = service.authenticate_user("alice", "secret", release_db=session.close)
+    session.commit()
+    stored = session.get(UserDB, "u1").hashed_password
+    assert user.hashed_password == stored != old_hash
+    assert not pwd_context.needs_update(stored)
+    assert service.authenticate_user("alice", "secret") is not None
@@ -0,0 +1,94 @@
+# 查询计划回归测试：热点查询必须走索引，不能退化成全表扫描
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from infrastructure.borrow_repository import SqlAlchemyBorrowRepository
+from infrastructure.migrations import run_migrations
+from infrastructure.models import Base, BorrowRecordDB
+
+BORROWS_INDEXES = [
+    "ix_borrows_borrower_borrowed_at",
+    "ix_borrows_book_isbn",
+    "ix_borrows_is_returned_due_date",
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _plan(conn, statement, parameters=()) -> str:
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def _hot_query_plans(engine) -> list[str]:
+    """执行仓储里的热点查询，抓取真正发出去的 SQL，再逐条 EXPLAIN QUERY PLAN"""
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    session = sessionmaker(bind=engine)()
+    try:
+        repo = SqlAlchemyBorrowRepository(session)
+        after = (datetime(2025, 1, 1), 10)
+        repo.get_borrows_by_user("u1", page=3, size=10)  # COUNT + 偏移分页
+        repo.get_borrows_by_user_after("u1", 11, after)  # 游标分页
+    finally:
+        session.close()
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    # 逾期扫描
+    overdue = select(BorrowRecordDB.id).where(
+        BorrowRecordDB.is_returned == False,  # noqa: E712
+        BorrowRecordDB.due_date < datetime.now(timezone.utc),
+    )
+    compiled = overdue.compile(dialect=engine.dialect)
+    captured.append((str(compiled), tuple(compiled.params[k] for k in compiled.positiontup)))
+
+    with engine.connect() as conn:
+        return [_plan(conn, statement, parameters) for statement, parameters in captured]
+
+
+def test_hot_queries_use_indexes(engine):
+    run_migrations(engine)
+    plans = _hot_query_plans(engine)
+    assert len(plans) == 4
+    for plan in plans:
+        assert "SCAN borrows" not in plan, plan
+        assert "SEARCH borrows USING" in plan, plan
+        # 按 (borrowed_at, id) 排序直接由索引提供，不需要临时排序
+        assert "TEMP B-TREE" not in plan, plan
+    # 游标分页要在索引上直接定位到上一页末尾，而不是从用户的第一条记录开始过滤
+    assert "borrowed_at<?" in plans[2], plans[2]
+
+
+def test_migrations_add_indexes_to_existing_database(engine):
+    # 模拟升级前的旧库：表已经存在，但没有新索引
+    with engine.begin() as conn:
+        for name in BORROWS_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    assert any("SCAN borrows" in plan for plan in _hot_query_plans(engine))
+
+    assert run_migrations(engine) == [1, 2]
+    assert run_migrations(engine) == []  # 已执行过的版本不会重复执行
+
+    with engine.connect() as conn:
+        names = set(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'borrows'"
+        ).scalars())
+    assert set(BORROWS_INDEXES) <= names
+    for plan in _hot_query_plans(engine):
+        assert "SCAN borrows" not in plan, plan
@@ -0,0 +1,37 @@
+import dataclasses
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from api.responses import FastJSONResponse, user_row
+from api.schemas import BookResponse, UserResponse, to_book_response
+from core.models import Book, User
+from core.serialization import BACKENDS, available_backends
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_backends_agree(backend):
+    serializer = BACKENDS[backend]()
+    value = {
+        "book": Book("978-1", "三体", "刘慈欣", True, "u1"),
+        "at": datetime(2025, 1, 2, 3, 4, 5, 600, tzinfo=timezone.utc),
+        "ids": {1: None},
+    }
+    expected = {
+        "book": {"isbn": "978-1", "title": "三体", "author": "刘慈欣", "is_borrowed": True, "borrowed_by": "u1"},
+        "at": "2025-01-02T03:04:05.000600+00:00",
+        "ids": {"1": None},
+    }
+    assert serializer.loads(serializer.dumps(value)) == expected
+    assert "三体".encode() in serializer.dumps(value)  # 中文不转义
+    assert serializer.loads(serializer.dumps(value, indent=True)) == expected
+
+
+def test_rows_match_the_response_models():
+    # 列表接口直接序列化这些行，不经过 response_model 校验：字段必须一致
+    book = Book("978-1", "三体", "刘慈欣")
+    assert [field.name for field in dataclasses.fields(Book)] == list(BookResponse.model_fields)
+    assert json.loads(FastJSONResponse(book).body) == to_book_response(book).model_dump()
+    user = User("u1", "zhangsan", "张三", "zs@example.com", "hash")
+    assert list(user_row(user)) == list(UserResponse.model_fields)
@@ -0,0 +1,148 @@
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+import pytest
+
+from utils import email_utils
+from utils.smtp_pool import SmtpPool, close_pools
+
+
+class FakeSmtpServer(socketserver.ThreadingTCPServer):
+    """本地的 SMTP 替身（类似 aiosmtpd）：记录连接、登录、NOOP 和收到的邮件"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.lock = threading.Lock()
+        self.messages: list[bytes] = []
+        self.connections = self.logins = self.noops = 0
+        self.active = self.max_active = 0
+        self.data_delay = 0.0
+        self.sockets: set[socket.socket] = set()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def drop_connections(self) -> None:
+        """服务器主动断开所有连接（模拟空闲超时被踢）"""
+        with self.lock:
+            sockets = list(self.sockets)
+        for sock in sockets:
+            sock.shutdown(socket.SHUT_RDWR)
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.sockets.add(self.request)
+        try:
+            self.reply("220 fake ESMTP")
+            while line := self.rfile.readline():
+                verb = line.split(b" ")[0].strip().upper()
+                if verb == b"EHLO":
+                    self.reply("250-fake")
+                    self.reply("250 AUTH PLAIN")
+                elif verb == b"AUTH":
+                    with server.lock:
+                        server.logins += 1
+                    self.reply("235 ok")
+                elif verb == b"NOOP":
+                    with server.lock:
+                        server.noops += 1
+                    self.reply("250 ok")
+                elif verb == b"DATA":
+                    self.reply("354 go ahead")
+                    body = b"".join(iter(self.rfile.readline, b".\r\n"))
+                    time.sleep(server.data_delay)
+                    with server.lock:
+                        server.messages.append(body)
+                    self.reply("250 queued")
+                elif verb == b"QUIT":
+                    self.reply("221 bye")
+                    return
+                else:  # HELO / MAIL / RCPT / RSET
+                    self.reply("250 ok")
+        except OSError:
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+                server.sockets.discard(self.request)
+
+
+@pytest.fixture
+def server():
+    server = FakeSmtpServer()
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _message(i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"], msg["To"], msg["Subject"] = "lib@example.com", f"u{i}@example.com", f"通知 {i}"
+    msg.set_content("你好")
+    return msg
+
+
+def test_connections_are_reused_up_to_max_messages(server):
+    pool = SmtpPool("127.0.0.1", server.port, "lib", "secret", max_messages=3)
+    for i in range(7):
+        pool.send_message(_message(i))
+    pool.close()
+    assert len(server.messages) == 7
+    assert (server.connections, server.logins) == (3, 3)  # 3 + 3 + 1
+
+
+def test_dropped_connection_is_replaced_and_the_message_resent(server):
+    pool = SmtpPool("127.0.0.1", server.port, "lib", "secret", noop_after=60)
+    pool.send_message(_message(1))
+    server.drop_connections()
+    pool.send_message(_message(2))  # 没到 NOOP 的时间，发送时才发现断开
+    assert len(server.messages) == 2
+    assert pool.connects == 2
+
+
+def test_idle_connection_is_checked_with_noop(server):
+    pool = SmtpPool("127.0.0.1", server.port, "lib", "secret", noop_after=0)
+    pool.send_message(_message(1))
+    pool.send_message(_message(2))
+    assert (server.noops, pool.connects) == (1, 1)
+    server.drop_connections()
+    pool.send_message(_message(3))  # NOOP 失败，直接换新连接
+    assert (len(server.messages), pool.connects) == (3, 2)
+
+
+def test_concurrency_is_limited_per_server(server):
+    server.data_delay = 0.05
+    pool = SmtpPool("127.0.0.1", server.port, "lib", "secret", max_connections=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: pool.send_message(_message(i)), range(8)))
+    assert len(server.messages) == 8
+    assert server.max_active == 2
+
+
+def test_send_email_163_goes_through_the_pool(server, monkeypatch):
+    monkeypatch.setattr(email_utils.settings, "EMAIL_163_SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(email_utils.settings, "EMAIL_163_SMTP_PORT", server.port)
+    try:
+        for i in range(3):
+            email_utils.send_email_163(f"u{i}@example.com", "图书还书通知", "你好", "lib@163.com", "secret")
+    finally:
+        close_pools()
+    assert (len(server.messages), server.connections) == (3, 1)
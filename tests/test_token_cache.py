@@ -0,0 +1,92 @@
+import time
+
+import pytest
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import security
+from core.exceptions import UnauthorizedException
+from core.models import User
+from core.token_cache import TokenCache, token_cache
+from infrastructure.models import Base, UserDB
+import infrastructure.user_repository  # noqa: F401  注册 after_update / after_commit 钩子
+
+
+def _user(username: str = "alice") -> User:
+    return User(user_id="u1", username=username, name="Alice", email="a@example.com", hashed_password="x")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entry_expires_with_the_token_or_max_ttl():
+    clock = FakeClock()
+    cache = TokenCache(max_ttl_seconds=60, clock=clock)
+    cache.put("short", _user(), token_expires_at=clock.now + 10)
+    cache.put("long", _user(), token_expires_at=clock.now + 3600)
+
+    clock.now += 11
+    assert cache.get("short") is None
+    assert cache.get("long").username == "alice"
+    clock.now += 50
+    assert cache.get("long") is None
+
+
+def test_size_is_bounded_and_invalidate_user_drops_all_tokens():
+    cache = TokenCache(max_size=2)
+    cache.put("t1", _user("alice"), token_expires_at=float("inf"))
+    cache.put("t2", _user("alice"), token_expires_at=float("inf"))
+    cache.put("t3", _user("bob"), token_expires_at=float("inf"))
+    assert cache.get("t1") is None  # 最久没用的被淘汰
+
+    cache.invalidate_user("alice")
+    assert cache.get("t2") is None
+    assert cache.get("t3").username == "bob"
+    assert cache.stats()["size"] == 1
+
+
+def test_deactivating_a_user_invalidates_cached_tokens():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserDB(user_id="u1", username="alice", name="Alice", email="a@example.com", hashed_password="x"))
+    session.commit()
+
+    token_cache.put("token", _user(), token_expires_at=float("inf"))
+    session.get(UserDB, "u1").is_active = False
+    session.flush()
+    # 提交之前，别的请求读到的还是旧的用户行，缓存不能在这时就失效（失效了也会被重新放回去）
+    assert token_cache.get("token") is not None
+    session.commit()
+
+    assert token_cache.get("token") is None
+
+
+def test_rolled_back_updates_do_not_invalidate_cached_tokens():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserDB(user_id="u1", username="alice", name="Alice", email="a@example.com", hashed_password="x"))
+    session.commit()
+
+    token_cache.put("token", _user(), token_expires_at=float("inf"))
+    session.get(UserDB, "u1").is_active = False
+    session.flush()
+    session.rollback()
+    session.commit()
+
+    assert token_cache.get("token") is not None
+
+
+@pytest.mark.parametrize("claims", [{"sub": "alice"}, {"exp": int(time.time()) + 60}])
+def test_tokens_without_exp_or_sub_are_rejected(claims):
+    # 缓存要靠 exp 决定条目活多久：签名正确但没有 exp（或 sub）的 token 返回 401，而不是 KeyError
+    token = jwt.encode(claims, security.SECRET_KEY, algorithm=security.ALGORITHM)
+    with pytest.raises(UnauthorizedException):
+        security.decode_access_token_payload(token)
@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.dependencies import get_library_service
+from api.routes import users
+from core.services import LibraryService
+from infrastructure.book_repository import SqlAlchemyBookRepository
+from infrastructure.models import Base, UserDB
+from infrastructure.user_repository import SqlAlchemyUserRepository
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def service(engine):
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        UserDB(user_id=f"id-{i:02d}", username=f"user-{i:02d}", name=f"用户{i}", email=f"u{i}@example.com")
+        for i in range(25)
+    )
+    session.commit()
+    yield LibraryService(
+        user_repo=SqlAlchemyUserRepository(session),
+        book_repo=SqlAlchemyBookRepository(session),
+    )
+    session.close()
+
+
+def test_batch_lookup_uses_one_query_per_key_type(engine, service):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    result = service.get_users_batch(["id-07", "missing", "id-03", "id-07"], ["user-03", "user-11", "nobody"])
+
+    assert [user.user_id for user in result.items] == ["id-07", "id-03", "id-11"]
+    assert result.not_found == ["missing", "nobody"]
+    assert len(statements) == 2
+    assert all(" IN " in statement for statement in statements)
+
+
+def test_user_routes_paginate_and_batch(service):
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    app.dependency_overrides[get_library_service] = lambda: service
+    client = TestClient(app)
+
+    seen, cursor = [], None
+    while True:
+        params = {"size": 10} if cursor is None else {"size": 10, "cursor": cursor}
+        page = client.get("/users/", params=params).json()
+        seen += [user["username"] for user in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"user-{i:02d}" for i in range(25)]
+
+    response = client.post("/users/batch", json={"usernames": ["user-01", "user-02"]})
+    assert [user["user_id"] for user in response.json()["items"]] == ["id-01", "id-02"]
+    assert client.post("/users/batch", json={"user_ids": ["x"] * 101}).status_code == 422
@@ -1,7 +1,7 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from core.logger import get_logger
+from utils.smtp_pool import get_pool
 from settings import settings
 
 logger = get_logger(__name__)
@@ -30,11 +30,8 @@ def send_email(
         msg["Subject"] = subject
         msg.attach(MIMEText(body, "plain", "utf-8"))
 
-        # 连接SMTP服务器：（示例：163邮箱）
-        with smtplib.SMTP(smtp_host,smtp_port) as server:
-            server.starttls() # 启用 TLS 加密
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        # 从连接池拿一条已经 STARTTLS + 登录好的连接发送（见 utils/smtp_pool.py），不再每封邮件都重新握手
+        get_pool(smtp_host, smtp_port, smtp_user, smtp_password, starttls=True).send_message(msg)
 
         logger.info(f"Email sent to {to_email}")
         print(f"Email sent to {to_email}: {subject}")
@@ -70,12 +67,17 @@ def send_email_163(
         msg["Subject"] = subject
         msg.attach(MIMEText(body, "plain", "utf-8"))
 
-        # 连接163 SMTP服务器
-        with smtplib.SMTP("smtp.163.com", 25) as server:
-            # 163 的 SMTP 端口：25（明文）或 465（SSL），但 25 更稳定
-            # 注意：有些网络会屏蔽 25 端口，可尝试 465 + SMTP_SSL（见下方备注）
-            server.login(from_email, smtp_password)
-            server.send_message(msg)
+        # 连接163 SMTP服务器：从连接池拿一条已经登录好的连接（见 utils/smtp_pool.py）
+        # 163 的 SMTP 端口：25（明文）或 465（SSL），但 25 更稳定
+        # 注意：有些网络会屏蔽 25 端口，可改成 EMAIL_163_SMTP_PORT=465 + EMAIL_163_SMTP_SSL=true
+        pool = get_pool(
+            settings.EMAIL_163_SMTP_HOST,
+            settings.EMAIL_163_SMTP_PORT,
+            from_email,
+            smtp_password,
+            use_ssl=settings.EMAIL_163_SMTP_SSL,
+        )
+        pool.send_message(msg)
 
         logger.info(f"邮件已经发送到 {to_email}")
         print(f"邮件已经发送到{to_email}: {subject}")
@@ -0,0 +1,86 @@
+# 借阅事件日志（data/borrow_events.log）
+# 以前每条借书事件都 open → 追加一行 → close 一次文件
+# 现在 EventLog 在进程里只打开一次，带缓冲追加；超过 EVENT_LOG_MAX_BYTES 就轮转（borrow_events.log.1、.2 ……）
+# 写入方是发件箱 relay（utils/log_borrow_utils.write_borrow_events）：每批写完 flush 一次再提交，
+# 投递是“至少一次”，每行带 event_key，读日志时按它去重
+import atexit
+import os
+import threading
+
+from core.serialization import serializer
+from settings import settings
+
+
+class EventLog:
+    """追加写的 JSON Lines 日志文件：一个长期打开的带缓冲句柄，按大小轮转；线程安全"""
+
+    def __init__(self, path: str, max_bytes: int | None = None, backup_count: int | None = None):
+        self.path = path
+        self.max_bytes = max_bytes or settings.EVENT_LOG_MAX_BYTES
+        self.backup_count = backup_count if backup_count is not None else settings.EVENT_LOG_BACKUP_COUNT
+        self._file = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, entries: list[dict]) -> None:
+        """追加多行（每个 dict 一行）；写进缓冲区，flush() 或缓冲区满时才真正写文件"""
+        with self._lock:
+            for entry in entries:
+                line = serializer.dumps(entry) + b"\n"
+                if self._file is None:
+                    self._open()
+                elif self._size and self._size + len(line) > self.max_bytes:
+                    self._rotate()
+                self._file.write(line)
+                self._size += len(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "ab", buffering=64 * 1024)
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        """borrow_events.log → .1，.1 → .2 ……，最多保留 backup_count 个旧文件"""
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+_event_log: EventLog | None = None
+_event_log_lock = threading.Lock()
+_event_log_pid = os.getpid()
+
+
+def get_event_log() -> EventLog:
+    """每个进程一个事件日志句柄（fork 出来的子进程不共用父进程的缓冲区）"""
+    global _event_log, _event_log_pid
+    with _event_log_lock:
+        if _event_log is None or _event_log_pid != os.getpid():
+            _event_log = EventLog(settings.EVENT_LOG_PATH)
+            _event_log_pid = os.getpid()
+        return _event_log
+
+
+@atexit.register
+def close_event_log() -> None:
+    with _event_log_lock:
+        event_log = _event_log if _event_log_pid == os.getpid() else None
+    if event_log is not None:
+        event_log.close()
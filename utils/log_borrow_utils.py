@@ -1,52 +1,49 @@
 # 新建文件，放工具函数
-import json
 from datetime import datetime, timezone
-from infrastructure.models import AuditLog
-from infrastructure.connection import SessionLocal
+from core.dtos import OutboxEventDto
+from utils.event_log import get_event_log
 
-# 异步任务函数，将日志写入文件
-# ✅ 这个函数是 **独立的、无状态的**，非常适合做后台任务。
-# log_borrow_event` 是在 **当前进程的子线程** 中执行的，所以：
-# - 不要传 `db` 会话（会话不能跨线程）
-# - 如果要写数据库，需在函数内部新建会话
-def log_borrow_event(user_id: str, book_id: str, borrow_id: int):
-    """后台任务：记录借书日志（写入文件）"""
-    log_entry = {
-        "event": "borrow_created",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "user_id": user_id,
-        "book_id": book_id,
-        "borrow_id": borrow_id,
-        "status": "success"
-    }
-    # 写入日志到文件（追加模式）
-    with open("data/borrow_events.log", "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-    # 控制台输出日志
-    print(f"[Background] Logged borrow event: user={user_id}, book={book_id}")
-
-# 异步任务函数，将日志写入数据库audit_logs 表
-def log_borrow_to_db(user_id: str, book_id: str, borrow_id: int):
+# ───────────────────────────────
+# 发件箱 relay 用（infrastructure/outbox_relay.py）：一批借书事件一次写完
+# 投递是“至少一次”，同一个事件可能写两遍；每行都带 event_key，读日志时按它去重
+# ───────────────────────────────
+def write_borrow_events(events: list[OutboxEventDto]) -> None:
     """
-    后台任务：将借书事件写入 audit_logs 表
+    一批借书事件追加到 data/borrow_events.log（进程里共用一个长期打开的句柄，按大小轮转）
+    flush 之后才返回：relay 提交（删除发件箱事件）之前这一批已经写进文件
     """
-    db = SessionLocal()
-    try:
-        log_entry = AuditLog(
-            action="borrow_created",
-            user_id= user_id,
-            details = {
-                "book_id": book_id,
-                "borrow_id": borrow_id,
-                "event": "user borrowed a book"
-            }
-        )
-        db.add(log_entry)
-        db.commit()
-    except Exception as e:
-        # 可选：记录错误日志（不要让后台任务崩溃主请求）
-        print(f"[ERROR] failed to log to db: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    event_log = get_event_log()
+    event_log.write([
+        {
+            "event": "borrow_created",
+            "event_key": event.key,
+            "timestamp": datetime.fromtimestamp(event.payload["at"], timezone.utc).isoformat(),
+            "user_id": event.payload["user_id"],
+            "book_id": event.payload["book_id"],
+            "borrow_id": event.payload["borrow_id"],
+            "status": "success"
+        }
+        for event in events
+    ])
+    event_log.flush()
+
 
+def borrow_audit_rows(events: list[OutboxEventDto]) -> list[dict]:
+    """
+    一批借书事件对应的 audit_logs 行；不在这里写库：
+    relay 把一整批事件的行合成一条多行 INSERT，和删除发件箱事件在同一个事务里提交（不会重复写）
+    """
+    return [
+        {
+            "action": "borrow_created",
+            "user_id": event.payload["user_id"],
+            "timestamp": datetime.fromtimestamp(event.payload["at"], timezone.utc),
+            "details": {
+                "book_id": event.payload["book_id"],
+                "borrow_id": event.payload["borrow_id"],
+                "event": "user borrowed a book",
+                "event_key": event.key,
+            },
+        }
+        for event in events
+    ]
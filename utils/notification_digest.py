@@ -0,0 +1,268 @@
+# 借还通知汇总（digest）：同一个读者在一个时间窗口内的借书、还书合并成一封邮件
+# 以前每借一本书就提交一个 send_email_task、每还一本书就同步发一封邮件：一次借十本书就是十封邮件、十个 Celery 任务
+# - 事件由发件箱 relay（infrastructure/outbox_relay.py）送进本进程的缓冲区，按 (收件人, 时间窗口) 分组
+# - 时间窗口按墙上时间对齐（每 NOTIFICATION_DIGEST_WINDOW_SECONDS 秒一个），窗口结束（或攒够
+#   NOTIFICATION_DIGEST_MAX_EVENTS 条）后渲染成一封汇总邮件；后台线程每次把到期的汇总一起提交给 Celery，共用一条 broker 连接
+# - 任务 ID：借还接口按这次请求的第一条借阅记录算一个（digest_task_id），返回给客户端并跟着事件进汇总器
+#   一封汇总邮件可能包含好几次请求的事件：第一个 ID 当 Celery 任务 ID，其余的作为别名交给 send_email_task，
+#   邮件发完后把同样的结果记到别名上 —— 所以不管这本书进了哪封邮件（攒满提前发、relay 迟到进了下一封），
+#   用接口返回的 ID 查到的都是包含它的那封
+# - 同一个事件重复投递（发件箱是至少一次投递）按去重键忽略
+# - 提交失败（Redis 连不上）时事件放回缓冲区，下一轮再试
+# 注意：缓冲区在进程内存里，进程被强杀时还没提交的汇总会丢（正常退出时会先全部提交）
+import atexit
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from core.dtos import OutboxEventDto
+from core.logger import get_logger
+from settings import settings
+
+logger = get_logger(__name__)
+
+BORROW = "借阅"
+RETURN = "归还"
+
+_SUBJECTS = {BORROW: "图书借阅通知", RETURN: "图书还书通知"}
+
+
+@dataclass
+class NotificationDigest:
+    """一封汇总邮件（提交给 send_email_task 的参数 + 预先分配的任务 ID）"""
+
+    task_id: str
+    to_email: str
+    subject: str
+    body: str
+    alias_task_ids: list[str] = field(default_factory=list)  # 合并进这封邮件的其他请求的任务 ID
+
+
+@dataclass
+class _Pending:
+    name: str
+    task_ids: dict[str, None] = field(default_factory=dict)  # 合并进来的请求的任务 ID，按先后顺序（当有序集合用）
+    events: list[tuple[str, str]] = field(default_factory=list)  # (动作, ISBN)，按发生顺序
+
+    def merge(self, newer: "_Pending") -> None:
+        self.task_ids.update(newer.task_ids)
+        self.events.extend(newer.events)
+        self.name = newer.name
+
+
+# 任务 ID 的命名空间（uuid5）：同一个 (收件人, 事件) 在所有进程里算出来的 ID 都一样
+_TASK_ID_NAMESPACE = uuid.UUID("5f0c8e3a-6d4b-4d38-9a55-2a3c1b7e9d10")
+# 记住最近这么多个去重键（重复投递一般紧跟着原来那次，不需要记太多）
+_SEEN_KEYS_MAX = 10000
+
+
+def digest_task_id(to_email: str, key: str) -> str:
+    """一次借还请求的通知任务 ID：key 是这次请求第一条事件的去重键（core/outbox.event_key）"""
+    return str(uuid.uuid5(_TASK_ID_NAMESPACE, f"{to_email}\n{key}"))
+
+
+def render_digest(name: str, events: list[tuple[str, str]]) -> tuple[str, str]:
+    """渲染 (主题, 正文)；只有一本书时和以前的单封通知一样"""
+    actions = list(dict.fromkeys(action for action, _ in events))
+    subject = _SUBJECTS[actions[0]] if len(actions) == 1 else "图书借还通知"
+    if len(events) == 1:
+        action, isbn = events[0]
+        return subject, f"你好 {name}，你已成功{action} ISBN: {isbn} 的图书。"
+    sections = []
+    for action in actions:
+        isbns = [isbn for a, isbn in events if a == action]
+        lines = "\n".join(f"- ISBN: {isbn}" for isbn in isbns)
+        sections.append(f"你已成功{action}以下 {len(isbns)} 本图书：\n{lines}")
+    return subject, f"你好 {name}，" + "\n\n".join(sections)
+
+
+class NotificationAggregator:
+    def __init__(
+        self,
+        publish: Callable[[list[NotificationDigest]], None],
+        *,
+        window_seconds: float | None = None,
+        max_events: int | None = None,
+        clock=time.time,
+    ):
+        self._publish = publish
+        self.window_seconds = window_seconds or settings.NOTIFICATION_DIGEST_WINDOW_SECONDS
+        self.max_events = max_events or settings.NOTIFICATION_DIGEST_MAX_EVENTS
+        self._clock = clock
+        self._pending: dict[tuple[str, int], _Pending] = {}  # (收件人邮箱, 窗口) -> 还没提交的事件
+        self._seen: OrderedDict[str, None] = OrderedDict()  # 最近的去重键
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.events = 0  # 一共收到几条事件（监控、测试用）
+        self.duplicates = 0  # 按去重键忽略的重复投递
+        self.digests = 0  # 一共提交了几封汇总邮件
+
+    def add(
+        self,
+        to_email: str,
+        name: str,
+        action: str,
+        isbns: list[str],
+        *,
+        at: float | None = None,
+        key: str | None = None,
+        task_id: str | None = None,
+    ) -> str:
+        """
+        记一条（或一批）借还事件，返回能查到这几本书所在汇总邮件的任务 ID；不做任何 I/O
+        at 是事件发生的时间（time.time()），决定进哪个窗口；key 是去重键，已经收到过的直接忽略
+        task_id 是接口返回给客户端的 ID；没给时按 key 算（key 也没有就随机生成一个）
+        """
+        at = self._clock() if at is None else at
+        window = int(at // self.window_seconds)
+        if task_id is None:
+            task_id = digest_task_id(to_email, key) if key is not None else str(uuid.uuid4())
+        with self._lock:
+            if key is not None:
+                if key in self._seen:
+                    self.duplicates += 1
+                    return task_id
+                self._seen[key] = None
+                if len(self._seen) > _SEEN_KEYS_MAX:
+                    self._seen.popitem(last=False)
+            pending = self._pending.get((to_email, window))
+            if pending is None:
+                pending = self._pending[(to_email, window)] = _Pending(name)
+            pending.name = name
+            pending.task_ids[task_id] = None
+            pending.events.extend((action, isbn) for isbn in isbns)
+            self.events += len(isbns)
+            full = len(pending.events) >= self.max_events
+        self._ensure_started()
+        if full:
+            self._wakeup.set()  # 攒够了，不等窗口结束
+        return task_id
+
+    def flush(self, force: bool = False) -> int:
+        """提交到期（force=True 时是全部）的汇总邮件，返回提交了几封"""
+        current = int(self._clock() // self.window_seconds)
+        with self._lock:
+            due = [
+                (group, pending)
+                for group, pending in self._pending.items()
+                if force or group[1] < current or len(pending.events) >= self.max_events
+            ]
+            for group, _ in due:
+                del self._pending[group]
+        if not due:
+            return 0
+        digests = []
+        for (to_email, _), pending in due:
+            task_id, *aliases = pending.task_ids
+            digests.append(NotificationDigest(task_id, to_email, *render_digest(pending.name, pending.events), aliases))
+        try:
+            self._publish(digests)
+        except Exception as e:
+            logger.error(f"汇总通知提交失败（{e}），{len(digests)} 封放回缓冲区，下一轮重试")
+            self._restore(due)
+            return 0
+        self.digests += len(digests)
+        return len(digests)
+
+    @property
+    def pending(self) -> int:
+        """还没提交的事件数"""
+        with self._lock:
+            return sum(len(pending.events) for pending in self._pending.values())
+
+    def close(self) -> None:
+        """停掉后台线程，并把缓冲区里剩下的全部提交（进程退出时调用）"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush(force=True)
+
+    def _restore(self, due: list[tuple[tuple[str, int], _Pending]]) -> None:
+        with self._lock:
+            for group, pending in due:
+                newer = self._pending.get(group)
+                if newer is not None:
+                    # 失败期间同一窗口又来了新事件：合并回旧的那封
+                    pending.merge(newer)
+                self._pending[group] = pending
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notification-digest", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        # 窗口的 1/4 检查一次，最多晚 1/4 个窗口提交
+        interval = min(max(self.window_seconds / 4, 0.05), 1.0)
+        while not self._stopped.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # 后台线程不能因为一次异常就退出
+                logger.error(f"汇总通知线程出错：{e}")
+
+
+def publish_to_celery(digests: list[NotificationDigest]) -> None:
+    """一轮到期的汇总邮件共用一条 broker 连接提交（每封一个 send_email_task，任务 ID 和别名都是接口返回过的）"""
+    from core.celery_app import celery_app
+    from tasks.tasks import send_email_task
+
+    with celery_app.producer_or_acquire() as producer:
+        for digest in digests:
+            send_email_task.apply_async(
+                kwargs={
+                    "to_email": digest.to_email,
+                    "subject": digest.subject,
+                    "body": digest.body,
+                    "alias_task_ids": digest.alias_task_ids,
+                },
+                task_id=digest.task_id,
+                producer=producer,
+            )
+
+
+_aggregator: NotificationAggregator | None = None
+_aggregator_lock = threading.Lock()
+_aggregator_pid = os.getpid()
+
+
+def get_aggregator() -> NotificationAggregator:
+    """每个进程一个汇总器（fork 出来的子进程不会用父进程的缓冲区和线程）"""
+    global _aggregator, _aggregator_pid
+    with _aggregator_lock:
+        if _aggregator is None or _aggregator_pid != os.getpid():
+            _aggregator = NotificationAggregator(publish_to_celery)
+            _aggregator_pid = os.getpid()
+        return _aggregator
+
+
+def notify_events(action: str, events: list[OutboxEventDto]) -> None:
+    """发件箱 relay 调用：把借还事件送进汇总缓冲区（没有邮箱的用户跳过）"""
+    aggregator = get_aggregator()
+    for event in events:
+        payload = event.payload
+        if payload.get("email"):
+            # 升级前写进发件箱的事件没有 task_id：按去重键算
+            aggregator.add(
+                payload["email"], payload["name"], action, [payload["book_id"]],
+                at=payload["at"], key=event.key, task_id=payload.get("task_id"),
+            )
+
+
+@atexit.register
+def close_aggregator() -> None:
+    with _aggregator_lock:
+        aggregator = _aggregator if _aggregator_pid == os.getpid() else None
+    if aggregator is not None:
+        aggregator.close()
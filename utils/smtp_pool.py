@@ -0,0 +1,184 @@
+# SMTP 连接池：同一个邮件服务器（host、port、账号）复用已经登录好的连接
+# 以前每封邮件都要 TCP 连接 +（STARTTLS）+ 登录 + 发送 + 断开，高峰期每小时几千次握手，会被邮箱服务商限流
+# - 发完的连接放回池子，下一封直接用（后进先出：最近用过的连接最可能还活着）
+# - 保活：连接空闲超过 noop_after 秒，取出来时先发 NOOP 确认还活着；空闲超过 max_idle 秒直接关掉（服务器多半已经断开）
+# - 断线重连：发送时发现连接断了（被服务器超时踢掉、421 等），换一条新连接重发一次；收件人被拒之类的错误不重试
+# - 每条连接最多发 max_messages 封就断开重连（很多服务商限制单个连接的发信数）
+# - 同一个服务器最多同时 max_connections 条连接，超出的请求排队等
+# API 进程（BackgroundTasks 的线程池）和每个 Celery worker 进程各有自己的池子；fork 出来的子进程不会用父进程的连接
+import atexit
+import os
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.message import Message
+
+from core.logger import get_logger
+from settings import settings
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Connection:
+    smtp: smtplib.SMTP
+    sent: int = 0  # 这条连接已经发了几封
+    last_used: float = 0.0  # time.monotonic()
+
+
+def _is_disconnect(exc: Exception) -> bool:
+    """连接已经不能用了（换条连接重发即可）"""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError)):
+        return True
+    # 421：服务器要关闭连接（空闲太久、单连接发信太多……）
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code == 421
+
+
+class SmtpPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        *,
+        use_ssl: bool = False,
+        starttls: bool = False,
+        max_connections: int | None = None,
+        max_messages: int | None = None,
+        noop_after: float | None = None,
+        max_idle: float | None = None,
+        timeout: float | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self._username = username
+        self._password = password
+        self._use_ssl = use_ssl
+        self._starttls = starttls
+        self._max_messages = max_messages or settings.SMTP_POOL_MAX_MESSAGES_PER_CONNECTION
+        self._noop_after = noop_after if noop_after is not None else settings.SMTP_POOL_NOOP_AFTER_SECONDS
+        self._max_idle = max_idle if max_idle is not None else settings.SMTP_POOL_MAX_IDLE_SECONDS
+        self._timeout = timeout or settings.SMTP_TIMEOUT_SECONDS
+        self._slots = threading.BoundedSemaphore(max_connections or settings.SMTP_POOL_MAX_CONNECTIONS)
+        self._idle: list[_Connection] = []
+        self._lock = threading.Lock()
+        self.connects = 0  # 一共建立过几条连接（监控、测试用）
+
+    def send_message(self, msg: Message) -> None:
+        """发一封邮件；连接数已满时排队，最多等 timeout 秒"""
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError(f"等待 SMTP 连接超时：{self.host}:{self.port}")
+        try:
+            conn = self._checkout()
+            try:
+                conn.smtp.send_message(msg)
+            except Exception as e:
+                self._discard(conn)
+                if not _is_disconnect(e):
+                    raise
+                logger.warning(f"SMTP 连接已断开（{e}），换一条新连接重发")
+                conn = self._connect()
+                try:
+                    conn.smtp.send_message(msg)
+                except Exception:
+                    self._discard(conn)
+                    raise
+            self._checkin(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """断开所有空闲连接（进程退出时调用）"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def _checkout(self) -> _Connection:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            idle = now - conn.last_used
+            if idle > self._max_idle or (idle > self._noop_after and not self._alive(conn)):
+                self._discard(conn)
+                continue
+            return conn
+
+    def _checkin(self, conn: _Connection) -> None:
+        conn.sent += 1
+        conn.last_used = time.monotonic()
+        if conn.sent >= self._max_messages:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def _connect(self) -> _Connection:
+        smtp_class = smtplib.SMTP_SSL if self._use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self._timeout)
+        try:
+            if self._starttls:
+                smtp.starttls()
+            if self._username:
+                smtp.login(self._username, self._password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connects += 1
+        return _Connection(smtp)
+
+    @staticmethod
+    def _alive(conn: _Connection) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(conn: _Connection) -> None:
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.smtp.close()  # 已经断开了，关掉 socket 即可
+
+
+_pools: dict[tuple, SmtpPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(
+    host: str,
+    port: int,
+    username: str | None = None,
+    password: str | None = None,
+    *,
+    use_ssl: bool = False,
+    starttls: bool = False,
+) -> SmtpPool:
+    """每个 (服务器, 账号) 一个池子（并发上限也是按它算的）"""
+    global _pools_pid
+    key = (host, port, username, password, use_ssl, starttls)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # fork 出来的子进程（Celery prefork）：继承来的连接和父进程共用 socket，不能用，也不能 QUIT
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SmtpPool(host, port, username, password, use_ssl=use_ssl, starttls=starttls)
+        return pool
+
+
+@atexit.register
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()